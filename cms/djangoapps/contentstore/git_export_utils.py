@@ -20,6 +20,7 @@ from xmodule.modulestore.xml_exporter import export_course_to_xml
 log = logging.getLogger(__name__)
 
 GIT_REPO_EXPORT_DIR = getattr(settings, 'GIT_REPO_EXPORT_DIR', None)
+COURSE_EXPORT_ASSET_WORKERS = getattr(settings, 'COURSE_EXPORT_ASSET_WORKERS', 1)
 GIT_EXPORT_DEFAULT_IDENT = getattr(settings, 'GIT_EXPORT_DEFAULT_IDENT',
                                    {'name': 'STUDIO_EXPORT_TO_GIT',
                                     'email': 'STUDIO_EXPORT_TO_GIT@example.com'})
@@ -134,7 +135,7 @@ def export_to_git(course_id, repo, user='', rdir=None):
     course_dir = os.path.basename(rdirp).rsplit('.git', 1)[0]
     try:
         export_course_to_xml(modulestore(), contentstore(), course_id,
-                             root_dir, course_dir)
+                             root_dir, course_dir, asset_workers=COURSE_EXPORT_ASSET_WORKERS)
     except (EnvironmentError, AttributeError):
         log.exception('Failed export to xml')
         raise GitExportError(GitExportError.XML_EXPORT_FAIL)
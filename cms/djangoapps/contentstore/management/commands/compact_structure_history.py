@@ -0,0 +1,71 @@
+"""
+Django management command to re-store the history of split-Mongo courses as deltas between versions.
+"""
+from django.core.management.base import BaseCommand, CommandError, make_option
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey
+from opaque_keys.edx.locator import CourseLocator
+from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.exceptions import ItemNotFoundError
+
+
+class Command(BaseCommand):
+    """
+    Re-store the structure history of split-Mongo courses as deltas with periodic full copies.
+    """
+    help = '''
+    Re-store every version of the structures of split-Mongo courses as the changes from the previous
+    version, with a full copy at least every <snapshot interval> versions. Takes the arguments:
+    <snapshot interval>: the most versions to store between full copies
+    <course_id>...: optional, the courses to compact (defaults to all the split-Mongo courses)
+    --commit: optional, if not provided, only reports what would be stored
+    '''
+    args = "<snapshot interval> [<course_id>...]"
+
+    option_list = BaseCommand.option_list + (
+        make_option('--commit',
+                    action='store_true',
+                    help='Rewrite the structures rather than only reporting what would be stored'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) < 1:
+            raise CommandError("compact_structure_history requires at least one argument: <snapshot interval>")
+
+        try:
+            snapshot_interval = int(args[0])
+        except ValueError:
+            raise CommandError("Invalid snapshot interval")
+        if snapshot_interval < 1:
+            raise CommandError("Invalid snapshot interval")
+
+        try:
+            course_keys = [CourseKey.from_string(arg) for arg in args[1:]]
+        except InvalidKeyError:
+            raise CommandError("Invalid course key.")
+
+        # pylint: disable=protected-access
+        split_store = modulestore()._get_modulestore_by_type(ModuleStoreEnum.Type.split)
+        if split_store is None:
+            raise CommandError("There's no split-Mongo modulestore")
+        if not course_keys:
+            course_keys = [
+                CourseLocator(index['org'], index['course'], index['run'])
+                for index in split_store.find_matching_course_indexes()
+            ]
+
+        commit = options.get('commit', False)
+        if not commit:
+            print 'Dry run. Nothing will be rewritten.'
+        for course_key in course_keys:
+            try:
+                snapshots, deltas, rewritten = split_store.compact_structure_history(
+                    course_key, snapshot_interval, commit
+                )
+            except ItemNotFoundError:
+                print u"{}: not found in split-Mongo".format(course_key)
+                continue
+            print u"{}: {} full copies, {} deltas, {} versions {}".format(
+                course_key, snapshots, deltas, rewritten, 'rewritten' if commit else 'to rewrite'
+            )
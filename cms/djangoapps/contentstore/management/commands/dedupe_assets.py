@@ -0,0 +1,27 @@
+"""
+Script for moving the data of all assets stored before identical asset data was shared into shared bodies
+"""
+import logging
+
+from django.core.management.base import BaseCommand
+from xmodule.contentstore.django import contentstore
+
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Store the data of all the assets in contentstore once per distinct content
+    """
+    help = 'Move the data of all assets in contentstore into bodies shared by the assets with identical data'
+
+    def handle(self, *args, **options):
+        """
+        Execute the command
+        """
+        log.info(u"-" * 80)
+        log.info(u"Deduping the data of the assets of all courses")
+        moved, shared = contentstore().dedupe_all_content()
+        log.info(u"=" * 80)
+        log.info(u"Total number of assets moved to shared bodies: %d, sharing another asset's body: %d", moved, shared)
@@ -21,6 +21,10 @@ class Command(BaseCommand):
         make_option('--nostatic',
                     action='store_true',
                     help='Skip import of static content'),
+        make_option('--asset-workers',
+                    type='int',
+                    default=4,
+                    help='How many static files to import at once'),
     )
 
     def handle(self, *args, **options):
@@ -45,6 +49,7 @@ class Command(BaseCommand):
             static_content_store=contentstore(), verbose=True,
             do_import_static=do_import_static,
             create_if_not_present=True,
+            asset_workers=options.get('asset_workers', 4),
         )
 
         for course in course_items:
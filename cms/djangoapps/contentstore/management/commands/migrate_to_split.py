@@ -2,8 +2,15 @@
 Django management command to migrate a course from the old Mongo modulestore
 to the new split-Mongo modulestore.
 """
+import logging
+import threading
+from optparse import make_option
+from Queue import Empty, Queue
+
 from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
+from django.db import connection
+from request_cache.middleware import RequestCache
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.split_migrator import SplitMigrator
 from opaque_keys.edx.keys import CourseKey
@@ -12,13 +19,27 @@ from xmodule.modulestore import ModuleStoreEnum
 from contentstore.management.commands.utils import user_from_str
 
 
+log = logging.getLogger(__name__)
+
+
 class Command(BaseCommand):
     """
     Migrate a course from old-Mongo to split-Mongo. It reuses the old course id except where overridden.
     """
 
     help = "Migrate a course from old-Mongo to split-Mongo. The new org, course, and run will default to the old one unless overridden"
-    args = "course_key email <new org> <new course> <new run>"
+    args = "course_key email <new org> <new course> <new run> | --all email"
+
+    option_list = BaseCommand.option_list + (
+        make_option('--all',
+                    action='store_true',
+                    default=False,
+                    help='Migrate every old-Mongo course which is not yet in split-Mongo, keeping its course id.'),
+        make_option('--parallel',
+                    type='int',
+                    default=1,
+                    help='How many courses to migrate at once with --all.'),
+    )
 
     def parse_args(self, *args):
         """
@@ -35,10 +56,7 @@ class Command(BaseCommand):
         except InvalidKeyError:
             raise CommandError("Invalid location string")
 
-        try:
-            user = user_from_str(args[1])
-        except User.DoesNotExist:
-            raise CommandError("No user found identified by {}".format(args[1]))
+        user = self.parse_user(args[1])
 
         org = course = run = None
         try:
@@ -50,7 +68,20 @@ class Command(BaseCommand):
 
         return course_key, user.id, org, course, run
 
+    def parse_user(self, user_identifier):
+        """
+        Return the user identified by the email or ID user_identifier
+        """
+        try:
+            return user_from_str(user_identifier)
+        except User.DoesNotExist:
+            raise CommandError("No user found identified by {}".format(user_identifier))
+
     def handle(self, *args, **options):
+        if options.get('all'):
+            self.handle_all(*args, **options)
+            return
+
         course_key, user, org, course, run = self.parse_args(*args)
 
         migrator = SplitMigrator(
@@ -59,3 +90,65 @@ class Command(BaseCommand):
         )
 
         migrator.migrate_mongo_course(course_key, user, org, course, run)
+
+    def handle_all(self, *args, **options):
+        """
+        Migrate every old-Mongo course which split-Mongo doesn't have yet, several at once in threads.
+        """
+        if len(args) != 1:
+            raise CommandError("migrate_to_split --all requires one argument: a user identifier (email or ID)")
+        parallel = options.get('parallel', 1)
+        if parallel < 1:
+            raise CommandError("--parallel must be positive")
+        user = self.parse_user(args[0])
+
+        store = modulestore()
+        split_store = store._get_modulestore_by_type(ModuleStoreEnum.Type.split)  # pylint: disable=protected-access
+        mongo_store = store._get_modulestore_by_type(ModuleStoreEnum.Type.mongo)  # pylint: disable=protected-access
+        course_keys = Queue()
+        for course_key in mongo_store.get_course_keys():
+            split_key = split_store.make_course_key(course_key.org, course_key.course, course_key.run)
+            if not split_store.has_course(split_key):
+                course_keys.put(course_key)
+        log.info('Migrating %d courses to split-Mongo.', course_keys.qsize())
+
+        migrator = SplitMigrator(source_modulestore=store, split_modulestore=split_store)
+        if parallel == 1:
+            self._migrate_courses(migrator, course_keys, user.id)
+        else:
+            threads = [
+                threading.Thread(target=self._migrate_courses_in_thread, args=(migrator, course_keys, user.id))
+                for __ in range(parallel)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        log.info('Finished migrating courses to split-Mongo.')
+
+    def _migrate_courses_in_thread(self, migrator, course_keys, user_id):
+        """
+        Migrate the courses on the queue in a thread of its own
+        """
+        try:
+            self._migrate_courses(migrator, course_keys, user_id)
+        finally:
+            # each thread has its own db connection
+            connection.close()
+
+    def _migrate_courses(self, migrator, course_keys, user_id):
+        """
+        Migrate the courses on the queue until it's empty
+        """
+        while True:
+            try:
+                course_key = course_keys.get_nowait()
+            except Empty:
+                return
+            # the modulestores' request cache is per thread; start each course with an empty one
+            RequestCache.clear_request_cache()
+            try:
+                migrator.migrate_mongo_course(course_key, user_id)
+            except Exception:  # pylint: disable=broad-except
+                log.exception('An error occurred while migrating %s to split-Mongo', course_key)
@@ -0,0 +1,70 @@
+"""
+Unittests for re-storing split course structure history as deltas
+"""
+import unittest
+
+from django.core.management import CommandError, call_command
+from contentstore.management.commands.compact_structure_history import Command
+from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
+
+
+class TestArgParsing(unittest.TestCase):
+    """
+    Tests for parsing arguments for the `compact_structure_history` management command
+    """
+    def setUp(self):
+        super(TestArgParsing, self).setUp()
+        self.command = Command()
+
+    def test_no_args(self):
+        errstring = "compact_structure_history requires at least one argument"
+        with self.assertRaisesRegexp(CommandError, errstring):
+            self.command.handle()
+
+    def test_invalid_interval(self):
+        for interval in ("foo", "0"):
+            with self.assertRaisesRegexp(CommandError, "Invalid snapshot interval"):
+                self.command.handle(interval)
+
+    def test_invalid_course_key(self):
+        with self.assertRaisesRegexp(CommandError, "Invalid course key"):
+            self.command.handle("10", "foo")
+
+
+class TestCompactStructureHistory(ModuleStoreTestCase):
+    """
+    Tests for re-storing the history of a split course as deltas
+    """
+    def setUp(self):
+        super(TestCompactStructureHistory, self).setUp()
+        self.course = CourseFactory.create(default_store=ModuleStoreEnum.Type.split)
+        self.chapter = ItemFactory.create(parent=self.course, category='chapter')
+        for index in range(4):
+            ItemFactory.create(parent=self.chapter, category='html', display_name='html {}'.format(index))
+        self.split_store = modulestore()._get_modulestore_by_type(ModuleStoreEnum.Type.split)  # pylint: disable=protected-access
+
+    def _delta_count(self):
+        """
+        Return how many of the stored structures are deltas
+        """
+        return self.split_store.db_connection.structures.find({'delta_base': {'$exists': True}}).count()
+
+    def test_dry_run(self):
+        call_command('compact_structure_history', '10', unicode(self.course.id))
+        self.assertEqual(self._delta_count(), 0)
+
+    def test_commit(self):
+        call_command('compact_structure_history', '10', unicode(self.course.id), commit=True)
+        self.assertGreater(self._delta_count(), 0)
+
+        # the course still reads back in full from the rewritten history
+        self.split_store.db_connection.structure_cache.clear()
+        self.split_store._clear_cache()  # pylint: disable=protected-access
+        chapter = self.store.get_item(self.chapter.location)
+        self.assertEqual(
+            [child.display_name for child in chapter.get_children()],
+            ['html {}'.format(index) for index in range(4)]
+        )
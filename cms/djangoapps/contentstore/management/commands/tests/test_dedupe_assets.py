@@ -0,0 +1,42 @@
+"""
+Test for moving the data of assets into bodies shared by the assets with identical data
+"""
+from django.core.management import call_command
+
+from xmodule.contentstore.content import StaticContent
+from xmodule.contentstore.django import contentstore
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory
+
+
+class DedupeAssets(ModuleStoreTestCase):
+    """
+    Tests deduping the assets of all courses.
+    """
+    def setUp(self):
+        """ Common setup. """
+        super(DedupeAssets, self).setUp()
+        self.content_store = contentstore()
+        self.courses = [CourseFactory.create(), CourseFactory.create()]
+        self.asset_keys = [course.id.make_asset_key('asset', 'example.txt') for course in self.courses]
+
+    def test_dedupe_assets(self):
+        """
+        Store the same data for an asset of each course the way it was before bodies were shared, and
+        check that the command stores it once
+        """
+        for asset_key in self.asset_keys:
+            content_id, content_son = self.content_store.asset_db_key(asset_key)
+            self.content_store.fs.put(
+                'example', _id=content_id, filename=unicode(asset_key), content_type='text/plain',
+                displayname='example.txt', content_son=content_son
+            )
+        bodies = self.content_store.bodies_files.find().count()
+
+        call_command('dedupe_assets')
+
+        self.assertEqual(self.content_store.bodies_files.find().count(), bodies + 1)
+        for asset_key in self.asset_keys:
+            content = self.content_store.find(asset_key)
+            self.assertIsInstance(content, StaticContent)
+            self.assertEqual(content.data, 'example')
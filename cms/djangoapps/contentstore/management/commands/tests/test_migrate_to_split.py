@@ -51,6 +51,14 @@ class TestArgParsing(unittest.TestCase):
         with self.assertRaisesRegexp(CommandError, errstring):
             self.command.handle("org/course/name", "fake@example.com")
 
+    def test_all_without_user(self):
+        """
+        Test --all requires only the user
+        """
+        errstring = "migrate_to_split --all requires one argument"
+        with self.assertRaisesRegexp(CommandError, errstring):
+            self.command.handle(all=True)
+
 
 # pylint: disable=no-member, protected-access
 class TestMigrateToSplit(ModuleStoreTestCase):
@@ -110,3 +118,14 @@ class TestMigrateToSplit(ModuleStoreTestCase):
         locator = split_store.make_course_key(self.course.id.org, self.course.id.course, self.course.id.run)
         course_from_split = modulestore().get_course(locator)
         self.assertIsNotNone(course_from_split)
+
+    def test_all_parallel(self):
+        """
+        Test migrating all the old-Mongo courses in several threads
+        """
+        other_course = CourseFactory(default_store=ModuleStoreEnum.Type.mongo)
+        call_command("migrate_to_split", str(self.user.id), all=True, parallel=2)
+        split_store = modulestore()._get_modulestore_by_type(ModuleStoreEnum.Type.split)
+        for course in (self.course, other_course):
+            new_key = split_store.make_course_key(course.id.org, course.id.course, course.id.run)
+            self.assertTrue(split_store.has_course(new_key), "Could not find course")
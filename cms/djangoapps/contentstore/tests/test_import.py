@@ -10,6 +10,9 @@ from django.test.utils import override_settings
 from django.conf import settings
 import ddt
 import copy
+import gc
+import mock
+import weakref
 
 from openedx.core.djangoapps.content.course_structures.tests import SignalDisconnectTestMixin
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
@@ -17,6 +20,7 @@ from xmodule.modulestore import ModuleStoreEnum
 from xmodule.modulestore.django import modulestore
 from xmodule.contentstore.django import contentstore
 from xmodule.modulestore.tests.factories import check_exact_number_of_calls, check_number_of_calls
+from xmodule.modulestore import xml_importer
 from xmodule.modulestore.xml_importer import import_course_from_xml
 from xmodule.exceptions import NotFoundError
 from uuid import uuid4
@@ -128,6 +132,53 @@ class ContentStoreImportTest(SignalDisconnectTestMixin, ModuleStoreTestCase):
         print "static_asset_path = {0}".format(course.static_asset_path)
         self.assertEqual(course.static_asset_path, 'test_import_course')
 
+    def test_import_progress(self):
+        """
+        Test that the progress of each stage of an import is reported
+        """
+        progress_callback = mock.Mock()
+        course_items = import_course_from_xml(
+            self.store, self.user.id, TEST_DATA_DIR, ['toy'],
+            static_content_store=contentstore(), create_if_not_present=True,
+            asset_workers=4, progress_callback=progress_callback,
+        )
+        course_id = course_items[0].id
+        final_progress = {}
+        for (dest_id, stage, done, total), __ in progress_callback.call_args_list:
+            self.assertEqual(dest_id, course_id)
+            self.assertLessEqual(done, total)
+            final_progress[stage] = (done, total)
+        self.assertItemsEqual(final_progress.keys(), ['static', 'asset_metadata', 'structure', 'drafts'])
+        for done, total in final_progress.itervalues():
+            self.assertEqual(done, total)
+
+        # all the static files were imported by the worker threads
+        __, count = contentstore().get_all_content_for_course(course_id)
+        self.assertEqual(count, final_progress['static'][1])
+
+    def test_import_releases_source_blocks(self):
+        """
+        Test that the source course's blocks are let go of as the import goes, not all held to its end
+        """
+        source_blocks = []
+        collected_blocks = []
+        update_and_import_module = xml_importer._update_and_import_module  # pylint: disable=protected-access
+
+        def import_module(module, *args, **kwargs):
+            """
+            Count the blocks imported so far which have been garbage collected, and import the module
+            """
+            gc.collect()
+            collected_blocks.append(sum(1 for block_ref in source_blocks if block_ref() is None))
+            source_blocks.append(weakref.ref(module))
+            return update_and_import_module(module, *args, **kwargs)
+
+        with mock.patch('xmodule.modulestore.xml_importer._update_and_import_module', import_module):
+            import_course_from_xml(
+                self.store, self.user.id, TEST_DATA_DIR, ['toy'], do_import_static=False, create_if_not_present=True
+            )
+        self.assertGreater(max(collected_blocks), 0)
+
     def test_asset_import_nostatic(self):
         '''
         This test validates that an image asset is NOT imported when do_import_static=False
@@ -29,7 +29,7 @@ from xmodule.modulestore.django import modulestore
 from opaque_keys.edx.keys import CourseKey
 from opaque_keys.edx.locator import LibraryLocator
 from xmodule.modulestore.xml_importer import import_course_from_xml, import_library_from_xml
-from xmodule.modulestore.xml_exporter import export_course_to_xml, export_library_to_xml
+from xmodule.modulestore.xml_exporter import export_course_to_tarball, export_library_to_tarball
 from xmodule.modulestore import COURSE_ROOT, LIBRARY_ROOT
 
 from student.auth import has_course_author_access
@@ -270,7 +270,9 @@ def _import_handler(request, courselike_key, root_name, successful_url, context_
                         settings.GITHUB_REPO_ROOT, [dirpath],
                         load_error_modules=False,
                         static_content_store=contentstore(),
-                        target_id=courselike_key
+                        target_id=courselike_key,
+                        asset_workers=settings.COURSE_IMPORT_ASSET_WORKERS,
+                        progress_callback=_log_import_progress,
                     )
 
                 new_location = courselike_items[0].location
@@ -315,6 +317,14 @@ def _import_handler(request, courselike_key, root_name, successful_url, context_
         return HttpResponseNotFound()
 
 
+def _log_import_progress(dest_id, stage, done, total):
+    """
+    Log the end of each stage of an import
+    """
+    if done == total:
+        log.info(u"Course import %s: %s done (%d)", dest_id, stage, total)
+
+
 def _save_request_status(request, key, status):
     """
     Save import status for a course in request session
@@ -368,14 +378,13 @@ def create_export_tarball(course_module, course_key, context):
     root_dir = path(mkdtemp())
 
     try:
-        if isinstance(course_key, LibraryLocator):
-            export_library_to_xml(modulestore(), contentstore(), course_key, root_dir, name)
-        else:
-            export_course_to_xml(modulestore(), contentstore(), course_module.id, root_dir, name)
-
         logging.debug(u'tar file being generated at %s', export_file.name)
+        # the static assets go straight into the tar file; only the xml is staged in root_dir
         with tarfile.open(name=export_file.name, mode='w:gz') as tar_file:
-            tar_file.add(root_dir / name, arcname=name)
+            if isinstance(course_key, LibraryLocator):
+                export_library_to_tarball(modulestore(), contentstore(), course_key, root_dir, name, tar_file)
+            else:
+                export_course_to_tarball(modulestore(), contentstore(), course_module.id, root_dir, name, tar_file)
 
     except SerializationError as exc:
         log.exception(u'There was an error exporting %s', course_key)
@@ -259,6 +259,16 @@ else:
 
 DATABASES = AUTH_TOKENS['DATABASES']
 MODULESTORE = convert_module_store_setting_if_needed(AUTH_TOKENS.get('MODULESTORE', MODULESTORE))
+COURSE_STRUCTURE_CACHE_LOCAL_SIZE = ENV_TOKENS.get(
+    'COURSE_STRUCTURE_CACHE_LOCAL_SIZE', COURSE_STRUCTURE_CACHE_LOCAL_SIZE
+)
+COURSE_STRUCTURE_CACHE_TIMEOUT = ENV_TOKENS.get('COURSE_STRUCTURE_CACHE_TIMEOUT', COURSE_STRUCTURE_CACHE_TIMEOUT)
+STATIC_CONTENT_LOCAL_CACHE_SIZE = ENV_TOKENS.get('STATIC_CONTENT_LOCAL_CACHE_SIZE', STATIC_CONTENT_LOCAL_CACHE_SIZE)
+STATIC_CONTENT_LOCAL_CACHE_TIMEOUT = ENV_TOKENS.get(
+    'STATIC_CONTENT_LOCAL_CACHE_TIMEOUT', STATIC_CONTENT_LOCAL_CACHE_TIMEOUT
+)
+COURSE_IMPORT_ASSET_WORKERS = ENV_TOKENS.get('COURSE_IMPORT_ASSET_WORKERS', COURSE_IMPORT_ASSET_WORKERS)
+COURSE_EXPORT_ASSET_WORKERS = ENV_TOKENS.get('COURSE_EXPORT_ASSET_WORKERS', COURSE_EXPORT_ASSET_WORKERS)
 CONTENTSTORE = AUTH_TOKENS['CONTENTSTORE']
 DOC_STORE_CONFIG = AUTH_TOKENS['DOC_STORE_CONFIG']
 # Datadog for events!
@@ -195,6 +195,11 @@ ENV_ROOT = REPO_ROOT.dirname()  # virtualenv dir /edx-platform is in
 
 GITHUB_REPO_ROOT = ENV_ROOT / "data"
 
+# How many static files of a course being imported to save to the contentstore at once
+COURSE_IMPORT_ASSET_WORKERS = 4
+# How many static files of a course being exported to git to write out at once
+COURSE_EXPORT_ASSET_WORKERS = 4
+
 sys.path.append(REPO_ROOT)
 sys.path.append(PROJECT_ROOT / 'djangoapps')
 sys.path.append(COMMON_ROOT / 'djangoapps')
@@ -355,6 +360,20 @@ XBLOCK_SELECT_FUNCTION = prefer_xmodules
 ############################ Modulestore Configuration ################################
 MODULESTORE_BRANCH = 'draft-preferred'
 
+# Number of course structures (split modulestore) to keep in each process, in front of
+# the shared 'course_structure_cache' cache. Structures are immutable, so this never
+# needs invalidation; it only bounds memory. 0 disables the in-process tier.
+COURSE_STRUCTURE_CACHE_LOCAL_SIZE = 8
+# Seconds course structures stay in the shared 'course_structure_cache' cache. Memcached
+# treats timeouts over 30 days as timestamps, which django converts them to.
+COURSE_STRUCTURE_CACHE_TIMEOUT = 30 * 24 * 60 * 60
+
+# Bytes of course assets too big for memcached (1MB and up) to keep in each process for the
+# StaticContentServer; no one asset bigger than an eighth of this is kept. Other processes' changes
+# are seen once the assets expire after the timeout, in seconds. 0 disables the cache.
+STATIC_CONTENT_LOCAL_CACHE_SIZE = 64 * 1024 * 1024
+STATIC_CONTENT_LOCAL_CACHE_TIMEOUT = 60
+
 MODULESTORE = {
     'default': {
         'ENGINE': 'xmodule.modulestore.mixed.MixedModuleStore',
@@ -166,9 +166,18 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'edx_location_mem_cache',
     },
+    'course_structure_cache': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
 
 }
 
+# Don't keep course structures between tests; mongo call counts depend on it
+COURSE_STRUCTURE_CACHE_LOCAL_SIZE = 0
+
+# Tests reuse asset locations across courses, so don't keep assets in memory
+STATIC_CONTENT_LOCAL_CACHE_SIZE = 0
+
 # Add external_auth to Installed apps for testing
 INSTALLED_APPS += ('external_auth', )
 
@@ -8,6 +8,11 @@ Core methods
 
 """
 
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
 from django.core.cache import cache
 from django.db import DEFAULT_DB_ALIAS
 from opaque_keys import InvalidKeyError
@@ -118,6 +123,110 @@ def get_cached_content(location):
     return cache.get(unicode(location).encode("utf-8"))
 
 
+class LocalContentCache(object):
+    """
+    A bounded, in-process LRU cache of contents which are too big for the shared cache.
+
+    The cache holds at most ``STATIC_CONTENT_LOCAL_CACHE_SIZE`` bytes of content (0 disables it), and
+    no single content bigger than an eighth of that. Other processes don't see the deletions
+    of this one; so, entries expire after ``STATIC_CONTENT_LOCAL_CACHE_TIMEOUT`` seconds.
+    """
+    def __init__(self):
+        # location key -> (expiry time, content), least recently used first
+        self._contents = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def max_size():
+        """
+        Return the most bytes of content to keep.
+        """
+        return getattr(settings, 'STATIC_CONTENT_LOCAL_CACHE_SIZE', 0)
+
+    def can_cache(self, content):
+        """
+        Return whether the content is small enough to keep.
+        """
+        return content.length is not None and 0 < content.length <= self.max_size() / 8
+
+    def get(self, key):
+        """
+        Return the unexpired content for the key (or None), marking it recently used.
+        """
+        with self._lock:
+            entry = self._contents.pop(key, None)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                self._size -= entry[1].length
+                return None
+            self._contents[key] = entry
+            return entry[1]
+
+    def set(self, key, content):
+        """
+        Keep the content for the key, evicting the least recently used contents to make room.
+        """
+        max_size = self.max_size()
+        timeout = getattr(settings, 'STATIC_CONTENT_LOCAL_CACHE_TIMEOUT', 60)
+        with self._lock:
+            self._remove(key)
+            self._contents[key] = (time.time() + timeout, content)
+            self._size += content.length
+            while self._size > max_size and self._contents:
+                __, (__, evicted) = self._contents.popitem(last=False)
+                self._size -= evicted.length
+
+    def delete(self, key):
+        """
+        Forget the content for the key, if any.
+        """
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        """
+        Forget the content for the key, if any, while holding the lock.
+        """
+        entry = self._contents.pop(key, None)
+        if entry is not None:
+            self._size -= entry[1].length
+
+    def clear(self):
+        """
+        Forget all of the contents.
+        """
+        with self._lock:
+            self._contents.clear()
+            self._size = 0
+
+
+local_content_cache = LocalContentCache()
+
+
+def can_cache_content_locally(content):
+    """
+    Return whether the content is small enough to keep in this process.
+    """
+    return local_content_cache.can_cache(content)
+
+
+def set_locally_cached_content(content):
+    """
+    Keep the content, already read into memory, in this process if it's small enough.
+    """
+    if can_cache_content_locally(content):
+        local_content_cache.set(unicode(content.location).encode("utf-8"), content)
+
+
+def get_locally_cached_content(location):
+    """
+    Return the content kept in this process for the location, or None.
+    """
+    return local_content_cache.get(unicode(location).encode("utf-8"))
+
+
 def del_cached_content(location):
     """
     delete content for the given location, as well as for content with run=None.
@@ -135,3 +244,5 @@ def del_cached_content(location):
         pass
 
     cache.delete_many(locations)
+    for location_key in locations:
+        local_content_cache.delete(location_key)
@@ -2,11 +2,13 @@
 Middleware to serve assets.
 """
 
+import calendar
 import logging
 
 from django.http import (
     HttpResponse, HttpResponseNotModified, HttpResponseForbidden
 )
+from django.utils.http import http_date, parse_http_date_safe
 from student.models import CourseEnrollment
 
 from xmodule.assetstore.assetmgr import AssetManager
@@ -14,7 +16,10 @@ from xmodule.contentstore.content import StaticContent, XASSET_LOCATION_TAG
 from xmodule.modulestore import InvalidLocationError
 from opaque_keys import InvalidKeyError
 from opaque_keys.edx.locator import AssetLocator
-from cache_toolbox.core import get_cached_content, set_cached_content
+from cache_toolbox.core import (
+    get_cached_content, set_cached_content,
+    can_cache_content_locally, get_locally_cached_content, set_locally_cached_content
+)
 from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.exceptions import NotFoundError
 
@@ -41,8 +46,10 @@ class StaticContentServer(object):
                 response.status_code = 400
                 return response
 
-            # first look in our cache so we don't have to round-trip to the DB
+            # first look in our caches so we don't have to round-trip to the DB
             content = get_cached_content(loc)
+            if content is None:
+                content = get_locally_cached_content(loc)
             if content is None:
                 # nope, not in cache, let's fetch from DB
                 try:
@@ -59,6 +66,10 @@ class StaticContentServer(object):
                         # since we've queried as a stream, let's read in the stream into memory to set in cache
                         content = content.copy_to_in_mem()
                         set_cached_content(content)
+                    elif can_cache_content_locally(content):
+                        # too big for memcached, but small enough to keep in this process
+                        content = content.copy_to_in_mem()
+                        set_locally_cached_content(content)
             else:
                 # NOP here, but we may wish to add a "cache-hit" counter in the future
                 pass
@@ -77,16 +88,14 @@ class StaticContentServer(object):
                     ):
                         return HttpResponseForbidden('Unauthorized')
 
-            # convert over the DB persistent last modified timestamp to a HTTP compatible
-            # timestamp, so we can simply compare the strings
-            last_modified_at_str = content.last_modified_at.strftime("%a, %d-%b-%Y %H:%M:%S GMT")
-
-            # see if the client has cached this content, if so then compare the
-            # timestamps, if they are the same then just return a 304 (Not Modified)
-            if 'HTTP_IF_MODIFIED_SINCE' in request.META:
-                if_modified_since = request.META['HTTP_IF_MODIFIED_SINCE']
-                if if_modified_since == last_modified_at_str:
-                    return HttpResponseNotModified()
+            # Validate the client's cached copy by the content's MD5 (the ETag) or its last modified time
+            etag = get_etag(content)
+            last_modified_at = calendar.timegm(content.last_modified_at.utctimetuple())
+            if is_not_modified(request, etag, content.last_modified_at, last_modified_at):
+                response = HttpResponseNotModified()
+                if etag is not None:
+                    response['ETag'] = etag
+                return response
 
             # *** File streaming within a byte range ***
             # If a Range is provided, parse Range attribute of the request
@@ -94,12 +103,9 @@ class StaticContentServer(object):
             # Request -> Range attribute structure: "Range: bytes=first-[last]"
             # Response -> Content-Range attribute structure: "Content-Range: bytes first-last/totalLength"
             # http://www.w3.org/Protocols/rfc2616/rfc2616-sec14.html#sec14.35
+            # The range only applies if the client's copy, named by If-Range, is still current.
             response = None
-            if request.META.get('HTTP_RANGE'):
-                # Data from cache (StaticContent) has no easy byte management, so we use the DB instead (StaticContentStream)
-                if type(content) == StaticContent:
-                    content = AssetManager.find(loc, as_stream=True)
-
+            if request.META.get('HTTP_RANGE') and is_range_current(request, etag, last_modified_at):
                 header_value = request.META['HTTP_RANGE']
                 try:
                     unit, ranges = parse_range_header(header_value, content.length)
@@ -144,11 +150,67 @@ class StaticContentServer(object):
             # "Accept-Ranges: bytes" tells the user that only "bytes" ranges are allowed
             response['Accept-Ranges'] = 'bytes'
             response['Content-Type'] = content.content_type
-            response['Last-Modified'] = last_modified_at_str
+            response['Last-Modified'] = http_date(last_modified_at)
+            if etag is not None:
+                response['ETag'] = etag
 
             return response
 
 
+def get_etag(content):
+    """
+    Returns the strong ETag of the content, derived from the MD5 of its data, or None if it's unknown.
+    """
+    # contents cached before they had digests have no attribute
+    content_digest = getattr(content, 'content_digest', None)
+    if content_digest is None:
+        return None
+    return '"{}"'.format(content_digest)
+
+
+def is_not_modified(request, etag, last_modified_at, last_modified_timestamp):
+    """
+    Returns whether the request's conditional headers show that the client's cached copy is current.
+
+    If-None-Match takes precedence over If-Modified-Since, as per
+    http://tools.ietf.org/html/rfc7232#section-6
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        if if_none_match.strip() == '*':
+            return True
+        if etag is None:
+            return False
+        # If-None-Match uses the weak comparison
+        return etag in (tag.strip().replace('W/', '', 1) for tag in if_none_match.split(','))
+
+    if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+    if if_modified_since is not None:
+        # clients which cached the content before Last-Modified followed RFC 1123 send back this format
+        if if_modified_since == last_modified_at.strftime("%a, %d-%b-%Y %H:%M:%S GMT"):
+            return True
+        if_modified_since = parse_http_date_safe(if_modified_since)
+        return if_modified_since is not None and last_modified_timestamp <= if_modified_since
+
+    return False
+
+
+def is_range_current(request, etag, last_modified_timestamp):
+    """
+    Returns whether the Range of the request applies: when there's no If-Range, or it names the
+    current content by its ETag or by its exact last modified time.
+
+    See spec for details: http://tools.ietf.org/html/rfc7233#section-3.2
+    """
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        return etag is not None and if_range == etag
+    return parse_http_date_safe(if_range) == last_modified_timestamp
+
+
 def parse_range_header(header_value, content_length):
     """
     Returns the unit and a list of (start, end) tuples of ranges.
@@ -5,12 +5,16 @@ import copy
 import ddt
 import logging
 import unittest
+from mock import patch
 from uuid import uuid4
 
 from django.conf import settings
 from django.test.client import Client
 from django.test.utils import override_settings
 
+from cache_toolbox.core import local_content_cache
+from xmodule.assetstore.assetmgr import AssetManager
+from xmodule.contentstore.content import StaticContent
 from xmodule.contentstore.django import contentstore
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
@@ -192,6 +196,75 @@ class ContentStoreToyCourseTest(ModuleStoreTestCase):
         )
         self.assertEqual(resp.status_code, 416)
 
+    def test_etag_not_modified(self):
+        """
+        Test that a request naming the current ETag in If-None-Match gets 304 Not Modified.
+        """
+        resp = self.client.get(self.url_unlocked)
+        etag = resp['ETag']
+        self.assertEqual(etag, '"{}"'.format(self.contentstore.get_attr(self.unlocked_asset, 'md5')))
+
+        resp = self.client.get(self.url_unlocked, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp['ETag'], etag)
+
+        resp = self.client.get(self.url_unlocked, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(resp.status_code, 200)
+
+    def test_if_modified_since(self):
+        """
+        Test that If-Modified-Since is compared as a date.
+        """
+        resp = self.client.get(self.url_unlocked)
+        last_modified = resp['Last-Modified']
+
+        resp = self.client.get(self.url_unlocked, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(resp.status_code, 304)
+        resp = self.client.get(self.url_unlocked, HTTP_IF_MODIFIED_SINCE='Sat, 01 Jan 2000 00:00:00 GMT')
+        self.assertEqual(resp.status_code, 200)
+
+    def test_range_request_stale_if_range(self):
+        """
+        Test that a range request whose If-Range names other content gets the full content.
+        """
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn('Content-Range', resp)
+
+        etag = self.client.get(self.url_unlocked)['ETag']
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE=etag)
+        self.assertEqual(resp.status_code, 206)
+
+    def test_range_request_in_memory_content(self):
+        """
+        Test that a range of content already read into memory is served without fetching it again.
+        """
+        content = self.contentstore.find(self.unlocked_asset)
+        with patch('contentserver.middleware.get_cached_content', return_value=content):
+            with patch.object(AssetManager, 'find') as mock_find:
+                resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=1-3')
+        self.assertFalse(mock_find.called)
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(resp.content, content.data[1:4])
+
+    @override_settings(STATIC_CONTENT_LOCAL_CACHE_SIZE=16 * 1024 * 1024)
+    def test_local_cache(self):
+        """
+        Test that assets too big for memcached are kept in the process.
+        """
+        big_asset = self.course_key.make_asset_key('asset', 'big_static.bin')
+        self.contentstore.save(StaticContent(
+            big_asset, 'big_static.bin', 'application/octet-stream', 'x' * (1024 * 1024 + 1)
+        ))
+        self.addCleanup(local_content_cache.clear)
+
+        with patch.object(AssetManager, 'find', wraps=AssetManager.find) as mock_find:
+            for __ in range(2):
+                resp = self.client.get(unicode(big_asset))
+                self.assertEqual(resp.status_code, 200)
+                self.assertEqual(resp['Content-Length'], str(1024 * 1024 + 1))
+        self.assertEqual(mock_find.call_count, 1)
+
 
 @ddt.ddt
 class ParseRangeHeaderTestCase(unittest.TestCase):
@@ -188,6 +188,14 @@ class CapaDescriptor(CapaFields, RawDescriptor):
         registered_tags = responsetypes.registry.registered_tags()
         return set([node.tag for node in tree.iter() if node.tag in registered_tags])
 
+    @property
+    def max_score_is_user_independent(self):
+        """
+        Whether every student's problem is worth the same: scripts can generate different responses
+        from each student's seed or anonymous_student_id, even if the problem is never randomized.
+        """
+        return '<script' not in self.data
+
     @property
     def has_responsive_ui(self):
         """
@@ -6,17 +6,33 @@ from xmodule.contentstore.content import XASSET_LOCATION_TAG
 
 import logging
 
-from .content import StaticContent, ContentStore, StaticContentStream
+from .content import StaticContent, ContentStore, StaticContentStream, STREAM_DATA_CHUNK_SIZE
 from xmodule.exceptions import NotFoundError
 from fs.osfs import OSFS
+import calendar
+import datetime
+import errno
+import functools
+import hashlib
 import os
 import json
+import posixpath
+import tarfile
 from bson.son import SON
 from opaque_keys.edx.keys import AssetKey
 from xmodule.modulestore.django import ASSET_IGNORE_REGEX
+from xmodule.util.threads import run_in_threads
 
 
 class MongoContentStore(ContentStore):
+    """
+    Stores each asset's metadata as a document in the GridFS files collection of the bucket, and its
+    data once per distinct content as a file in the bucket's `bodies` GridFS. An asset's document
+    refers to its body by `content_ref`; identical data saved for several assets or copied to reruns
+    shares one body, which counts the assets referring to it in `refcount` and is removed once that
+    drops to 0. Documents from before bodies were shared have no `content_ref` and keep their data in
+    their own chunks until deduped.
+    """
 
     # pylint: disable=unused-argument
     def __init__(self, host, db, port=27017, user=None, password=None, bucket='fs', collection=None, **kwargs):
@@ -46,6 +62,12 @@ class MongoContentStore(ContentStore):
         self.fs = gridfs.GridFS(_db, bucket)
 
         self.fs_files = _db[bucket + ".files"]  # the underlying collection GridFS uses
+        self.fs_chunks = _db[bucket + ".chunks"]
+
+        # the data of the assets, stored once per distinct content
+        self.bodies = gridfs.GridFS(_db, bucket + ".bodies")
+        self.bodies_files = _db[bucket + ".bodies.files"]
+        self.bodies_chunks = _db[bucket + ".bodies.chunks"]
 
     def close_connections(self):
         """
@@ -64,23 +86,30 @@ class MongoContentStore(ContentStore):
     def save(self, content):
         content_id, content_son = self.asset_db_key(content.location)
 
-        # The way to version files in gridFS is to not use the file id as the _id but just as the filename.
-        # Then you can upload as many versions as you like and access by date or version. Because we use
-        # the location as the _id, we must delete before adding (there's no replace method in gridFS)
-        self.delete(content_id)  # delete is a noop if the entry doesn't exist; so, don't waste time checking
-
+        body = self._put_body(content.data if hasattr(content.data, '__iter__') else [content.data])
         thumbnail_location = content.thumbnail_location.to_deprecated_list_repr() if content.thumbnail_location else None
-        with self.fs.new_file(_id=content_id, filename=unicode(content.location), content_type=content.content_type,
-                              displayname=content.name, content_son=content_son,
-                              thumbnail_location=thumbnail_location,
-                              import_path=content.import_path,
-                              # getattr b/c caching may mean some pickled instances don't have attr
-                              locked=getattr(content, 'locked', False)) as fp:
-            if hasattr(content.data, '__iter__'):
-                for chunk in content.data:
-                    fp.write(chunk)
-            else:
-                fp.write(content.data)
+        asset = {
+            '_id': content_id,
+            'filename': unicode(content.location),
+            'contentType': content.content_type,
+            'displayname': content.name,
+            'content_son': content_son,
+            'thumbnail_location': thumbnail_location,
+            'import_path': content.import_path,
+            # getattr b/c caching may mean some pickled instances don't have attr
+            'locked': getattr(content, 'locked', False),
+            'length': body.length,
+            'chunkSize': body.chunk_size,
+            'md5': body.md5,
+            'uploadDate': datetime.datetime.utcnow(),
+            'content_ref': self._acquire_body(body),
+        }
+
+        # Because we use the location as the _id, saving atomically replaces any previous version of the
+        # asset; its data is released only once the new version holds its own reference to its body.
+        previous = self.fs_files.find_and_modify({'_id': content_id}, asset, upsert=True)
+        if previous:
+            self._release_data(previous)
 
         return content
 
@@ -88,39 +117,138 @@ class MongoContentStore(ContentStore):
         if isinstance(location_or_id, AssetKey):
             location_or_id, _ = self.asset_db_key(location_or_id)
         # Deletes of non-existent files are considered successful
-        self.fs.delete(location_or_id)
+        asset = self.fs_files.find_and_modify({'_id': location_or_id}, remove=True)
+        if asset:
+            self._release_data(asset)
+
+    def _delete_asset(self, asset):
+        """
+        Delete the asset whose fs.files document is asset, and its body if no other asset refers to it
+        """
+        removed = self.fs_files.find_and_modify({'_id': self.make_id_son(asset)}, remove=True)
+        if removed:
+            self._release_data(removed)
+
+    def _put_body(self, chunks):
+        """
+        Store the data given by the iterable of chunks as a new body, and return its closed GridIn.
+        The body records the sha1 of its data to find identical bodies by, and starts with one reference.
+        """
+        sha1 = hashlib.sha1()
+        with self.bodies.new_file(refcount=1) as body:
+            for chunk in chunks:
+                sha1.update(chunk)
+                body.write(chunk)
+            body.sha1 = sha1.hexdigest()
+        return body
+
+    def _acquire_body(self, body):
+        """
+        Return the id of the body an asset holding the data of the just-stored body should refer to: an
+        identical older body, if a reference to it can be taken, in which case the new body is released;
+        else the new body, whose initial reference becomes the asset's.
+
+        Args:
+            body: the closed GridIn of the just-stored body
+        """
+        # pylint: disable=protected-access
+        shared = self.bodies_files.find_one(
+            {'sha1': body.sha1, 'length': body.length, '_id': {'$lt': body._id}, 'refcount': {'$gt': 0}},
+            {'_id': True},
+            sort=[('_id', pymongo.ASCENDING)],
+        )
+        if shared is None or not self._reference_body(shared['_id']):
+            return body._id
+        self._release_body(body._id)
+        return shared['_id']
+
+    def _reference_body(self, body_id):
+        """
+        Take a reference to the body, unless its last reference was already released. Returns whether
+        the reference was taken.
+        """
+        # a body whose count dropped to 0 is being deleted and must never be referred to again
+        result = self.bodies_files.update({'_id': body_id, 'refcount': {'$gt': 0}}, {'$inc': {'refcount': 1}})
+        return result['n'] > 0
+
+    def _release_body(self, body_id):
+        """
+        Release a reference to the body, deleting it once no asset refers to it
+        """
+        self.bodies_files.update({'_id': body_id}, {'$inc': {'refcount': -1}})
+        # only whoever removes the body's document removes its chunks
+        if self.bodies_files.remove({'_id': body_id, 'refcount': {'$lte': 0}})['n']:
+            self.bodies_chunks.remove({'files_id': body_id})
+
+    def _release_data(self, asset):
+        """
+        Release the data of a replaced or deleted version of an asset: its own chunks if it predates
+        shared bodies, else its reference to its body.
+        """
+        if 'content_ref' in asset:
+            self._release_body(asset['content_ref'])
+        else:
+            self.fs_chunks.remove({'files_id': self.make_id_son(asset)})
+
+    def _open_data(self, asset):
+        """
+        Return a GridOut reading the data of the asset whose fs.files document is asset: its body, or
+        its own chunks if it predates shared bodies. Raises NoFile if the data is missing.
+        """
+        if 'content_ref' in asset:
+            return self.bodies.get(asset['content_ref'])
+        return self.fs.get(self.make_id_son(asset))
+
+    def _move_to_body(self, asset):
+        """
+        Move the data of an asset which predates shared bodies out of its own chunks into a body, sharing
+        an identical older body if there is one. Returns whether the asset shares an older body.
+        """
+        asset_id = self.make_id_son(asset)
+        with self.fs.get(asset_id) as data_file:
+            body = self._put_body(iter(functools.partial(data_file.read, STREAM_DATA_CHUNK_SIZE), ''))
+        body_id = self._acquire_body(body)
+        result = self.fs_files.update(
+            {'_id': asset_id, 'content_ref': {'$exists': False}}, {'$set': {'content_ref': body_id}}
+        )
+        if not result['n']:
+            # the asset was deleted or moved meanwhile; pick up the body it was moved to, if any
+            self._release_body(body_id)
+            moved = self.fs_files.find_one({'_id': asset_id, 'content_ref': {'$exists': True}}, {'content_ref': True})
+            if moved is not None:
+                asset['content_ref'] = moved['content_ref']
+            return False
+        asset['content_ref'] = body_id
+        self.fs_chunks.remove({'files_id': asset_id})
+        return body_id != body._id  # pylint: disable=protected-access
 
     def find(self, location, throw_on_not_found=True, as_stream=False):
         content_id, __ = self.asset_db_key(location)
 
         try:
-            if as_stream:
-                fp = self.fs.get(content_id)
-                thumbnail_location = getattr(fp, 'thumbnail_location', None)
-                if thumbnail_location:
-                    thumbnail_location = location.course_key.make_asset_key(
-                        'thumbnail',
-                        thumbnail_location[4]
-                    )
-                return StaticContentStream(
-                    location, fp.displayname, fp.content_type, fp, last_modified_at=fp.uploadDate,
-                    thumbnail_location=thumbnail_location,
-                    import_path=getattr(fp, 'import_path', None),
-                    length=fp.length, locked=getattr(fp, 'locked', False)
+            asset = self.fs_files.find_one({'_id': content_id})
+            if asset is None:
+                raise NoFile(content_id)
+            fp = self._open_data(asset)
+            thumbnail_location = asset.get('thumbnail_location')
+            if thumbnail_location:
+                thumbnail_location = location.course_key.make_asset_key(
+                    'thumbnail',
+                    thumbnail_location[4]
                 )
+            attrs = dict(
+                last_modified_at=asset['uploadDate'],
+                thumbnail_location=thumbnail_location,
+                import_path=asset.get('import_path'),
+                length=asset['length'], locked=asset.get('locked', False),
+                content_digest=asset.get('md5')
+            )
+            if as_stream:
+                return StaticContentStream(location, asset['displayname'], asset.get('contentType'), fp, **attrs)
             else:
-                with self.fs.get(content_id) as fp:
-                    thumbnail_location = getattr(fp, 'thumbnail_location', None)
-                    if thumbnail_location:
-                        thumbnail_location = location.course_key.make_asset_key(
-                            'thumbnail',
-                            thumbnail_location[4]
-                        )
+                with fp:
                     return StaticContent(
-                        location, fp.displayname, fp.content_type, fp.read(), last_modified_at=fp.uploadDate,
-                        thumbnail_location=thumbnail_location,
-                        import_path=getattr(fp, 'import_path', None),
-                        length=fp.length, locked=getattr(fp, 'locked', False)
+                        location, asset['displayname'], asset.get('contentType'), fp.read(), **attrs
                     )
         except NoFile:
             if throw_on_not_found:
@@ -135,14 +263,19 @@ class MongoContentStore(ContentStore):
             output_directory = output_directory + '/' + os.path.dirname(content.import_path)
 
         if not os.path.exists(output_directory):
-            os.makedirs(output_directory)
+            try:
+                os.makedirs(output_directory)
+            except OSError as err:
+                # another thread exporting the course's assets made it meanwhile
+                if err.errno != errno.EEXIST:
+                    raise
 
         disk_fs = OSFS(output_directory)
 
         with disk_fs.open(content.name, 'wb') as asset_file:
             asset_file.write(content.data)
 
-    def export_all_for_course(self, course_key, output_directory, assets_policy_file):
+    def export_all_for_course(self, course_key, output_directory, assets_policy_file, workers=1):
         """
         Export all of this course's assets to the output_directory. Export all of the assets'
         attributes to the policy file.
@@ -152,22 +285,69 @@ class MongoContentStore(ContentStore):
             output_directory: the directory under which to put all the asset files
             assets_policy_file: the filename for the policy file which should be in the same
                 directory as the other policy files.
+            workers (int): how many of the assets to export at once, in threads
         """
-        policy = {}
         assets, __ = self.get_all_content_for_course(course_key)
 
+        # TODO: On 6/19/14, I had to put a try/except around this
+        # to export a course. The course failed on JSON files in
+        # the /static/ directory placed in it with an import.
+        #
+        # If this hasn't been looked at in a while, remove this comment.
+        #
+        # When debugging course exports, this might be a good place
+        # to look. -- pmitros
+        if workers > 1 and len(assets) > 1:
+            run_in_threads(
+                lambda asset: self.export(asset['asset_key'], output_directory),
+                assets,
+                min(workers, len(assets))
+            )
+        else:
+            for asset in assets:
+                self.export(asset['asset_key'], output_directory)
+
+        self._export_assets_policy(assets, assets_policy_file)
+
+    def export_all_for_course_to_tar(self, course_key, tar_file, arc_directory, assets_policy_file):
+        """
+        Stream all of this course's assets from GridFS straight into an open tarfile.TarFile, rather
+        than staging them on disk first. Export all of the assets' attributes to the policy file.
+
+        Args:
+            course_key (CourseKey): the :class:`CourseKey` identifying the course
+            tar_file (tarfile.TarFile): the tarfile to add the asset files to
+            arc_directory: the directory in the tarfile under which to put all the asset files
+            assets_policy_file: the filename for the policy file which should be in the same
+                directory as the other policy files.
+        """
+        assets, __ = self.get_all_content_for_course(course_key)
+
+        for asset in assets:
+            try:
+                asset_file = self._open_data(asset)
+            except NoFile:
+                raise NotFoundError(self.asset_db_key(asset['asset_key'])[0])
+            with asset_file:
+                import_path = asset.get('import_path')
+                tar_info = tarfile.TarInfo(posixpath.join(
+                    arc_directory, posixpath.dirname(import_path) if import_path else '', asset['displayname']
+                ))
+                tar_info.size = asset['length']
+                tar_info.mtime = calendar.timegm(asset['uploadDate'].utctimetuple())
+                tar_file.addfile(tar_info, asset_file)
+
+        self._export_assets_policy(assets, assets_policy_file)
+
+    @staticmethod
+    def _export_assets_policy(assets, assets_policy_file):
+        """
+        Write the attributes of the assets to the policy file
+        """
+        policy = {}
         for asset in assets:
-            # TODO: On 6/19/14, I had to put a try/except around this
-            # to export a course. The course failed on JSON files in
-            # the /static/ directory placed in it with an import.
-            #
-            # If this hasn't been looked at in a while, remove this comment.
-            #
-            # When debugging course exports, this might be a good place
-            # to look. -- pmitros
-            self.export(asset['asset_key'], output_directory)
             for attr, value in asset.iteritems():
-                if attr not in ['_id', 'md5', 'uploadDate', 'length', 'chunkSize', 'asset_key']:
+                if attr not in ['_id', 'md5', 'uploadDate', 'length', 'chunkSize', 'asset_key', 'content_ref']:
                     policy.setdefault(asset['asset_key'].name, {})[attr] = value
 
         with open(assets_policy_file, 'w') as f:
@@ -196,11 +376,28 @@ class MongoContentStore(ContentStore):
             items = self.fs_files.find(query)
             assets_to_delete = assets_to_delete + items.count()
             for asset in items:
-                self.fs.delete(asset[prefix])
-
-            self.fs_files.remove(query)
+                self._delete_asset(asset)
         return assets_to_delete
 
+    def dedupe_all_content(self):
+        """
+        Move the data of all the assets which predate shared bodies out of their own chunks into shared
+        bodies, storing identical data once.
+
+        Returns a tuple of how many assets were moved and how many of those share another asset's body
+        """
+        moved = shared = 0
+        for prefix in ['_id', 'content_son']:
+            query = {'{}.tag'.format(prefix): XASSET_LOCATION_TAG, 'content_ref': {'$exists': False}}
+            for asset in self.fs_files.find(query, timeout=False):
+                try:
+                    shared += self._move_to_body(asset)
+                except NoFile:
+                    logging.warning('Asset %s has no data; not deduped', asset['_id'])
+                    continue
+                moved += 1
+        return moved, shared
+
     def _get_all_content_for_course(self,
                                     course_key,
                                     get_thumbnails=False,
@@ -275,7 +472,7 @@ class MongoContentStore(ContentStore):
         :param location:  a c4x asset location
         """
         for attr in attr_dict.iterkeys():
-            if attr in ['_id', 'md5', 'uploadDate', 'length']:
+            if attr in ['_id', 'md5', 'uploadDate', 'length', 'content_ref']:
                 raise AttributeError("{} is a protected attribute.".format(attr))
         asset_db_key, __ = self.asset_db_key(location)
         # catch upsert error and raise NotFoundError if asset doesn't exist
@@ -303,14 +500,16 @@ class MongoContentStore(ContentStore):
         """
         See :meth:`.ContentStore.copy_all_course_assets`
 
-        This implementation fairly expensively copies all of the data
+        This implementation copies only the assets' metadata; the copies share the sources' bodies.
         """
         source_query = query_for_course(source_course_key)
-        # it'd be great to figure out how to do all of this on the db server and not pull the bits over
         for asset in self.fs_files.find(source_query):
             asset_key = self.make_id_son(asset)
-            # don't convert from string until fs access
-            source_content = self.fs.get(asset_key)
+            if 'content_ref' not in asset:
+                self._move_to_body(asset)
+            # the copy holds its own reference to the source's body, unless the source was deleted meanwhile
+            if 'content_ref' not in asset or not self._reference_body(asset['content_ref']):
+                continue
             if isinstance(asset_key, basestring):
                 asset_key = AssetKey.from_string(asset_key)
                 __, asset_key = self.asset_db_key(asset_key)
@@ -326,17 +525,12 @@ class MongoContentStore(ContentStore):
                     dest_course_key.make_asset_key(asset_key['category'], asset_key['name']).for_branch(None)
                 )
 
-            self.fs.put(
-                source_content.read(),
-                _id=asset_id, filename=asset['filename'], content_type=asset['contentType'],
-                displayname=asset['displayname'], content_son=asset_key,
-                # thumbnail is not technically correct but will be functionally correct as the code
-                # only looks at the name which is not course relative.
-                thumbnail_location=asset['thumbnail_location'],
-                import_path=asset['import_path'],
-                # getattr b/c caching may mean some pickled instances don't have attr
-                locked=asset.get('locked', False)
-            )
+            # thumbnail_location is not technically correct but will be functionally correct as the code
+            # only looks at the name which is not course relative.
+            dest_asset = dict(asset, _id=asset_id, content_son=asset_key, uploadDate=datetime.datetime.utcnow())
+            previous = self.fs_files.find_and_modify({'_id': asset_id}, dest_asset, upsert=True)
+            if previous:
+                self._release_data(previous)
 
     def delete_all_course_assets(self, course_key):
         """
@@ -347,8 +541,7 @@ class MongoContentStore(ContentStore):
         course_query = query_for_course(course_key)
         matching_assets = self.fs_files.find(course_query)
         for asset in matching_assets:
-            asset_key = self.make_id_son(asset)
-            self.fs.delete(asset_key)
+            self._delete_asset(asset)
 
     # codifying the original order which pymongo used for the dicts coming out of location_to_dict
     # stability of order is more important than sanity of order as any changes to order make things
@@ -416,6 +609,8 @@ class MongoContentStore(ContentStore):
             [('content_son.org', pymongo.ASCENDING), ('content_son.course', pymongo.ASCENDING), ('display_name', pymongo.ASCENDING)],
             sparse=True
         )
+        # Index needed to find the bodies with the same data
+        self.bodies_files.create_index([('sha1', pymongo.ASCENDING), ('length', pymongo.ASCENDING)])
 
 
 def query_for_course(course_key, category=None):
@@ -7,6 +7,9 @@ classes, which both need these type of functions.
 """
 from datetime import datetime
 from base64 import b32encode
+from math import exp
+
+import dateutil.parser
 
 from django.utils.timezone import UTC
 
@@ -208,3 +211,55 @@ def may_certify_for_course(certificates_display_behavior, certificates_show_befo
         or certificates_show_before_end
     )
     return show_early or has_ended
+
+
+def sorting_dates(start, advertised_start, announcement):
+    """
+    Returns the announcement date, the (advertised) start date, and the
+    current time, which are used to sort courses by how "new" they are.
+
+    Arguments:
+        start (datetime): The start datetime of the course in question.
+        advertised_start (str): The advertised start date of the course
+            in question, which is used if it parses as a date.
+        announcement (datetime): The announcement datetime of the course
+            in question.
+    """
+    try:
+        start = dateutil.parser.parse(advertised_start)
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=UTC())
+    except (ValueError, AttributeError):
+        pass
+
+    return announcement, start, datetime.now(UTC())
+
+
+def sorting_score(start, advertised_start, announcement):
+    """
+    Returns a number that can be used to sort courses according to how "new"
+    they are. The "newness" score is computed using a heuristic that takes
+    into account the announcement and (advertised) start dates of the course
+    if available.
+
+    The lower the number the "newer" the course.
+
+    Arguments:
+        start (datetime): The start datetime of the course in question.
+        advertised_start (str): The advertised start date of the course
+            in question.
+        announcement (datetime): The announcement datetime of the course
+            in question.
+    """
+    # Make courses that have an announcement date have a lower
+    # score than courses than don't, older courses should have a
+    # higher score.
+    announcement, start, now = sorting_dates(start, advertised_start, announcement)
+    scale = 300.0  # about a year
+    if announcement:
+        days = (now - announcement).days
+        score = -exp(-days / scale)
+    else:
+        days = (now - start).days
+        score = exp(days / scale)
+    return score
@@ -7,6 +7,7 @@ import logging
 import re
 import json
 import datetime
+import heapq
 
 from pytz import UTC
 from collections import defaultdict
@@ -20,7 +21,7 @@ from abc import ABCMeta, abstractmethod
 from contracts import contract, new_contract
 from xblock.plugin import default_select
 
-from .exceptions import InvalidLocationError, InsufficientSpecificationError
+from .exceptions import InvalidLocationError, InsufficientSpecificationError, ItemNotFoundError
 from xmodule.errortracker import make_error_tracker
 from xmodule.assetstore import AssetMetadata
 from opaque_keys.edx.keys import CourseKey, UsageKey, AssetKey
@@ -563,22 +564,13 @@ class ModuleStoreAssetBase(object):
         course_assets = self._find_course_assets(course_key)
 
         # Determine the proper sort - with defaults of ('displayname', SortOrder.ascending).
-        key_func = None
-        sort_order = ModuleStoreEnum.SortOrder.ascending
-        if sort:
-            if sort[0] == 'uploadDate':
-                key_func = lambda x: x['edit_info']['edited_on']
-            if sort[1] == ModuleStoreEnum.SortOrder.descending:
-                sort_order = ModuleStoreEnum.SortOrder.descending
+        sort_by_filename = not sort or sort[0] != 'uploadDate'
+        descending = bool(sort) and sort[1] == ModuleStoreEnum.SortOrder.descending
 
         if asset_type is None:
-            # Add assets of all types to the sorted list.
-            all_assets = SortedAssetList(iterable=[], key=key_func)
-            for asset_type, val in course_assets.iteritems():
-                all_assets.update(val)
+            all_assets = [asset for __, assets in course_assets.iteritems() for asset in assets]
         else:
-            # Add assets of a single type to the sorted list.
-            all_assets = SortedAssetList(iterable=course_assets.get(asset_type, []), key=key_func)
+            all_assets = course_assets.get(asset_type, [])
         num_assets = len(all_assets)
 
         start_idx = start
@@ -587,16 +579,23 @@ class ModuleStoreAssetBase(object):
             # No limit on the results.
             end_idx = num_assets
 
-        step_incr = 1
-        if sort_order == ModuleStoreEnum.SortOrder.descending:
-            # Flip the indices and iterate backwards.
-            step_incr = -1
-            start_idx = (num_assets - 1) - start_idx
-            end_idx = (num_assets - 1) - end_idx
+        if asset_type is not None and sort_by_filename:
+            # The assets of each type are stored sorted by filename; so, just slice out the page.
+            if descending:
+                page = all_assets[max(num_assets - end_idx, 0):max(num_assets - start_idx, 0)][::-1]
+            else:
+                page = all_assets[start_idx:end_idx]
+        else:
+            # Only sort as far as the end of the page. Reversing the assets before picking the largest
+            # keeps the assets which sort equally in the same order as an ascending sort, reversed.
+            key_func = itemgetter('filename') if sort_by_filename else lambda x: x['edit_info']['edited_on']
+            if descending:
+                page = heapq.nlargest(end_idx, reversed(all_assets), key=key_func)[start_idx:]
+            else:
+                page = heapq.nsmallest(end_idx, all_assets, key=key_func)[start_idx:]
 
         ret_assets = []
-        for idx in xrange(start_idx, end_idx, step_incr):
-            raw_asset = all_assets[idx]
+        for raw_asset in page:
             asset_key = course_key.make_asset_key(raw_asset['asset_type'], raw_asset['filename'])
             new_asset = AssetMetadata(asset_key)
             new_asset.from_storable(raw_asset)
@@ -1148,6 +1147,30 @@ class ModuleStoreReadBase(BulkOperationsMixin, ModuleStoreRead):
                 return course
         return None
 
+    def get_course_keys(self, **kwargs):
+        """
+        Returns the keys of the courses in this modulestore, accepting the same qualifiers as get_courses
+
+        Default impl--gets the courses
+        """
+        return [course.id for course in self.get_courses(**kwargs)]
+
+    def get_courses_by_ids(self, course_keys, depth=0, **kwargs):
+        """
+        Returns a dict of the given course keys to the courses which exist in this modulestore
+
+        Default impl--gets the courses one by one
+        """
+        courses = {}
+        for course_key in course_keys:
+            try:
+                course = self.get_course(course_key, depth=depth, **kwargs)
+            except ItemNotFoundError:
+                continue
+            if course is not None:
+                courses[course_key] = course
+        return courses
+
     def has_course(self, course_id, ignore_case=False, **kwargs):
         """
         Returns the course_id of the course if it was found, else None
@@ -9,6 +9,8 @@ import logging
 from contextlib import contextmanager
 import itertools
 import functools
+import sys
+import threading
 from contracts import contract, new_contract
 
 from opaque_keys import InvalidKeyError
@@ -95,6 +97,35 @@ def strip_key(func):
     return inner
 
 
+def call_concurrently(functions):
+    """
+    Call the functions, all but the first in their own threads, and return their results in order.
+    Reraises the first error any of them raised.
+    """
+    results = [None] * len(functions)
+    errors = []
+
+    def call(index):
+        """
+        Call the function at index, recording its result or error
+        """
+        try:
+            results[index] = functions[index]()
+        except Exception:  # pylint: disable=broad-except
+            errors.append(sys.exc_info())
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(1, len(functions))]
+    for thread in threads:
+        thread.start()
+    if functions:
+        call(0)
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0][0], errors[0][1], errors[0][2]
+    return results
+
+
 class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
     """
     ModuleStore knows how to route requests to the right persistence ms
@@ -280,6 +311,18 @@ class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
                     courses[course_id] = course
         return courses.values()
 
+    @strip_key
+    def get_course_keys(self, **kwargs):
+        """
+        Returns the keys of the courses in all the modulestores without loading the courses where the
+        modulestores support that.
+        """
+        course_keys = {}
+        for store in self.modulestores:
+            for course_key in store.get_course_keys(**kwargs):
+                course_keys.setdefault(self._clean_locator_for_mapping(course_key), course_key)
+        return course_keys.values()
+
     @strip_key
     def get_libraries(self, **kwargs):
         """
@@ -328,6 +371,54 @@ class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
         except ItemNotFoundError:
             return None
 
+    @strip_key
+    def get_courses_by_ids(self, course_keys, depth=0, **kwargs):
+        """
+        Returns a dict of the given course keys to the course modules of those courses which exist.
+
+        Asks each store for all of its courses at once rather than one by one, running the stores' db
+        queries concurrently. A course not mapped to a store comes from the first store which has it.
+
+        :param course_keys: CourseKeys
+        """
+        course_keys = list(course_keys)
+        mapped_stores = {
+            course_key: self.mappings.get(self._clean_locator_for_mapping(course_key))
+            for course_key in course_keys
+        }
+        fetchers = []
+        results = []
+        for store in self.modulestores:
+            store_keys = [
+                course_key for course_key in course_keys if mapped_stores[course_key] in (None, store)
+            ]
+            if not store_keys:
+                results.append({})
+            elif hasattr(store, '_prepare_courses_by_ids'):
+                # get the data in the thread (bulk operations, branch settings) before fanning out
+                # pylint: disable=protected-access
+                fetchers.append((len(results), store, store._prepare_courses_by_ids(store_keys)))
+                results.append(None)
+            else:
+                results.append(store.get_courses_by_ids(
+                    [course_key for course_key in store_keys if store.has_course(course_key)], depth, **kwargs
+                ))
+
+        fetched = call_concurrently([fetch for __, __, fetch in fetchers])
+        for (index, store, __), store_fetched in zip(fetchers, fetched):
+            # build the xblocks in this thread as they use its request cache
+            # pylint: disable=protected-access
+            results[index] = store._load_courses_by_ids(store_fetched, depth, **kwargs)
+
+        courses = {}
+        for store, store_courses in zip(self.modulestores, results):
+            for course_key, course in store_courses.iteritems():
+                if course_key not in courses:
+                    courses[course_key] = course
+                    # remember where the course is as _get_modulestore_for_courselike does
+                    self.mappings.setdefault(self._clean_locator_for_mapping(course_key), store)
+        return courses
+
     @strip_key
     @contract(library_key='LibraryLocator')
     def get_library(self, library_key, depth=0, **kwargs):
@@ -17,6 +17,9 @@ import sys
 import logging
 import copy
 import re
+import threading
+import time
+from collections import defaultdict, OrderedDict
 from uuid import uuid4
 
 from bson.son import SON
@@ -26,6 +29,7 @@ from mongodb_proxy import MongoProxy, autoretry_read
 from path import path
 from pytz import UTC
 from contracts import contract, new_contract
+import dogstats_wrapper as dog_stats_api
 
 from importlib import import_module
 from opaque_keys.edx.keys import UsageKey, CourseKey, AssetKey
@@ -38,7 +42,7 @@ from xblock.exceptions import InvalidScopeError
 from xblock.fields import Scope, ScopeIds, Reference, ReferenceList, ReferenceValueDict
 from xblock.runtime import KvsFieldData
 
-from xmodule.assetstore import AssetMetadata, CourseAssetsFromStorage
+from xmodule.assetstore import AssetMetadata
 from xmodule.error_module import ErrorDescriptor
 from xmodule.errortracker import null_error_tracker, exc_info_to_str
 from xmodule.exceptions import HeartbeatFailure
@@ -533,6 +537,21 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
 
     # If no name is specified for the asset metadata collection, this name is used.
     DEFAULT_ASSET_COLLECTION_NAME = 'assetstore'
+    # How many asset metadata documents to insert at once when copying a course's assets
+    ASSET_COPY_BATCH_SIZE = 1000
+
+    # Cached metadata inheritance trees are fresh for the cache's timeout, but are kept this many seconds
+    # so that they can be served while one process recomputes them.
+    METADATA_INHERITANCE_STALE_TIMEOUT = 24 * 60 * 60
+    # The most seconds one process may hold the lock to recompute a course's tree
+    METADATA_INHERITANCE_LOCK_TIMEOUT = 60
+    # How many times, and how many seconds apart, to look for the tree another process is computing when
+    # there's none to serve, before computing it locally
+    METADATA_INHERITANCE_POLLS = 2
+    METADATA_INHERITANCE_POLL_INTERVAL = 0.05
+
+    # The fields of the items' records which loading xblocks uses
+    ITEM_FIELDS = {'_id': True, 'definition': True, 'metadata': True, 'edit_info': True}
 
     # TODO (cpennington): Enable non-filesystem filestores
     # pylint: disable=invalid-name
@@ -545,9 +564,15 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
                  user_service=None,
                  signal_handler=None,
                  retry_wait_time=0.1,
+                 single_query_subtrees=False,
+                 course_items_cache_size=0,
                  **kwargs):
         """
         :param doc_store_config: must have a host, db, and collection entries. Other common entries: port, tz_aware.
+        :param single_query_subtrees: if True, loading a course w/ all its descendants (depth=None) gets all
+            of the course's items in one query rather than one (or two, for drafts) per level of the tree
+        :param course_items_cache_size: how many courses' items (see single_query_subtrees) to keep in
+            process for later requests to reuse until the course changes (0 disables the cache)
         """
 
         super(MongoModuleStore, self).__init__(contentstore=contentstore, **kwargs)
@@ -580,6 +605,8 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
             if asset_collection is None:
                 asset_collection = self.DEFAULT_ASSET_COLLECTION_NAME
             self.asset_collection = self.database[asset_collection]
+            # Collection which stores the metadata of each asset in a document of its own.
+            self.asset_metadata_collection = self.database[asset_collection + '.metadata']
 
             if user is not None and password is not None:
                 self.database.authenticate(user, password)
@@ -605,6 +632,12 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
         self._course_run_cache = {}
         self.signal_handler = signal_handler
 
+        self.single_query_subtrees = single_query_subtrees
+        self.course_items_cache_size = course_items_cache_size
+        # (course key, branch) -> (course version, items) (see _get_course_items)
+        self._course_items_cache = OrderedDict()
+        self._course_items_lock = threading.Lock()
+
     def close_connections(self):
         """
         Closes any open connections to the underlying database
@@ -676,18 +709,23 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
         else:
             return ParentLocationCache()
 
-    def _compute_metadata_inheritance_tree(self, course_id):
-        '''
-        Find all inheritable fields from all xblocks in the course which may define inheritable data
-        '''
+    def _find_metadata_inheritance_records(self, course_id, names=None):
+        """
+        Query the course's xblocks which may have children for their children and inheritable metadata,
+        and return them by location url (merging the draft and published records' children) along with
+        the root's url.
+
+        names: if given, only query the xblocks with these names
+        """
         # get all collections in the course, this query should not return any leaf nodes
-        course_id = self.fill_in_run(course_id)
         query = SON([
             ('_id.tag', 'i4x'),
             ('_id.org', course_id.org),
             ('_id.course', course_id.course),
             ('_id.category', {'$in': BLOCK_TYPES_WITH_CHILDREN})
         ])
+        if names is not None:
+            query['_id.name'] = {'$in': list(names)}
         # if we're only dealing in the published branch, then only get published containers
         if self.get_branch_setting() == ModuleStoreEnum.Branch.published_only:
             query['_id.revision'] = None
@@ -726,43 +764,113 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
                 results_by_url[location_url] = result
             if location.category == 'course':
                 root = location_url
+        return results_by_url, root
 
-        # now traverse the tree and compute down the inherited metadata
-        metadata_to_inherit = {}
+    def _inherit_metadata_down(self, results_by_url, url, metadata_to_inherit):
+        """
+        Add what each descendant of url inherits to metadata_to_inherit (see _compute_metadata_inheritance_tree)
+        """
+        my_metadata = results_by_url[url].get('metadata', {})
 
-        def _compute_inherited_metadata(url):
-            """
-            Helper method for computing inherited metadata for a specific location url
-            """
-            my_metadata = results_by_url[url].get('metadata', {})
-
-            # go through all the children and recurse, but only if we have
-            # in the result set. Remember results will not contain leaf nodes
-            for child in results_by_url[url].get('definition', {}).get('children', []):
-                if child in results_by_url:
-                    new_child_metadata = copy.deepcopy(my_metadata)
-                    new_child_metadata.update(results_by_url[child].get('metadata', {}))
-                    results_by_url[child]['metadata'] = new_child_metadata
-                    metadata_to_inherit[child] = new_child_metadata
-                    _compute_inherited_metadata(child)
-                else:
-                    # this is likely a leaf node, so let's record what metadata we need to inherit
-                    metadata_to_inherit[child] = my_metadata.copy()
-                # WARNING: 'parent' is not part of inherited metadata, but
-                # we're piggybacking on this recursive traversal to grab
-                # and cache the child's parent, as a performance optimization.
-                # The 'parent' key will be popped out of the dictionary during
-                # CachingDescriptorSystem.load_item
-                metadata_to_inherit[child].setdefault('parent', {})[self.get_branch_setting()] = url
+        # go through all the children and recurse, but only if we have
+        # in the result set. Remember results will not contain leaf nodes
+        for child in results_by_url[url].get('definition', {}).get('children', []):
+            if child in results_by_url:
+                new_child_metadata = copy.deepcopy(my_metadata)
+                new_child_metadata.update(results_by_url[child].get('metadata', {}))
+                results_by_url[child]['metadata'] = new_child_metadata
+                metadata_to_inherit[child] = new_child_metadata
+                self._inherit_metadata_down(results_by_url, child, metadata_to_inherit)
+            else:
+                # this is likely a leaf node, so let's record what metadata we need to inherit
+                metadata_to_inherit[child] = my_metadata.copy()
+            # WARNING: 'parent' is not part of inherited metadata, but
+            # we're piggybacking on this recursive traversal to grab
+            # and cache the child's parent, as a performance optimization.
+            # The 'parent' key will be popped out of the dictionary during
+            # CachingDescriptorSystem.load_item
+            metadata_to_inherit[child].setdefault('parent', {})[self.get_branch_setting()] = url
+
+    def _compute_metadata_inheritance_tree(self, course_id):
+        '''
+        Find all inheritable fields from all xblocks in the course which may define inheritable data
+        '''
+        course_id = self.fill_in_run(course_id)
+        results_by_url, root = self._find_metadata_inheritance_records(course_id)
 
+        # now traverse the tree and compute down the inherited metadata
+        metadata_to_inherit = {}
         if root is not None:
-            _compute_inherited_metadata(root)
+            self._inherit_metadata_down(results_by_url, root, metadata_to_inherit)
 
         return metadata_to_inherit
 
+    def _compute_metadata_inheritance_subtree(self, course_id, tree, xblock):
+        """
+        Return a copy of the metadata inheritance tree updated for the changes to just the inheritable
+        metadata of the xblock (i.e., only the xblock's subtree is recomputed); or, None if that's not
+        enough (e.g., the xblock's children changed) and the whole tree needs computing.
+        """
+        branch = self.get_branch_setting()
+        children = defaultdict(set)
+        for url, metadata in tree.iteritems():
+            parent_url = metadata.get('parent', {}).get(branch)
+            if parent_url is not None:
+                children[parent_url].add(url)
+
+        location_url = unicode(as_published(xblock.location))
+        if xblock.location.category not in BLOCK_TYPES_WITH_CHILDREN:
+            # nothing inherits from it
+            return tree
+        if set(unicode(as_published(child)) for child in xblock.children) != children[location_url]:
+            return None
+
+        # the root's subtree is the whole tree
+        parent_url = tree.get(location_url, {}).get('parent', {}).get(branch)
+        if parent_url is None:
+            return None
+        # what the xblock inherits hasn't changed
+        inherited = {
+            field_name: value
+            for field_name, value in tree.get(parent_url, {}).iteritems()
+            if field_name != 'parent'
+        }
+
+        subtree = set()
+        to_visit = [location_url]
+        while to_visit:
+            url = to_visit.pop()
+            if url not in subtree:
+                subtree.add(url)
+                to_visit.extend(children[url])
+        results_by_url, __ = self._find_metadata_inheritance_records(
+            course_id, set(UsageKey.from_string(url).name for url in subtree)
+        )
+        results_by_url = {url: result for url, result in results_by_url.iteritems() if url in subtree}
+        if location_url not in results_by_url:
+            return None
+        for result in results_by_url.itervalues():
+            if not subtree.issuperset(result.get('definition', {}).get('children', [])):
+                # the cached tree is out of date
+                return None
+
+        inherited.update(results_by_url[location_url].get('metadata', {}))
+        results_by_url[location_url]['metadata'] = inherited
+        metadata_to_inherit = {}
+        self._inherit_metadata_down(results_by_url, location_url, metadata_to_inherit)
+
+        tree = dict(tree)
+        tree[location_url] = dict(inherited, parent=tree[location_url]['parent'])
+        tree.update(metadata_to_inherit)
+        return tree
+
     def _get_cached_metadata_inheritance_tree(self, course_id, force_refresh=False):
         '''
         Compute the metadata inheritance for the course.
+
+        The trees are shared between processes in the metadata_inheritance_cache_subsystem (e.g., memcached).
+        Once a tree is older than the cache's timeout, only one process recomputes it while the others keep
+        serving the old one.
         '''
         tree = {}
 
@@ -774,7 +882,7 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
 
             # then look in any caching subsystem (e.g. memcached)
             if self.metadata_inheritance_cache_subsystem is not None:
-                tree = self.metadata_inheritance_cache_subsystem.get(unicode(course_id), {})
+                tree = self._get_shared_metadata_inheritance_tree(course_id)
             else:
                 logging.warning(
                     'Running MongoModuleStore without a metadata_inheritance_cache_subsystem. This is \
@@ -786,12 +894,15 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
             tree = self._compute_metadata_inheritance_tree(course_id)
 
             # now write out computed tree to caching subsystem (e.g. memcached), if available
-            if self.metadata_inheritance_cache_subsystem is not None:
-                self.metadata_inheritance_cache_subsystem.set(unicode(course_id), tree)
+            self._set_shared_metadata_inheritance_tree(course_id, tree)
+
+        self._set_request_metadata_inheritance_tree(course_id, tree)
+        return tree
 
-        # now populate a request_cache, if available. NOTE, we are outside of the
-        # scope of the above if: statement so that after a memcache hit, it'll get
-        # put into the request_cache
+    def _set_request_metadata_inheritance_tree(self, course_id, tree):
+        """
+        Populate the request_cache, if available, w/ the course's tree
+        """
         if self.request_cache is not None:
             # we can't assume the 'metadatat_inheritance' part of the request cache dict has been
             # defined
@@ -799,23 +910,125 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
                 self.request_cache.data['metadata_inheritance'] = {}
             self.request_cache.data['metadata_inheritance'][unicode(course_id)] = tree
 
-        return tree
+    def _get_shared_metadata_inheritance_entry(self, course_id):
+        """
+        Return the (expiration time, tree) cached for the course in the metadata_inheritance_cache_subsystem.
+        The expiration time is None if the tree never expires, and the tree is None if there isn't one.
+        """
+        entry = self.metadata_inheritance_cache_subsystem.get(unicode(course_id))
+        if isinstance(entry, tuple):
+            return entry[0], entry[1] or None
+        # trees cached before they had expiration times are out of date
+        return 0, entry or None
+
+    def _set_shared_metadata_inheritance_tree(self, course_id, tree, expires=False):
+        """
+        Cache the course's tree in the metadata_inheritance_cache_subsystem, if available, to be fresh until
+        expires (defaults to the cache's timeout from now; caches w/o timeouts never expire).
+        """
+        cache = self.metadata_inheritance_cache_subsystem
+        if cache is None:
+            return
+        fresh_timeout = getattr(cache, 'default_timeout', None)
+        if fresh_timeout is None:
+            cache.set(unicode(course_id), (None, tree))
+            return
+        if expires is False:
+            expires = time.time() + fresh_timeout
+        cache.set(
+            unicode(course_id), (expires, tree), max(fresh_timeout, self.METADATA_INHERITANCE_STALE_TIMEOUT)
+        )
 
-    def refresh_cached_metadata_inheritance_tree(self, course_id, runtime=None):
+    def _get_shared_metadata_inheritance_tree(self, course_id):
+        """
+        Return the course's tree from the metadata_inheritance_cache_subsystem, recomputing it if it's out of
+        date and no other process is already recomputing it. Returns None if there's no tree and no other
+        process computed one within a couple of brief polls, so a stuck process can't hold up the request.
+        """
+        cache = self.metadata_inheritance_cache_subsystem
+        expires, tree = self._get_shared_metadata_inheritance_entry(course_id)
+        if tree is not None and (expires is None or time.time() < expires):
+            self._increment_metadata_inheritance_metric('hit', course_id)
+            return tree
+
+        # only one process at a time recomputes the tree (caches which can't lock let them all compute)
+        lock_key = u'{}.lock'.format(course_id)
+        if not hasattr(cache, 'add') or cache.add(lock_key, True, self.METADATA_INHERITANCE_LOCK_TIMEOUT):
+            self._increment_metadata_inheritance_metric('recompute', course_id)
+            try:
+                tree = self._compute_metadata_inheritance_tree(course_id)
+                self._set_shared_metadata_inheritance_tree(course_id, tree)
+            finally:
+                if hasattr(cache, 'delete'):
+                    cache.delete(lock_key)
+            return tree
+
+        if tree is not None:
+            self._increment_metadata_inheritance_metric('stale', course_id)
+            return tree
+
+        # wait for the process which is computing it
+        for __ in xrange(self.METADATA_INHERITANCE_POLLS):
+            time.sleep(self.METADATA_INHERITANCE_POLL_INTERVAL)
+            __, tree = self._get_shared_metadata_inheritance_entry(course_id)
+            if tree is not None:
+                self._increment_metadata_inheritance_metric('wait', course_id)
+                return tree
+        self._increment_metadata_inheritance_metric('miss', course_id)
+        return None
+
+    @staticmethod
+    def _increment_metadata_inheritance_metric(result, course_id):
+        """
+        Count how the metadata inheritance cache served the course's tree
+        """
+        dog_stats_api.increment(
+            'mongo_metadata_inheritance.{}'.format(result),
+            tags=[u'course_id:{}'.format(course_id)],
+        )
+
+    def refresh_cached_metadata_inheritance_tree(self, course_id, runtime=None, xblock=None):
         """
         Refresh the cached metadata inheritance tree for the org/course combination
         for location
 
         If given a runtime, it replaces the cached_metadata in that runtime. NOTE: failure to provide
         a runtime may mean that some objects report old values for inherited data.
+
+        If given the xblock whose update prompted the refresh, only its subtree is recomputed when possible.
         """
         course_id = course_id.for_branch(None)
         if not self._is_in_bulk_operation(course_id):
-            # below is done for side effects when runtime is None
-            cached_metadata = self._get_cached_metadata_inheritance_tree(course_id, force_refresh=True)
+            cached_metadata = None
+            if xblock is not None:
+                cached_metadata = self._refresh_metadata_inheritance_subtree(course_id, xblock)
+            if cached_metadata is None:
+                # below is done for side effects when runtime is None
+                cached_metadata = self._get_cached_metadata_inheritance_tree(course_id, force_refresh=True)
             if runtime:
                 runtime.cached_metadata = cached_metadata
 
+    def _refresh_metadata_inheritance_subtree(self, course_id, xblock):
+        """
+        Update the cached tree for the changes to just the xblock's inheritable metadata, and return it; or,
+        return None if there's no cached tree to update or the whole tree needs recomputing.
+        """
+        if self.metadata_inheritance_cache_subsystem is None:
+            return None
+        course_id = self.fill_in_run(course_id)
+        expires, tree = self._get_shared_metadata_inheritance_entry(course_id)
+        if tree is None:
+            return None
+        new_tree = self._compute_metadata_inheritance_subtree(course_id, tree, xblock)
+        if new_tree is None:
+            return None
+        self._increment_metadata_inheritance_metric('incremental', course_id)
+        if new_tree is not tree:
+            # keep the expiration time so that any concurrent update this one overwrote is redone in time
+            self._set_shared_metadata_inheritance_tree(course_id, new_tree, expires)
+        self._set_request_metadata_inheritance_tree(course_id, new_tree)
+        return new_tree
+
     def _clean_item_data(self, item):
         """
         Renames the '_id' field in item to 'location'
@@ -824,17 +1037,87 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
         del item['_id']
 
     @autoretry_read()
-    def _query_children_for_cache_children(self, course_key, items):
+    def _query_children_for_cache_children(self, course_key, items, course_items=None):
         """
         Generate a pymongo in query for finding the items and return the payloads
+
+        course_items: if given, the course's items (see _get_course_items) to look the items up in rather
+            than querying
         """
         # first get non-draft in a round-trip
-        query = {
-            '_id': {'$in': [
-                course_key.make_usage_key_from_deprecated_string(item).to_deprecated_son() for item in items
-            ]}
+        return self._find_items(
+            [course_key.make_usage_key_from_deprecated_string(item).to_deprecated_son() for item in items],
+            course_items
+        )
+
+    def _find_items(self, ids, course_items=None):
+        """
+        Return the records of the items w/ the given _ids (deprecated sons) which exist, looking them up in
+        course_items (see _get_course_items), if given, rather than querying.
+        """
+        if course_items is None:
+            return list(self.collection.find({'_id': {'$in': ids}}))
+        # copy as loading the xblocks changes their records
+        return [
+            copy.deepcopy(course_items[key])
+            for key in set(self._item_key(item_id) for item_id in ids)
+            if key in course_items
+        ]
+
+    @staticmethod
+    def _item_key(item_id):
+        """
+        Return the key for the item w/ the _id (a deprecated son) among its course's items
+        """
+        return item_id['category'], item_id['name'], item_id.get('revision')
+
+    def _get_course_items(self, course_key):
+        """
+        Return all of the course's items for the current branch, got in one query, as a dict of _item_key
+        to the item's record. The items are reused from the cache (if enabled) until the course's version
+        (see _get_course_version) changes. Never change the records.
+        """
+        course_query = self._course_key_to_son(course_key)
+        branch = self.get_branch_setting()
+        if branch == ModuleStoreEnum.Branch.published_only:
+            course_query['_id.revision'] = None
+
+        cache_key = (unicode(course_key), branch)
+        version = None
+        if self.course_items_cache_size > 0:
+            version = self._get_course_version(course_key, course_query)
+            with self._course_items_lock:
+                cached = self._course_items_cache.pop(cache_key, None)
+                if cached is not None:
+                    # mark it as the most recently used
+                    self._course_items_cache[cache_key] = cached
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+        # iterate the cursor rather than making a list of the records so that they're only held once
+        course_items = {
+            self._item_key(item['_id']): item
+            for item in self.collection.find(course_query, fields=self.ITEM_FIELDS)
         }
-        return list(self.collection.find(query))
+
+        if version is not None:
+            with self._course_items_lock:
+                self._course_items_cache[cache_key] = (version, course_items)
+                while len(self._course_items_cache) > self.course_items_cache_size:
+                    self._course_items_cache.popitem(last=False)
+        return course_items
+
+    def _get_course_version(self, course_key, course_query):
+        """
+        Return a value which changes whenever the course's items matching course_query change: the course's
+        edit info (whose subtree edit time every update bumps) and the number of items (which removals
+        change).
+        """
+        course = self.collection.find_one(
+            {'_id': course_key.make_usage_key('course', course_key.run).to_deprecated_son()},
+            fields={'edit_info': True},
+        )
+        return (course or {}).get('edit_info'), self.collection.find(course_query).count()
 
     def _cache_children(self, course_key, items, depth=0):
         """
@@ -842,7 +1125,8 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
         for all descendents of items up to the specified depth.
         (0 = no descendents, 1 = children, 2 = grandchildren, etc)
         If depth is None, will load all the children.
-        This will make a number of queries that is linear in the depth.
+        This will make a number of queries that is linear in the depth (or, if single_query_subtrees and
+        depth is None for a course, one for the whole course).
         """
 
         data = {}
@@ -850,6 +1134,13 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
         course_key = self.fill_in_run(course_key)
         parent_cache = self._get_parent_cache(self.get_branch_setting())
 
+        course_items = None
+        if self.single_query_subtrees and depth is None and (
+            self.course_items_cache_size > 0 or any(item['_id']['category'] == 'course' for item in items)
+        ):
+            # the whole course (or one which is cached anyway) is cheaper to get at once than level by level
+            course_items = self._get_course_items(course_key)
+
         while to_process and depth is None or depth >= 0:
             children = []
             for item in to_process:
@@ -869,7 +1160,7 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
             # for or-query syntax
             to_process = []
             if children:
-                to_process = self._query_children_for_cache_children(course_key, children)
+                to_process = self._query_children_for_cache_children(course_key, children, course_items)
 
             # If depth is None, then we just recurse until we hit all the descendents
             if depth is not None:
@@ -1008,6 +1299,23 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
         )
         return [course for course in base_list if not isinstance(course, ErrorDescriptor)]
 
+    def get_course_keys(self, **kwargs):
+        """
+        Returns the keys of the courses in this modulestore without loading the courses. Accepts the
+        optional 'org' filter of get_courses.
+        """
+        course_query = {'_id.category': 'course'}
+        if kwargs.get('org'):
+            course_query['_id.org'] = kwargs['org']
+        return [
+            SlashSeparatedCourseKey(course['_id']['org'], course['_id']['course'], course['_id']['name'])
+            for course in self.collection.find(course_query, fields={'_id': True})
+            if not (  # TODO kill this
+                course['_id']['org'] == 'edx' and
+                course['_id']['course'] == 'templates'
+            )
+        ]
+
     def _find_one(self, location):
         '''Look for a given location in the collection. If the item is not present, raise
         ItemNotFoundError.
@@ -1041,6 +1349,53 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
         except ItemNotFoundError:
             return None
 
+    def get_courses_by_ids(self, course_keys, depth=0, **kwargs):
+        """
+        Returns a dict of the given course keys to the course descriptors of those courses which exist
+        in this modulestore, getting all of the courses in one query.
+        """
+        return self._load_courses_by_ids(self._prepare_courses_by_ids(course_keys)(), depth, **kwargs)
+
+    def _prepare_courses_by_ids(self, course_keys):
+        """
+        Return a function which gets the records of the given courses from the db for _load_courses_by_ids.
+        The function doesn't use any thread state so it may be run in another thread.
+        """
+        locations = {}
+        for course_key in course_keys:
+            if isinstance(course_key, LibraryLocator):
+                continue  # Libraries require split mongo
+            filled_key = self.fill_in_run(course_key)
+            locations[course_key] = filled_key.make_usage_key('course', filled_key.run)
+
+        def fetch():
+            """
+            Return the course keys, the locations, and the records of the courses which exist
+            """
+            if not locations:
+                return []
+            records = {
+                (record['_id']['org'], record['_id']['course'], record['_id']['name']): record
+                for record in self.collection.find(
+                    {'_id': {'$in': [location.to_deprecated_son() for location in locations.itervalues()]}}
+                )
+            }
+            return [
+                (course_key, location, records[(location.org, location.course, location.name)])
+                for course_key, location in locations.iteritems()
+                if (location.org, location.course, location.name) in records
+            ]
+        return fetch
+
+    def _load_courses_by_ids(self, fetched, depth=0, **kwargs):
+        """
+        Load the course descriptors from the result of a _prepare_courses_by_ids function
+        """
+        return {
+            course_key: self._load_items(location.course_key, [record], depth)[0]
+            for course_key, location, record in fetched
+        }
+
     def has_course(self, course_key, ignore_case=False, **kwargs):
         """
         Returns the course_id of the course if it was found, else None
@@ -1463,7 +1818,9 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
             xblock._edit_info = payload['edit_info']
 
             # recompute (and update) the metadata inheritance tree which is cached
-            self.refresh_cached_metadata_inheritance_tree(xblock.scope_ids.usage_id.course_key, xblock.runtime)
+            self.refresh_cached_metadata_inheritance_tree(
+                xblock.scope_ids.usage_id.course_key, xblock.runtime, xblock
+            )
             # fire signal that we've written to DB
         except ItemNotFoundError:
             if not allow_not_found:
@@ -1683,58 +2040,145 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
         field_data = KvsFieldData(kvs)
         return field_data
 
-    def _find_course_assets(self, course_key):
+    def _course_assets_query(self, course_key):
         """
-        Internal; finds (or creates) course asset info about all assets for a particular course
+        Internal; returns the query which matches the metadata documents of all of a course's assets,
+        raising ItemNotFoundError if the course doesn't exist.
+
+        Each asset's metadata is a document of its own in the asset metadata collection. The course's
+        document in the asset collection only marks that the course has asset metadata; if it still holds
+        the course's assets in the old format (lists of metadata by asset type), they're moved out first.
 
         Arguments:
             course_key (CourseKey): course identifier
-
-        Returns:
-            CourseAssetsFromStorage object, wrapping the relevant Mongo doc. If asset metadata
-            exists, other keys will be the other asset types with values as lists of asset metadata.
         """
         # Using the course_key, find or insert the course asset metadata document.
-        # A single document exists per course to store the course asset metadata.
+        # A single document exists per course to mark its asset metadata.
         course_key = self.fill_in_run(course_key)
         if course_key.run is None:
             log.warning(u'No run found for combo org "{}" course "{}" on asset request.'.format(
                 course_key.org, course_key.course
             ))
-            course_assets = None
-        else:
-            # Complete course key, so query for asset metadata.
-            course_assets = self.asset_collection.find_one(
-                {'course_id': unicode(course_key)},
-            )
+            raise ItemNotFoundError(course_key)
 
-        doc_id = None if course_assets is None else course_assets['_id']
+        course_id = unicode(course_key)
+        course_assets = self.asset_collection.find_one({'course_id': course_id})
         if course_assets is None:
             # Check to see if the course is created in the course collection.
             if self.get_course(course_key) is None:
                 raise ItemNotFoundError(course_key)
-            else:
-                # Course exists, so create matching assets document.
-                course_assets = {'course_id': unicode(course_key), 'assets': {}}
-                doc_id = self.asset_collection.insert(course_assets)
-        elif isinstance(course_assets['assets'], list):
-            # This record is in the old course assets format.
-            # Ensure that no data exists before updating the format.
-            assert len(course_assets['assets']) == 0
-            # Update the format to a dict.
-            self.asset_collection.update(
-                {'_id': doc_id},
-                {'$set': {'assets': {}}}
-            )
+            # Course exists, so create matching assets document.
+            self.asset_collection.insert({'course_id': course_id, 'assets': {}})
+        elif course_assets['assets']:
+            self._move_course_assets(course_id, course_assets)
+
+        return {'course_id': course_id}
+
+    def _move_course_assets(self, course_id, course_assets):
+        """
+        Internal; moves the asset metadata out of a course's document in the old format, in which
+        'assets' holds lists of storable asset metadata by asset type, into documents of their own.
+        """
+        asset_docs = []
+        # A list is the oldest format, which never held any assets.
+        if isinstance(course_assets['assets'], dict):
+            for assets in course_assets['assets'].itervalues():
+                for asset in assets:
+                    asset_doc = dict(asset)
+                    asset_doc['course_id'] = course_id
+                    asset_docs.append(asset_doc)
+        if asset_docs:
+            try:
+                self.asset_metadata_collection.insert(asset_docs, continue_on_error=True)
+            except pymongo.errors.DuplicateKeyError:
+                # Another process moved them at the same time; its documents are the same.
+                pass
+        self.asset_collection.update(
+            {'_id': course_assets['_id']},
+            {'$set': {'assets': {}}}
+        )
 
-        # Pass back wrapped 'assets' dict with the '_id' key added to it for document update purposes.
-        return CourseAssetsFromStorage(course_key, doc_id, course_assets['assets'])
+    def _asset_query(self, asset_key):
+        """
+        Internal; returns the query which matches the metadata document of the given asset.
+        """
+        query = self._course_assets_query(asset_key.course_key)
+        query['asset_type'] = asset_key.asset_type
+        query['filename'] = asset_key.path
+        return query
 
-    def _make_mongo_asset_key(self, asset_type):
+    @contract(asset_key='AssetKey')
+    def find_asset_metadata(self, asset_key, **kwargs):
         """
-        Given a asset type, form a key needed to update the proper embedded field in the Mongo doc.
+        Find the metadata for a particular course asset.
+
+        Arguments:
+            asset_key (AssetKey): key containing original asset filename
+
+        Returns:
+            asset metadata (AssetMetadata) -or- None if not found
         """
-        return 'assets.{}'.format(asset_type)
+        asset_doc = self.asset_metadata_collection.find_one(self._asset_query(asset_key))
+        if asset_doc is None:
+            return None
+
+        mdata = AssetMetadata(asset_key, asset_key.path, **kwargs)
+        mdata.from_storable(asset_doc)
+        return mdata
+
+    @contract(
+        course_key='CourseKey', asset_type='None | basestring',
+        start='int | None', maxresults='int | None', sort='tuple(str,(int,>=1,<=2))|None'
+    )
+    def get_all_asset_metadata(self, course_key, asset_type, start=0, maxresults=-1, sort=None, **kwargs):
+        """
+        Returns a list of asset metadata for all assets of the given asset_type in the course. The
+        sorting, filtering by type and paging all happen in the query.
+
+        Args:
+            course_key (CourseKey): course identifier
+            asset_type (str): the block_type of the assets to return. If None, return assets of all types.
+            start (int): optional - start at this asset number. Zero-based!
+            maxresults (int): optional - return at most this many, -1 means no limit
+            sort (array): optional - None means no sort
+                (sort_by (str), sort_order (str))
+                sort_by - one of 'uploadDate' or 'displayname'
+                sort_order - one of SortOrder.ascending or SortOrder.descending
+
+        Returns:
+            List of AssetMetadata objects.
+        """
+        query = self._course_assets_query(course_key)
+        if asset_type is not None:
+            query['asset_type'] = asset_type
+        if maxresults == 0:
+            # A limit of 0 means no limit to Mongo.
+            return []
+
+        # Determine the proper sort - with defaults of ('displayname', SortOrder.ascending).
+        sort_field = 'filename'
+        direction = pymongo.ASCENDING
+        if sort:
+            if sort[0] == 'uploadDate':
+                sort_field = 'edit_info.edited_on'
+            if sort[1] == ModuleStoreEnum.SortOrder.descending:
+                direction = pymongo.DESCENDING
+
+        sort_keys = [(sort_field, direction)]
+        if sort_field != 'filename' or asset_type is None:
+            # Break ties in the order the assets were first saved.
+            sort_keys.append(('_id', direction))
+        cursor = self.asset_metadata_collection.find(query).sort(sort_keys).skip(start)
+        if maxresults > 0:
+            cursor = cursor.limit(maxresults)
+
+        ret_assets = []
+        for asset_doc in cursor:
+            asset_key = course_key.make_asset_key(asset_doc['asset_type'], asset_doc['filename'])
+            new_asset = AssetMetadata(asset_key)
+            new_asset.from_storable(asset_doc)
+            ret_assets.append(new_asset)
+        return ret_assets
 
     @contract(asset_metadata_list='list(AssetMetadata)', user_id='int|long')
     def _save_asset_metadata_list(self, asset_metadata_list, user_id, import_only):
@@ -1747,19 +2191,28 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
             import_only (bool): True if edited_on/by data should remain unchanged.
         """
         course_key = asset_metadata_list[0].asset_id.course_key
-        course_assets = self._find_course_assets(course_key)
-        assets_by_type = self._save_assets_by_type(course_key, asset_metadata_list, course_assets, user_id, import_only)
-
-        # Build an update set with potentially multiple embedded fields.
-        updates_by_type = {}
-        for asset_type, assets in assets_by_type.iteritems():
-            updates_by_type[self._make_mongo_asset_key(asset_type)] = assets.as_list()
-
-        # Update the document.
-        self.asset_collection.update(
-            {'_id': course_assets.doc_id},
-            {'$set': updates_by_type}
-        )
+        course_query = self._course_assets_query(course_key)
+
+        # Insert or replace each asset's document in one round trip.
+        bulk = self.asset_metadata_collection.initialize_unordered_bulk_op()
+        has_updates = False
+        for asset_md in asset_metadata_list:
+            if asset_md.asset_id.course_key != course_key:
+                # pylint: disable=logging-format-interpolation
+                log.warning("Asset's course {} does not match other assets for course {} - not saved.".format(
+                    asset_md.asset_id.course_key, course_key
+                ))
+                continue
+            if not import_only:
+                asset_md.update({'edited_by': user_id, 'edited_on': datetime.now(UTC)})
+            asset_doc = asset_md.to_storable()
+            asset_doc.update(course_query)
+            bulk.find(
+                dict(course_query, asset_type=asset_doc['asset_type'], filename=asset_doc['filename'])
+            ).upsert().replace_one(asset_doc)
+            has_updates = True
+        if has_updates:
+            bulk.execute()
         return True
 
     @contract(asset_metadata='AssetMetadata', user_id='int|long')
@@ -1804,11 +2257,25 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
             source_course_key (CourseKey): identifier of course to copy from
             dest_course_key (CourseKey): identifier of course to copy to
         """
-        source_assets = self._find_course_assets(source_course_key)
-        dest_assets = {'assets': source_assets.asset_md.copy(), 'course_id': unicode(dest_course_key)}
-        self.asset_collection.remove({'course_id': unicode(dest_course_key)})
-        # Update the document.
-        self.asset_collection.insert(dest_assets)
+        source_query = self._course_assets_query(source_course_key)
+        dest_course_id = unicode(dest_course_key)
+        # The destination course may not exist yet, as when cloning; so, mark its assets directly.
+        self.asset_collection.update(
+            {'course_id': dest_course_id},
+            {'$set': {'assets': {}}},
+            upsert=True
+        )
+        self.asset_metadata_collection.remove({'course_id': dest_course_id})
+
+        dest_docs = []
+        for asset_doc in self.asset_metadata_collection.find(source_query, {'_id': False}):
+            asset_doc['course_id'] = dest_course_id
+            dest_docs.append(asset_doc)
+            if len(dest_docs) == self.ASSET_COPY_BATCH_SIZE:
+                self.asset_metadata_collection.insert(dest_docs)
+                dest_docs = []
+        if dest_docs:
+            self.asset_metadata_collection.insert(dest_docs)
 
     @contract(asset_key='AssetKey', attr_dict=dict, user_id='int|long')
     def set_asset_metadata_attrs(self, asset_key, attr_dict, user_id):
@@ -1823,22 +2290,19 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
             ItemNotFoundError if no such item exists
             AttributeError is attr is one of the build in attrs.
         """
-        course_assets, asset_idx = self._find_course_asset(asset_key)
-        if asset_idx is None:
+        asset_doc = self.asset_metadata_collection.find_one(self._asset_query(asset_key))
+        if asset_doc is None:
             raise ItemNotFoundError(asset_key)
 
         # Form an AssetMetadata.
-        all_assets = course_assets[asset_key.asset_type]
         md = AssetMetadata(asset_key, asset_key.path)
-        md.from_storable(all_assets[asset_idx])
+        md.from_storable(asset_doc)
         md.update(attr_dict)
 
-        # Generate a Mongo doc from the metadata and update the course asset info.
-        all_assets[asset_idx] = md.to_storable()
-
-        self.asset_collection.update(
-            {'_id': course_assets.doc_id},
-            {"$set": {self._make_mongo_asset_key(asset_key.asset_type): all_assets}}
+        # Generate a Mongo doc from the metadata and update the asset's document.
+        self.asset_metadata_collection.update(
+            {'_id': asset_doc['_id']},
+            {'$set': md.to_storable()}
         )
 
     @contract(asset_key='AssetKey', user_id='int|long')
@@ -1852,19 +2316,8 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
         Returns:
             Number of asset metadata entries deleted (0 or 1)
         """
-        course_assets, asset_idx = self._find_course_asset(asset_key)
-        if asset_idx is None:
-            return 0
-
-        all_asset_info = course_assets[asset_key.asset_type]
-        all_asset_info.pop(asset_idx)
-
-        # Update the document.
-        self.asset_collection.update(
-            {'_id': course_assets.doc_id},
-            {'$set': {self._make_mongo_asset_key(asset_key.asset_type): all_asset_info}}
-        )
-        return 1
+        result = self.asset_metadata_collection.remove(self._asset_query(asset_key))
+        return result['n']
 
     # pylint: disable=unused-argument
     @contract(course_key='CourseKey', user_id='int|long')
@@ -1875,14 +2328,13 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
         Arguments:
             course_key (CourseKey): course_identifier
         """
-        # Using the course_id, find the course asset metadata document.
-        # A single document exists per course to store the course asset metadata.
         try:
-            course_assets = self._find_course_assets(course_key)
-            self.asset_collection.remove(course_assets.doc_id)
+            course_query = self._course_assets_query(course_key)
         except ItemNotFoundError:
             # When deleting asset metadata, if a course's asset metadata is not present, no big deal.
-            pass
+            return
+        self.asset_metadata_collection.remove(course_query)
+        self.asset_collection.remove(course_query)
 
     def heartbeat(self):
         """
@@ -1919,6 +2371,31 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
         # To allow prioritizing draft vs published material
         self.collection.create_index('_id.revision')
 
+        # To find a course's asset metadata documents, by type and filename, and to sort and page them
+        # by filename or upload date, with or without filtering by type:
+        self.asset_collection.create_index('course_id')
+        self.asset_metadata_collection.create_index([
+            ('course_id', pymongo.ASCENDING),
+            ('asset_type', pymongo.ASCENDING),
+            ('filename', pymongo.ASCENDING),
+        ], unique=True)
+        self.asset_metadata_collection.create_index([
+            ('course_id', pymongo.ASCENDING),
+            ('asset_type', pymongo.ASCENDING),
+            ('edit_info.edited_on', pymongo.ASCENDING),
+            ('_id', pymongo.ASCENDING),
+        ])
+        self.asset_metadata_collection.create_index([
+            ('course_id', pymongo.ASCENDING),
+            ('filename', pymongo.ASCENDING),
+            ('_id', pymongo.ASCENDING),
+        ])
+        self.asset_metadata_collection.create_index([
+            ('course_id', pymongo.ASCENDING),
+            ('edit_info.edited_on', pymongo.ASCENDING),
+            ('_id', pymongo.ASCENDING),
+        ])
+
     # Some overrides that still need to be implemented by subclasses
     def convert_to_draft(self, location, user_id):
         raise NotImplementedError()
@@ -801,9 +801,15 @@ class DraftModuleStore(MongoModuleStore):
 
         delete_draft_only(location)
 
-    def _query_children_for_cache_children(self, course_key, items):
+    def _load_courses_by_ids(self, fetched, depth=0, **kwargs):
+        courses = super(DraftModuleStore, self)._load_courses_by_ids(fetched, depth, **kwargs)
+        return {course_key: wrap_draft(course) for course_key, course in courses.iteritems()}
+
+    def _query_children_for_cache_children(self, course_key, items, course_items=None):
         # first get non-draft in a round-trip
-        to_process_non_drafts = super(DraftModuleStore, self)._query_children_for_cache_children(course_key, items)
+        to_process_non_drafts = super(DraftModuleStore, self)._query_children_for_cache_children(
+            course_key, items, course_items
+        )
 
         to_process_dict = {}
         for non_draft in to_process_non_drafts:
@@ -817,8 +823,7 @@ class DraftModuleStore(MongoModuleStore):
                 if item_usage_key.category not in DIRECT_ONLY_CATEGORIES:
                     query.append(as_draft(item_usage_key).to_deprecated_son())
             if query:
-                query = {'_id': {'$in': query}}
-                to_process_drafts = list(self.collection.find(query))
+                to_process_drafts = self._find_items(query, course_items)
 
                 # now we have to go through all drafts and replace the non-draft
                 # with the draft. This is because the semantics of the DraftStore is to
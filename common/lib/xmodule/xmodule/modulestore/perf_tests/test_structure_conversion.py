@@ -0,0 +1,118 @@
+"""
+Performance test for converting split modulestore structures to and from their mongo form,
+with PyContracts checking on and off.
+"""
+import copy
+import unittest
+
+from bson.objectid import ObjectId
+import contracts
+import ddt
+#from nose.plugins.attrib import attr
+from nose.plugins.skip import SkipTest
+
+from xmodule.modulestore.split_mongo.mongo_connection import structure_from_mongo, structure_to_mongo
+
+# The dependency below needs to be installed manually from the development.txt file, which doesn't
+# get installed during unit tests!
+try:
+    from code_block_timer import CodeBlockTimer
+except ImportError:
+    CodeBlockTimer = None
+
+# Number of blocks in the synthetic structure.
+NUM_BLOCKS = 10000
+
+# Number of children per non-leaf block in the synthetic structure.
+BRANCHING = 10
+
+# Number of times each conversion is timed.
+REPEAT = 3
+
+
+def make_structure_document(num_blocks=NUM_BLOCKS, branching=BRANCHING):
+    """
+    Return a synthetic structure, as it's stored in mongo, with ``num_blocks`` blocks
+    arranged as a tree where each parent has ``branching`` children.
+    """
+    version = ObjectId()
+    blocks = []
+    for index in xrange(num_blocks):
+        first_child = index * branching + 1
+        children = [
+            ['vertical', 'block{}'.format(child)]
+            for child in xrange(first_child, min(first_child + branching, num_blocks))
+        ]
+        fields = {'display_name': 'Block {}'.format(index)}
+        if children:
+            fields['children'] = children
+        blocks.append({
+            'block_type': 'course' if index == 0 else 'vertical',
+            'block_id': 'block{}'.format(index),
+            'definition': ObjectId(),
+            'fields': fields,
+            'edit_info': {
+                'update_version': version,
+                'previous_version': None,
+                'edited_by': 'test_user',
+            },
+        })
+    return {
+        '_id': version,
+        'root': ['course', 'block0'],
+        'previous_version': None,
+        'original_version': version,
+        'blocks': blocks,
+    }
+
+
+@ddt.ddt
+# Eventually, exclude this attribute from regular unittests while running *only* tests
+# with this attribute during regular performance tests.
+# @attr("perf_test")
+@unittest.skip
+class StructureConversionContractsTest(unittest.TestCase):
+    """
+    This class exists to time the per-block cost of structure_from_mongo and
+    structure_to_mongo with contracts enabled and disabled.
+    """
+
+    # Use this attribute to skip this test on regular unittest CI runs.
+    perf_test = True
+
+    def setUp(self):
+        super(StructureConversionContractsTest, self).setUp()
+        self.document = make_structure_document()
+        if contracts.all_disabled():
+            self.addCleanup(contracts.disable_all)
+        else:
+            self.addCleanup(contracts.enable_all)
+
+    @staticmethod
+    def _time_runs(desc, func, make_arg):
+        """
+        Time REPEAT runs of func(make_arg()), not counting make_arg.
+        """
+        for run in xrange(REPEAT):
+            arg = make_arg()
+            with CodeBlockTimer("{}:{}".format(desc, run)):
+                func(arg)
+
+    @ddt.data(True, False)
+    def test_conversion_timings(self, contracts_enabled):
+        """
+        Generate timings for converting a structure of NUM_BLOCKS blocks.
+        """
+        if CodeBlockTimer is None:
+            raise SkipTest("CodeBlockTimer undefined.")
+
+        if contracts_enabled:
+            contracts.enable_all()
+        else:
+            contracts.disable_all()
+
+        desc = "StructureConversion:contracts={}:{}".format('on' if contracts_enabled else 'off', NUM_BLOCKS)
+        with CodeBlockTimer(desc):
+            self._time_runs("structure_from_mongo", structure_from_mongo, lambda: copy.deepcopy(self.document))
+            structure = structure_from_mongo(copy.deepcopy(self.document))
+            self._time_runs("structure_to_mongo", structure_to_mongo, lambda: structure)
@@ -91,26 +91,27 @@ class SplitMigrator(object):
 
         # iterate over published course elements. Wildcarding rather than descending b/c some elements are orphaned (e.g.,
         # course about pages, conditionals)
-        for module in self.source_modulestore.get_items(
-            source_course_key, revision=ModuleStoreEnum.RevisionOption.published_only, **kwargs
-        ):
-            # don't copy the course again.
-            if module.location != old_course_loc:
-                # create split_xblock using split.create_item
-                # NOTE: the below auto populates the children when it migrates the parent; so,
-                # it doesn't need the parent as the first arg. That is, it translates and populates
-                # the 'children' field as it goes.
-                _new_module = self.split_modulestore.create_item(
-                    user_id,
-                    course_version_locator,
+        # NOTE: the translated fields include the 'children'; so, each parent gets its children as it's
+        # copied rather than as they are. All the blocks go into one new version of the structure.
+        self.split_modulestore.create_items(
+            user_id,
+            course_version_locator,
+            (
+                (
                     module.location.block_type,
-                    block_id=module.location.block_id,
-                    fields=self._get_fields_translate_references(
+                    module.location.block_id,
+                    self._get_fields_translate_references(
                         module, course_version_locator, new_course.location.block_id
                     ),
-                    skip_auto_publish=True,
-                    **kwargs
                 )
+                for module in self.source_modulestore.get_items(
+                    source_course_key, revision=ModuleStoreEnum.RevisionOption.published_only, **kwargs
+                )
+                # don't copy the course again.
+                if module.location != old_course_loc
+            ),
+            **kwargs
+        )
         # after done w/ published items, add version for DRAFT pointing to the published structure
         index_info = self.split_modulestore.get_course_index_info(course_version_locator)
         versions = index_info['versions']
@@ -125,12 +126,13 @@ class SplitMigrator(object):
         """
         update each draft. Create any which don't exist in published and attach to their parents.
         """
-        # each true update below will trigger a new version of the structure. We may want to just have one new version
-        # but that's for a later date.
+        # the updates below all go into the one new version of the structure which the bulk operation holds.
         new_draft_course_loc = published_course_usage_key.course_key.for_branch(ModuleStoreEnum.BranchName.draft)
         # to prevent race conditions of grandchilden being added before their parents and thus having no parent to
         # add to
         awaiting_adoption = {}
+        # the draft-only blocks, created all at once after the loop
+        new_draft_items = []
         for module in self.source_modulestore.get_items(
                 source_course_key, revision=ModuleStoreEnum.RevisionOption.draft_only, **kwargs
         ):
@@ -150,16 +152,16 @@ class SplitMigrator(object):
                 _new_module = self.split_modulestore.update_item(split_module, user_id, **kwargs)
             else:
                 # only a draft version (aka, 'private').
-                _new_module = self.split_modulestore.create_item(
-                    user_id, new_draft_course_loc,
+                new_draft_items.append((
                     new_locator.block_type,
-                    block_id=new_locator.block_id,
-                    fields=self._get_fields_translate_references(
+                    new_locator.block_id,
+                    self._get_fields_translate_references(
                         module, new_draft_course_loc, published_course_usage_key.block_id
                     ),
-                    **kwargs
-                )
+                ))
                 awaiting_adoption[module.location] = new_locator
+        if new_draft_items:
+            self.split_modulestore.create_items(user_id, new_draft_course_loc, new_draft_items, **kwargs)
         for draft_location, new_locator in awaiting_adoption.iteritems():
             parent_loc = self.source_modulestore.get_parent_location(
                 draft_location, revision=ModuleStoreEnum.RevisionOption.draft_preferred, **kwargs
@@ -77,6 +77,8 @@ class CachingDescriptorSystem(MakoDescriptorSystem, EditInfoRuntimeMixin):
         self.course_id = course_entry.course_key
         self.lazy = lazy
         self.module_data = module_data
+        # definition id -> definition, for definitions fetched in bulk by prefetch_definitions
+        self.definitions = {}
         self.default_class = default_class
         self.local_modules = {}
         self._services['library_tools'] = LibraryToolsService(modulestore)
@@ -84,11 +86,18 @@ class CachingDescriptorSystem(MakoDescriptorSystem, EditInfoRuntimeMixin):
     @lazy
     @contract(returns="dict(BlockKey: BlockKey)")
     def _parent_map(self):
-        parent_map = {}
-        for block_key, block in self.course_entry.structure['blocks'].iteritems():
-            for child in block.fields.get('children', []):
-                parent_map[child] = block_key
-        return parent_map
+        # share the modulestore's index of the structure's parents
+        return {
+            child: parents[-1]
+            for child, parents in self.modulestore._get_parent_map(  # pylint: disable=protected-access
+                self.course_entry.structure
+            ).iteritems()
+        }
+
+    @lazy
+    def _inherited_settings(self):
+        # share the modulestore's table of the settings each block inherits
+        return self.modulestore._get_inherited_settings(self.course_entry.structure)  # pylint: disable=protected-access
 
     @contract(usage_key="BlockUsageLocator | BlockKey", course_entry_override="CourseEnvelope | None")
     def _load_item(self, usage_key, course_entry_override=None, **kwargs):
@@ -149,6 +158,15 @@ class CachingDescriptorSystem(MakoDescriptorSystem, EditInfoRuntimeMixin):
 
         return json_data
 
+    @contract(block_keys="list(BlockKey)", course_key="CourseLocator | LibraryLocator", depth="int | None")
+    def prefetch_definitions(self, block_keys, course_key, depth=None):
+        """
+        Fetch the definitions for the subtrees rooted at block_keys (out to depth; None for the
+        whole subtree) with one query per batch so that accessing their content doesn't make
+        one query per block. Useful before walking a whole subtree (e.g., grading or outlines).
+        """
+        self.modulestore.prefetch_definitions(self, block_keys, course_key, depth)
+
     # xblock's runtime does not always pass enough contextual information to figure out
     # which named container (course x branch) or which parent is requesting an item. Because split allows
     # a many:1 mapping from named containers to structures and because item's identities encode
@@ -188,6 +206,7 @@ class CachingDescriptorSystem(MakoDescriptorSystem, EditInfoRuntimeMixin):
                 block_key.type,
                 definition_id,
                 convert_fields,
+                definition_cache=self.definitions,
             )
         else:
             definition_loader = None
@@ -218,7 +237,12 @@ class CachingDescriptorSystem(MakoDescriptorSystem, EditInfoRuntimeMixin):
         )
 
         if InheritanceMixin in self.modulestore.xblock_mixins:
-            field_data = inheriting_field_data(kvs)
+            if block_key in self._inherited_settings:
+                kvs.inherited_settings = self._inherited_settings[block_key]
+                field_data = KvsFieldData(kvs)
+            else:
+                # not in the persisted structure (e.g., not saved yet); so, look up the ancestors' settings
+                field_data = inheriting_field_data(kvs)
         else:
             field_data = KvsFieldData(kvs)
 
@@ -0,0 +1,230 @@
+"""
+A compact, array-backed stand-in for the ``structure['blocks']`` dict of split modulestore structures.
+
+A course structure has one entry per block and each entry normally becomes a :class:`.BlockData`
+(with an :class:`.EditInfo`) plus one :class:`.BlockKey` per child reference. For courses with many
+thousands of blocks that is a lot of small objects which are mostly never looked at. The
+:class:`CompactBlockMap` instead keeps:
+
+* every block type and block id once (interned), with block types stored as small integer codes,
+* the parent/child adjacency as flat integer index arrays,
+* the raw storable record for each block,
+
+and only builds the :class:`.BlockData` for a block when it's accessed. From then on that object is
+the authoritative copy of the block, so callers can mutate it exactly as they would a dict entry.
+"""
+from array import array
+from collections import MutableMapping
+
+from xmodule.modulestore import BlockData, EditInfo
+from xmodule.modulestore.split_mongo import BlockKey
+
+
+class CompactBlockMap(MutableMapping):
+    """
+    A mapping of :class:`.BlockKey` to :class:`.BlockData` which materializes the values lazily.
+    """
+    def __init__(self):
+        # interned block_type and block_id strings
+        self._strings = {}
+        # block_type code -> block_type string
+        self._types = []
+        self._type_codes = {}
+        # per key index: block_type code and block_id string. A key index may refer to a child
+        # reference which has no block in this map (e.g., a dangling pointer during migration).
+        self._key_types = array('H')
+        self._key_ids = []
+        # (block_type, block_id) -> key index. BlockKey is a tuple, so it can be used to look these up.
+        self._index = {}
+        # per key index: the raw storable record (without block_id or children), or None
+        self._records = []
+        # flattened children: the children of key index i are
+        # self._children[self._child_offsets[i]:self._child_offsets[i + 1]]
+        self._children = array('l')
+        self._child_offsets = array('l', [0])
+        # key index -> BlockData for the blocks which have been accessed or set
+        self._views = {}
+        self._len = 0
+
+    @classmethod
+    def from_mongo(cls, blocks):
+        """
+        Build a map from the mongo list of block documents. Consumes the documents.
+        """
+        block_map = cls()
+        for block in blocks:
+            block_map._add_key(block['block_type'], block.pop('block_id'))
+
+        for block in blocks:
+            fields = block['fields']
+            children = fields.pop('children', None)
+            if children is not None:
+                # remember that there was a (possibly empty) children list
+                block['has_children'] = True
+                block_map._children.extend(
+                    block_map._add_key(child_type, child_id)
+                    for child_type, child_id in children
+                )
+            block_map._child_offsets.append(len(block_map._children))
+            block_map._records.append(block)
+
+        # phantom keys added for dangling children have no record nor children
+        while len(block_map._records) < len(block_map._key_ids):
+            block_map._records.append(None)
+            block_map._child_offsets.append(len(block_map._children))
+
+        block_map._len = len(blocks)
+        return block_map
+
+    def _intern(self, value):
+        """
+        Return the single shared copy of the string ``value``.
+        """
+        return self._strings.setdefault(value, value)
+
+    def _add_key(self, block_type, block_id):
+        """
+        Return the key index for (block_type, block_id), adding it if it's new.
+        """
+        block_id = self._intern(block_id)
+        block_type = self._intern(block_type)
+        index = self._index.get((block_type, block_id))
+        if index is None:
+            type_code = self._type_codes.get(block_type)
+            if type_code is None:
+                type_code = self._type_codes[block_type] = len(self._types)
+                self._types.append(block_type)
+            index = len(self._key_ids)
+            self._key_types.append(type_code)
+            self._key_ids.append(block_id)
+            self._index[(block_type, block_id)] = index
+        return index
+
+    def _key(self, index):
+        """
+        Return the :class:`.BlockKey` for the key index.
+        """
+        return BlockKey(self._types[self._key_types[index]], self._key_ids[index])
+
+    def _is_live(self, index):
+        """
+        Does the key index refer to a block in this map?
+        """
+        return index in self._views or self._records[index] is not None
+
+    def _child_indexes(self, index):
+        """
+        Return the key indexes of the children of the block at ``index``, as stored (not as edited).
+        """
+        return self._children[self._child_offsets[index]:self._child_offsets[index + 1]]
+
+    def _storable(self, index):
+        """
+        Return the mongo storable form of the block at ``index``, without materializing it.
+        """
+        view = self._views.get(index)
+        if view is not None:
+            return view.to_storable()
+        record = self._records[index]
+        storable = {
+            'fields': dict(record['fields']),
+            'block_type': record['block_type'],
+            'definition': record.get('definition'),
+            'defaults': record.get('defaults', {}),
+            'edit_info': EditInfo(**record.get('edit_info', {})).to_storable(),
+        }
+        if record.get('has_children'):
+            storable['fields']['children'] = [
+                [self._types[self._key_types[child]], self._key_ids[child]]
+                for child in self._child_indexes(index)
+            ]
+        return storable
+
+    def iter_storable(self):
+        """
+        Yield (BlockKey, storable block dict) for every block without building the BlockData objects.
+        """
+        for index in xrange(len(self._key_ids)):
+            if self._is_live(index):
+                yield self._key(index), self._storable(index)
+
+    def materialized_values(self):
+        """
+        Return the list of :class:`.BlockData` objects which have been built (or set) so far.
+        """
+        return self._views.values()
+
+    def children(self, block_key):
+        """
+        Return the children of ``block_key`` as a list of :class:`.BlockKey` without materializing it.
+        """
+        index = self._index[block_key]
+        view = self._views.get(index)
+        if view is not None:
+            return [BlockKey(*child) for child in view.fields.get('children', [])]
+        if self._records[index] is None:
+            raise KeyError(block_key)
+        return [self._key(child) for child in self._child_indexes(index)]
+
+    def raw_fields(self, block_key):
+        """
+        Return the fields of ``block_key`` without materializing it: the stored record's (which lacks
+        ``children``; see :meth:`children`), or the :class:`.BlockData`'s if it has been built. The dict
+        is the map's own, so never change it.
+        """
+        index = self._index[block_key]
+        view = self._views.get(index)
+        if view is not None:
+            return view.fields
+        record = self._records[index]
+        if record is None:
+            raise KeyError(block_key)
+        return record['fields']
+
+    def __getitem__(self, block_key):
+        index = self._index[block_key]
+        view = self._views.get(index)
+        if view is None:
+            record = self._records[index]
+            if record is None:
+                raise KeyError(block_key)
+            if record.pop('has_children', False):
+                record['fields']['children'] = [self._key(child) for child in self._child_indexes(index)]
+            view = self._views[index] = BlockData(**record)
+            # the view is now the authoritative copy of the block
+            self._records[index] = None
+        return view
+
+    def __setitem__(self, block_key, block_data):
+        block_key = BlockKey(*block_key)
+        index = self._add_key(block_key.type, block_key.id)
+        if index == len(self._records):
+            self._records.append(None)
+            self._child_offsets.append(len(self._children))
+        if not self._is_live(index):
+            self._len += 1
+        self._records[index] = None
+        self._views[index] = block_data
+
+    def __delitem__(self, block_key):
+        index = self._index[block_key]
+        if not self._is_live(index):
+            raise KeyError(block_key)
+        self._views.pop(index, None)
+        self._records[index] = None
+        self._len -= 1
+
+    def __contains__(self, block_key):
+        index = self._index.get(block_key)
+        return index is not None and self._is_live(index)
+
+    def __iter__(self):
+        for index in xrange(len(self._key_ids)):
+            if self._is_live(index):
+                yield self._key(index)
+
+    def __len__(self):
+        return self._len
+
+    def __repr__(self):
+        return u"{}<{} blocks>".format(self.__class__.__name__, self._len)
@@ -1,26 +1,42 @@
 """
 Segregation of pymongo functions from the data modeling mechanisms for split modulestore.
 """
+import copy
+import cPickle as pickle
 import datetime
 import math
 import pymongo
 import pytz
 import re
+import threading
+import zlib
+from collections import defaultdict, OrderedDict
 from contextlib import contextmanager
 from time import time
 
 # Import this just to export it
-from pymongo.errors import DuplicateKeyError  # pylint: disable=unused-import
+from pymongo.errors import DuplicateKeyError
 
-from contracts import check, new_contract
+from contracts import all_disabled, check, new_contract
 from mongodb_proxy import autoretry_read, MongoProxy
 from xmodule.exceptions import HeartbeatFailure
 from xmodule.modulestore import BlockData
 from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo.compact_blocks import CompactBlockMap
 import dogstats_wrapper as dog_stats_api
 
+try:
+    # The shared structure cache tier is only available when running under django
+    from django.conf import settings
+    from django.core.cache import get_cache, InvalidCacheBackendError
+    from django.core.exceptions import ImproperlyConfigured
+
+    DJANGO_AVAILABLE = True
+except ImportError:
+    DJANGO_AVAILABLE = False
 
 new_contract('BlockData', BlockData)
+new_contract('BlockKey', BlockKey)
 
 
 def round_power_2(value):
@@ -140,8 +156,156 @@ class QueryTimer(object):
 
 TIMER = QueryTimer(__name__, 0.001)
 
+# The maximum number of ids to put in any one $in query when fetching definitions in bulk
+DEFINITION_BATCH_SIZE = 500
+
+
+class CourseStructureCache(object):
+    """
+    A two tier, content-addressed cache of course structures.
+
+    Structures are immutable once written, so they are keyed solely by their ``_id``
+    and never expire. Entries are stored as compressed pickles of the converted
+    (:func:`structure_from_mongo`) form so that a hit skips both the mongo query and
+    the conversion. Every :meth:`get` returns a freshly deserialized copy, so callers
+    may mutate the result without polluting the cache.
+
+    The first tier is a bounded, in-process LRU (sized by the django setting
+    ``COURSE_STRUCTURE_CACHE_LOCAL_SIZE``; 0 disables it). The second tier is the
+    django ``course_structure_cache`` cache (e.g., memcached) shared between processes,
+    whose entries expire after ``COURSE_STRUCTURE_CACHE_TIMEOUT`` seconds. If django or that cache
+    isn't configured, the corresponding tier is skipped.
+    """
+    def __init__(self, local_size=None, shared_cache=None, timeout=None):
+        """
+        Arguments:
+            local_size (int): the maximum number of structures to keep in process. Defaults
+                to the ``COURSE_STRUCTURE_CACHE_LOCAL_SIZE`` setting.
+            shared_cache: a django cache object to use as the shared tier. Defaults to the
+                ``course_structure_cache`` cache.
+            timeout (int): the seconds structures are kept in the shared tier. Defaults to the
+                ``COURSE_STRUCTURE_CACHE_TIMEOUT`` setting.
+        """
+        if local_size is None:
+            local_size = self._get_setting('COURSE_STRUCTURE_CACHE_LOCAL_SIZE', 0)
+        self.local_size = local_size
+        if timeout is None:
+            timeout = self._get_setting('COURSE_STRUCTURE_CACHE_TIMEOUT', 30 * 24 * 60 * 60)
+        self.timeout = timeout
+        self._local = OrderedDict()
+        self._local_lock = threading.Lock()
+
+        if shared_cache is None and DJANGO_AVAILABLE:
+            try:
+                shared_cache = get_cache('course_structure_cache')
+            except (InvalidCacheBackendError, ImproperlyConfigured):
+                shared_cache = None
+        self.shared_cache = shared_cache
+
+    @staticmethod
+    def _get_setting(name, default):
+        """
+        Return the django setting ``name`` if django is configured, else ``default``.
+        """
+        if not DJANGO_AVAILABLE:
+            return default
+        try:
+            return getattr(settings, name, default)
+        except ImproperlyConfigured:
+            return default
+
+    @staticmethod
+    def _key(key):
+        """
+        Return the cache key for the structure whose ``_id`` is ``key``.
+        """
+        return u'course_structure.{}'.format(key)
+
+    @property
+    def enabled(self):
+        """
+        True if at least one tier of the cache is active.
+        """
+        return self.local_size > 0 or self.shared_cache is not None
+
+    def _get_local(self, key):
+        """
+        Return the serialized structure from the in-process tier (or None), marking it recently used.
+        """
+        with self._local_lock:
+            data = self._local.pop(key, None)
+            if data is not None:
+                self._local[key] = data
+            return data
+
+    def _set_local(self, key, data):
+        """
+        Add the serialized structure to the in-process tier, evicting the least recently used entries.
+        """
+        if self.local_size <= 0:
+            return
+        with self._local_lock:
+            self._local.pop(key, None)
+            self._local[key] = data
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def get(self, key, course_context=None):
+        """
+        Return a copy of the structure whose ``_id`` is ``key``, or None if it isn't cached.
+        """
+        if not self.enabled:
+            return None
+
+        with TIMER.timer("CourseStructureCache.get", course_context) as tagger:
+            cache_key = self._key(key)
+            data = self._get_local(cache_key)
+            tier = 'local'
+            if data is None and self.shared_cache is not None:
+                data = self.shared_cache.get(cache_key)
+                tier = 'shared'
+                if data is not None:
+                    self._set_local(cache_key, data)
+
+            if data is None:
+                tagger.tag(from_cache='false')
+                return None
+
+            tagger.tag(from_cache=tier)
+            tagger.measure('compressed_size', len(data))
+            return pickle.loads(zlib.decompress(data))
+
+    def set(self, key, structure, course_context=None):
+        """
+        Serialize, compress, and store ``structure`` in every active tier under ``key``.
+        """
+        if not self.enabled:
+            return
+
+        with TIMER.timer("CourseStructureCache.set", course_context) as tagger:
+            pickled_data = pickle.dumps(structure, pickle.HIGHEST_PROTOCOL)
+            tagger.measure('uncompressed_size', len(pickled_data))
+
+            # 1 = fastest; structures compress well even at the lowest level
+            data = zlib.compress(pickled_data, 1)
+            tagger.measure('compressed_size', len(data))
 
-def structure_from_mongo(structure, course_context=None):
+            cache_key = self._key(key)
+            self._set_local(cache_key, data)
+            if self.shared_cache is not None:
+                # Structures are immutable, so they only expire to free the cache's space. The timeout
+                # must be explicit: django treats None as the cache's default timeout, not as forever.
+                self.shared_cache.set(cache_key, data, self.timeout)
+
+    def clear(self):
+        """
+        Empty the in-process tier. The shared tier is left alone as other processes may be using it.
+        """
+        with self._local_lock:
+            self._local.clear()
+
+
+def structure_from_mongo(structure, course_context=None, compact=False):
     """
     Converts the 'blocks' key from a list [block_data] to a map
         {BlockKey: block_data}.
@@ -153,17 +317,25 @@ def structure_from_mongo(structure, course_context=None):
         structure: The document structure to convert
         course_context (CourseKey): For metrics gathering, the CourseKey
             for the course that this data is being processed for.
+        compact (bool): If True, 'blocks' becomes a :class:`.CompactBlockMap` which only converts
+            each block when it's accessed, rather than a dict.
     """
     with TIMER.timer('structure_from_mongo', course_context) as tagger:
         tagger.measure('blocks', len(structure['blocks']))
 
-        check('seq[2]', structure['root'])
-        check('list(dict)', structure['blocks'])
-        for block in structure['blocks']:
-            if 'children' in block['fields']:
-                check('list(list[2])', block['fields']['children'])
+        # Skip the per-block checks entirely when contracts are off (as they are in production)
+        if not all_disabled():
+            check('seq[2]', structure['root'])
+            check('list(dict)', structure['blocks'])
+            for block in structure['blocks']:
+                if 'children' in block['fields']:
+                    check('list(list[2])', block['fields']['children'])
 
         structure['root'] = BlockKey(*structure['root'])
+        if compact:
+            structure['blocks'] = CompactBlockMap.from_mongo(structure['blocks'])
+            return structure
+
         new_blocks = {}
         for block in structure['blocks']:
             if 'children' in block['fields']:
@@ -185,17 +357,33 @@ def structure_to_mongo(structure, course_context=None):
     with TIMER.timer('structure_to_mongo', course_context) as tagger:
         tagger.measure('blocks', len(structure['blocks']))
 
-        check('BlockKey', structure['root'])
-        check('dict(BlockKey: BlockData)', structure['blocks'])
-        for block in structure['blocks'].itervalues():
-            if 'children' in block.fields:
-                check('list(BlockKey)', block.fields['children'])
+        blocks = structure['blocks']
+        compact = isinstance(blocks, CompactBlockMap)
+
+        # Skip the per-block checks entirely when contracts are off (as they are in production)
+        if not all_disabled():
+            check('BlockKey', structure['root'])
+            if compact:
+                # only the blocks which have been accessed can have been changed since they were read
+                checked_blocks = blocks.materialized_values()
+                check('list(BlockData)', checked_blocks)
+            else:
+                checked_blocks = blocks.values()
+                check('dict(BlockKey: BlockData)', blocks)
+            for block in checked_blocks:
+                if 'children' in block.fields:
+                    check('list(BlockKey)', block.fields['children'])
+
+        if compact:
+            storable_blocks = blocks.iter_storable()
+        else:
+            storable_blocks = ((block_key, block.to_storable()) for block_key, block in blocks.iteritems())
 
         new_structure = dict(structure)
         new_structure['blocks'] = []
 
-        for block_key, block in structure['blocks'].iteritems():
-            new_block = dict(block.to_storable())
+        for block_key, storable in storable_blocks:
+            new_block = dict(storable)
             new_block.setdefault('block_type', block_key.type)
             new_block['block_id'] = block_key.id
             new_structure['blocks'].append(new_block)
@@ -203,16 +391,90 @@ def structure_to_mongo(structure, course_context=None):
         return new_structure
 
 
+# The keys which only delta structure documents have
+DELTA_KEYS = ('delta_base', 'delta_chain', 'removed_blocks')
+
+
+def _block_key(block):
+    """
+    Return the (block_type, block_id) of a block as it's stored in mongo
+    """
+    return (block['block_type'], block['block_id'])
+
+
+def _comparable(value):
+    """
+    Return a form of the mongo value which compares equal to that of the value as it's read back from mongo
+    (which has lists where it was stored w/ tuples, e.g., BlockKeys, and may have its keys in a different order)
+    """
+    if isinstance(value, dict):
+        return sorted((key, _comparable(item)) for key, item in value.iteritems())
+    if isinstance(value, (list, tuple)):
+        return [_comparable(item) for item in value]
+    return value
+
+
+def structure_delta(structure, base, chain):
+    """
+    Return the delta document which stores the mongo ``structure`` as its changes from the mongo
+    structure ``base``: 'blocks' only has the new and changed blocks and 'removed_blocks' lists the
+    [block_type, block_id] of the blocks which aren't in ``structure`` anymore.
+
+    Arguments:
+        structure: the full structure, as it's stored in mongo
+        base: the full structure (as it's stored in mongo) to store the delta against
+        chain (list): the ids of the stored documents needed to rebuild ``base``, starting with a
+            full structure and ending with ``base`` itself
+    """
+    base_blocks = {_block_key(block): block for block in base['blocks']}
+    changed_blocks = []
+    for block in structure['blocks']:
+        base_block = base_blocks.pop(_block_key(block), None)
+        if base_block is None or _comparable(base_block) != _comparable(block):
+            changed_blocks.append(block)
+
+    delta = dict(structure)
+    delta['blocks'] = changed_blocks
+    delta['removed_blocks'] = [list(block_key) for block_key in base_blocks]
+    delta['delta_base'] = base['_id']
+    delta['delta_chain'] = chain
+    return delta
+
+
+def apply_structure_delta(base, delta):
+    """
+    Return the full mongo structure which the ``delta`` document stores against the full mongo
+    structure ``base``. Shares the block documents with ``base`` and ``delta``.
+    """
+    blocks = OrderedDict((_block_key(block), block) for block in base['blocks'])
+    for block_key in delta['removed_blocks']:
+        blocks.pop(tuple(block_key), None)
+    for block in delta['blocks']:
+        blocks[_block_key(block)] = block
+
+    structure = {key: value for key, value in delta.iteritems() if key not in DELTA_KEYS}
+    structure['blocks'] = blocks.values()
+    return structure
+
+
 class MongoConnection(object):
     """
     Segregation of pymongo functions from the data modeling mechanisms for split modulestore.
     """
     def __init__(
         self, db, collection, host, port=27017, tz_aware=True, user=None, password=None,
-        asset_collection=None, retry_wait_time=0.1, **kwargs
+        asset_collection=None, retry_wait_time=0.1, compact_structures=False, structure_snapshot_interval=None,
+        **kwargs
     ):
         """
         Create & open the connection, authenticate, and provide pointers to the collections
+
+        Arguments:
+            compact_structures (bool): if True, structures are returned with their 'blocks' as a
+                :class:`.CompactBlockMap` rather than a dict.
+            structure_snapshot_interval (int): if set, new structures are stored as deltas against
+                their previous version, with a full copy (snapshot) at least every this many versions.
+                If None, every structure is stored in full.
         """
         if kwargs.get('replicaSet') is None:
             kwargs.pop('replicaSet', None)
@@ -233,6 +495,10 @@ class MongoConnection(object):
         if user is not None and password is not None:
             self.database.authenticate(user, password)
 
+        self.compact_structures = compact_structures
+        self.structure_snapshot_interval = structure_snapshot_interval
+        self.structure_cache = CourseStructureCache()
+
         self.course_index = self.database[collection + '.active_versions']
         self.structures = self.database[collection + '.structures']
         self.definitions = self.database[collection + '.definitions']
@@ -259,12 +525,19 @@ class MongoConnection(object):
         Get the structure from the persistence mechanism whose id is the given key
         """
         with TIMER.timer("get_structure", course_context) as tagger_get_structure:
-            with TIMER.timer("get_structure.find_one", course_context) as tagger_find_one:
-                doc = self.structures.find_one({'_id': key})
-                tagger_find_one.measure("blocks", len(doc['blocks']))
-            tagger_get_structure.measure("blocks", len(doc['blocks']))
-
-            return structure_from_mongo(doc, course_context)
+            structure = self.structure_cache.get(key, course_context)
+            tagger_get_structure.tag(from_cache=str(structure is not None).lower())
+            if structure is None:
+                with TIMER.timer("get_structure.find_one", course_context) as tagger_find_one:
+                    doc = self.structures.find_one({'_id': key})
+                    tagger_find_one.measure("blocks", len(doc['blocks']))
+                    tagger_find_one.tag(delta=str('delta_base' in doc).lower())
+                doc = self._rebuild_structures([doc], course_context)[0]
+                structure = structure_from_mongo(doc, course_context, self.compact_structures)
+                self.structure_cache.set(key, structure, course_context)
+            tagger_get_structure.measure("blocks", len(structure['blocks']))
+
+            return structure
 
     @autoretry_read()
     def find_structures_by_id(self, ids, course_context=None):
@@ -276,10 +549,22 @@ class MongoConnection(object):
         """
         with TIMER.timer("find_structures_by_id", course_context) as tagger:
             tagger.measure("requested_ids", len(ids))
-            docs = [
-                structure_from_mongo(structure, course_context)
-                for structure in self.structures.find({'_id': {'$in': ids}})
-            ]
+            docs = []
+            missing_ids = []
+            for structure_id in ids:
+                structure = self.structure_cache.get(structure_id, course_context)
+                if structure is None:
+                    missing_ids.append(structure_id)
+                else:
+                    docs.append(structure)
+            tagger.measure("cached_structures", len(docs))
+
+            if missing_ids:
+                found = list(self.structures.find({'_id': {'$in': missing_ids}}))
+                for doc in self._rebuild_structures(found, course_context):
+                    structure = structure_from_mongo(doc, course_context, self.compact_structures)
+                    self.structure_cache.set(structure['_id'], structure, course_context)
+                    docs.append(structure)
             tagger.measure("structures", len(docs))
             return docs
 
@@ -294,8 +579,10 @@ class MongoConnection(object):
         with TIMER.timer("find_structures_derived_from", course_context) as tagger:
             tagger.measure("base_ids", len(ids))
             docs = [
-                structure_from_mongo(structure, course_context)
-                for structure in self.structures.find({'previous_version': {'$in': ids}})
+                structure_from_mongo(structure, course_context, self.compact_structures)
+                for structure in self._rebuild_structures(
+                    list(self.structures.find({'previous_version': {'$in': ids}})), course_context
+                )
             ]
             tagger.measure("structures", len(docs))
             return docs
@@ -310,9 +597,11 @@ class MongoConnection(object):
             block_key (BlockKey): The id of the block in question
         """
         with TIMER.timer("find_ancestor_structures", course_context) as tagger:
+            # A delta only stores the blocks which changed in its version; so, it's only found for
+            # the versions in which this block changed (which are the ones which matter for its history).
             docs = [
-                structure_from_mongo(structure, course_context)
-                for structure in self.structures.find({
+                structure_from_mongo(structure, course_context, self.compact_structures)
+                for structure in self._rebuild_structures(list(self.structures.find({
                     'original_version': original_version,
                     'blocks': {
                         '$elemMatch': {
@@ -323,18 +612,146 @@ class MongoConnection(object):
                             },
                         },
                     },
-                })
+                })), course_context)
             ]
             tagger.measure("structures", len(docs))
             return docs
 
+    def _rebuild_structures(self, docs, course_context=None):
+        """
+        Return the list of stored structure documents ``docs`` with each delta replaced by the full
+        structure it stores. The documents in the result don't share any blocks.
+        """
+        if not any('delta_base' in doc for doc in docs):
+            return docs
+
+        with TIMER.timer("rebuild_structures", course_context) as tagger:
+            stored = {doc['_id']: doc for doc in docs}
+            # fetch all the other documents in the deltas' chains at once
+            chain_ids = set()
+            for doc in docs:
+                chain_ids.update(doc.get('delta_chain', []))
+            chain_ids.difference_update(stored)
+            if chain_ids:
+                stored.update((doc['_id'], doc) for doc in self.structures.find({'_id': {'$in': list(chain_ids)}}))
+            tagger.measure("chain_documents", len(chain_ids))
+
+            rebuilt = {}
+
+            def rebuild(doc):
+                """
+                Return the full structure which doc stores
+                """
+                if 'delta_base' not in doc:
+                    return doc
+                if doc['_id'] not in rebuilt:
+                    base_id = doc['delta_base']
+                    if base_id not in stored:
+                        # the chain is out of date (e.g., the base was compacted since): follow the links
+                        stored[base_id] = self.structures.find_one({'_id': base_id})
+                    rebuilt[doc['_id']] = apply_structure_delta(rebuild(stored[base_id]), doc)
+                return rebuilt[doc['_id']]
+
+            results = []
+            for doc in docs:
+                if 'delta_base' in doc:
+                    doc = rebuild(doc)
+                    doc['blocks'] = copy.deepcopy(doc['blocks'])
+                results.append(doc)
+            return results
+
+    def _structure_document(self, structure, course_context=None):
+        """
+        Return the document to store for the mongo ``structure``: a delta against its previous version
+        or, if there's no stored previous version, the previous version's chain of deltas is long
+        enough, or most of the blocks changed, the structure itself.
+        """
+        base_id = structure.get('previous_version')
+        if not self.structure_snapshot_interval or base_id is None:
+            return structure
+        base = self.structures.find_one({'_id': base_id})
+        if base is None:
+            return structure
+        chain = base.get('delta_chain', []) + [base_id]
+        if len(chain) >= self.structure_snapshot_interval:
+            return structure
+        delta = structure_delta(structure, self._rebuild_structures([base], course_context)[0], chain)
+        if len(delta['blocks']) * 2 > len(structure['blocks']):
+            return structure
+        return delta
+
     def insert_structure(self, structure, course_context=None):
         """
         Insert a new structure into the database.
         """
         with TIMER.timer("insert_structure", course_context) as tagger:
             tagger.measure("blocks", len(structure["blocks"]))
-            self.structures.insert(structure_to_mongo(structure, course_context))
+            doc = self._structure_document(structure_to_mongo(structure, course_context), course_context)
+            tagger.tag(delta=str('delta_base' in doc).lower())
+            self.structures.insert(doc)
+
+    def rewrite_structure_history(self, original_version, snapshot_interval=None, commit=True):
+        """
+        Store every version of the structures which originated from ``original_version`` as a
+        delta against its previous version, with a full snapshot at least every snapshot_interval
+        versions. Each document is replaced by one storing the same structure; so, readers aren't
+        affected while this runs.
+
+        Arguments:
+            original_version: the id of the first version of the structures
+            snapshot_interval (int): defaults to this connection's structure_snapshot_interval
+            commit (bool): if False, only count what would be stored
+
+        Returns:
+            A (number of snapshots, number of deltas, number of documents rewritten) tuple.
+        """
+        snapshot_interval = snapshot_interval or self.structure_snapshot_interval
+        if not snapshot_interval:
+            raise ValueError("A snapshot interval is required to store structures as deltas")
+
+        previous_versions = {
+            doc['_id']: doc.get('previous_version')
+            for doc in self.structures.find({'original_version': original_version}, {'previous_version': True})
+        }
+        successors = defaultdict(list)
+        for version, previous_version in previous_versions.iteritems():
+            successors[previous_version].append(version)
+
+        snapshots = deltas = rewritten = 0
+        # walk the history from its roots as (version, full previous structure, previous structure's chain)
+        pending = [
+            (version, None, None)
+            for version, previous_version in previous_versions.iteritems()
+            if previous_version not in previous_versions
+        ]
+        while pending:
+            version, base, base_chain = pending.pop()
+            doc = self.structures.find_one({'_id': version})
+            if base is not None and doc.get('delta_base') == base['_id']:
+                structure = apply_structure_delta(base, doc)
+            else:
+                structure = self._rebuild_structures([doc])[0]
+
+            target = structure
+            if base is not None and len(base_chain) + 1 < snapshot_interval:
+                delta = structure_delta(structure, base, base_chain + [base['_id']])
+                if len(delta['blocks']) * 2 <= len(structure['blocks']):
+                    target = delta
+
+            if 'delta_base' in target:
+                deltas += 1
+            else:
+                snapshots += 1
+            if any(doc.get(key) != target.get(key) for key in DELTA_KEYS):
+                rewritten += 1
+                if commit:
+                    self.structures.update({'_id': version}, target)
+
+            pending.extend(
+                (successor, structure, target.get('delta_chain', []))
+                for successor in successors[version]
+            )
+        return snapshots, deltas, rewritten
 
     def get_course_index(self, key, ignore_case=False):
         """
@@ -353,6 +770,19 @@ class MongoConnection(object):
                 }
             return self.course_index.find_one(query)
 
+    def find_course_indexes(self, keys, course_context=None):
+        """
+        Get the course_indexes whose ids are any of the given keys in one query
+        """
+        with TIMER.timer("find_course_indexes", course_context) as tagger:
+            tagger.measure("requested_ids", len(keys))
+            if not keys:
+                return []
+            return list(self.course_index.find({'$or': [
+                {key_attr: getattr(key, key_attr) for key_attr in ('org', 'course', 'run')}
+                for key in keys
+            ]}))
+
     def find_matching_course_indexes(self, branch=None, search_targets=None, org_target=None, course_context=None):
         """
         Find the course_index matching particular conditions.
@@ -432,12 +862,18 @@ class MongoConnection(object):
 
     def get_definitions(self, definitions, course_context=None):
         """
-        Retrieve all definitions listed in `definitions`.
+        Retrieve all definitions listed in `definitions` as a list, using one query
+        per DEFINITION_BATCH_SIZE ids.
         """
         with TIMER.timer("get_definitions", course_context) as tagger:
             tagger.measure('definitions', len(definitions))
-            definitions = self.definitions.find({'_id': {'$in': definitions}})
-            return definitions
+            results = []
+            for start in xrange(0, len(definitions), DEFINITION_BATCH_SIZE):
+                results.extend(
+                    self.definitions.find({'_id': {'$in': definitions[start:start + DEFINITION_BATCH_SIZE]}})
+                )
+            tagger.measure('queries', int(math.ceil(len(definitions) / float(DEFINITION_BATCH_SIZE))))
+            return results
 
     def insert_definition(self, definition, course_context=None):
         """
@@ -448,6 +884,23 @@ class MongoConnection(object):
             tagger.tag(block_type=definition['block_type'])
             self.definitions.insert(definition)
 
+    def insert_definitions(self, definitions, course_context=None):
+        """
+        Create the definitions in the db, DEFINITION_BATCH_SIZE of them per insert. Every definition which
+        isn't already in the db is inserted; raises DuplicateKeyError after inserting them if any already were.
+        """
+        with TIMER.timer("insert_definitions", course_context) as tagger:
+            tagger.measure('definitions', len(definitions))
+            duplicate_error = None
+            for start in xrange(0, len(definitions), DEFINITION_BATCH_SIZE):
+                try:
+                    self.definitions.insert(definitions[start:start + DEFINITION_BATCH_SIZE], continue_on_error=True)
+                except DuplicateKeyError as error:
+                    duplicate_error = error
+            tagger.measure('queries', int(math.ceil(len(definitions) / float(DEFINITION_BATCH_SIZE))))
+            if duplicate_error is not None:
+                raise duplicate_error
+
     def ensure_indexes(self):
         """
         Ensure that all appropriate indexes are created that are needed by this modulestore, or raise
@@ -57,6 +57,8 @@ import copy
 import datetime
 import hashlib
 import logging
+import re
+import threading
 from contracts import contract, new_contract
 from importlib import import_module
 from mongodb_proxy import autoretry_read
@@ -80,9 +82,10 @@ from xmodule.modulestore import (
 from ..exceptions import ItemNotFoundError
 from .caching_descriptor_system import CachingDescriptorSystem
 from xmodule.modulestore.split_mongo.mongo_connection import MongoConnection, DuplicateKeyError
+from xmodule.modulestore.split_mongo.compact_blocks import CompactBlockMap
 from xmodule.modulestore.split_mongo import BlockKey, CourseEnvelope
 from xmodule.error_module import ErrorDescriptor
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from types import NoneType
 from xmodule.assetstore import AssetMetadata
 
@@ -127,6 +130,8 @@ class SplitBulkWriteRecord(BulkOpsRecord):
         self.modules = defaultdict(dict)
         self.definitions = {}
         self.definitions_in_db = set()
+        # ids of structures whose blocks are shared with the structure they were versioned from
+        self.shared_structures = set()
         self.course_key = None
 
     # TODO: This needs to track which branches have actually been modified/versioned,
@@ -250,16 +255,20 @@ class SplitBulkWriteMixin(BulkOperationsMixin):
                 # append only, so if it's already been written, we can just keep going.
                 log.debug("Attempted to insert duplicate structure %s", _id)
 
-        for _id in bulk_write_record.definitions.viewkeys() - bulk_write_record.definitions_in_db:
+        new_definitions = [
+            bulk_write_record.definitions[_id]
+            for _id in bulk_write_record.definitions.viewkeys() - bulk_write_record.definitions_in_db
+        ]
+        if new_definitions:
             dirty = True
 
             try:
-                self.db_connection.insert_definition(bulk_write_record.definitions[_id], bulk_write_record.course_key)
+                self.db_connection.insert_definitions(new_definitions, bulk_write_record.course_key)
             except DuplicateKeyError:
-                # We may not have looked up this definition inside this bulk operation, and thus
-                # didn't realize that it was already in the database. That's OK, the store is
-                # append only, so if it's already been written, we can just keep going.
-                log.debug("Attempted to insert duplicate definition %s", _id)
+                # We may not have looked up some of these definitions inside this bulk operation, and thus
+                # didn't realize that they were already in the database. That's OK, the store is
+                # append only, so if they've already been written, we can just keep going.
+                log.debug("Attempted to insert duplicate definitions")
 
         if bulk_write_record.index is not None and bulk_write_record.index != bulk_write_record.initial_index:
             dirty = True
@@ -429,8 +438,11 @@ class SplitBulkWriteMixin(BulkOperationsMixin):
         if len(ids):
             # Query the db for the definitions.
             defs_from_db = self.db_connection.get_definitions(list(ids), course_key)
-            # Add the retrieved definitions to the cache.
-            bulk_write_record.definitions.update({d.get('_id'): d for d in defs_from_db})
+            if bulk_write_record.active:
+                # Add the retrieved definitions to the cache, noting that they needn't be written
+                # back out at the end of the bulk operation.
+                bulk_write_record.definitions.update({d.get('_id'): d for d in defs_from_db})
+                bulk_write_record.definitions_in_db.update(d.get('_id') for d in defs_from_db)
             definitions.extend(defs_from_db)
         return definitions
 
@@ -445,9 +457,12 @@ class SplitBulkWriteMixin(BulkOperationsMixin):
         else:
             self.db_connection.insert_definition(definition, course_key)
 
-    def version_structure(self, course_key, structure, user_id):
+    def version_structure(self, course_key, structure, user_id, share_blocks=False):
         """
         Copy the structure and update the history info (edited_by, edited_on, previous_version)
+
+        If share_blocks, the new structure gets its own blocks dict but shares the block records
+        with the original; so, the caller must replace rather than modify any block it changes.
         """
         if course_key.branch is None:
             raise InsufficientSpecificationError(course_key)
@@ -456,10 +471,20 @@ class SplitBulkWriteMixin(BulkOperationsMixin):
 
         # If we have an active bulk write, and it's already been edited, then just use that structure
         if bulk_write_record.active and course_key.branch in bulk_write_record.dirty_branches:
-            return bulk_write_record.structure_for_branch(course_key.branch)
+            structure = bulk_write_record.structure_for_branch(course_key.branch)
+            if not share_blocks and structure['_id'] in bulk_write_record.shared_structures:
+                # the caller may edit the blocks in place, so they can't be shared with the prior version anymore
+                structure['blocks'] = copy.deepcopy(structure['blocks'])
+                bulk_write_record.shared_structures.discard(structure['_id'])
+            return structure
 
         # Otherwise, make a new structure
-        new_structure = copy.deepcopy(structure)
+        if share_blocks and isinstance(structure['blocks'], dict):
+            new_structure = copy.copy(structure)
+            new_structure['blocks'] = dict(structure['blocks'])
+        else:
+            share_blocks = False
+            new_structure = copy.deepcopy(structure)
         new_structure['_id'] = ObjectId()
         new_structure['previous_version'] = structure['_id']
         new_structure['edited_by'] = user_id
@@ -469,6 +494,8 @@ class SplitBulkWriteMixin(BulkOperationsMixin):
         # If we're in a bulk write, update the structure used there, and mark it as dirty
         if bulk_write_record.active:
             bulk_write_record.set_structure_for_branch(course_key.branch, new_structure)
+            if share_blocks:
+                bulk_write_record.shared_structures.add(new_structure['_id'])
 
         return new_structure
 
@@ -635,19 +662,32 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
     # It won't recompute the value on operations such as update_course_index (e.g., to revert to a prev
     # version) but those functions will have an optional arg for setting these.
     SEARCH_TARGET_DICT = ['wiki_slug']
+    # settings fields which get_items looks up in a per structure index rather than by checking every block
+    INDEXED_SETTINGS = ['graded', 'format']
 
     def __init__(self, contentstore, doc_store_config, fs_root, render_template,
                  default_class=None,
                  error_tracker=null_error_tracker,
                  i18n_service=None, fs_service=None, user_service=None,
-                 services=None, signal_handler=None, **kwargs):
+                 services=None, signal_handler=None, compact_structures=False, structure_snapshot_interval=None,
+                 inherited_settings_cache_size=100, **kwargs):
         """
         :param doc_store_config: must have a host, db, and collection entries. Other common entries: port, tz_aware.
+        :param compact_structures: if True, keep each structure's blocks in a CompactBlockMap which
+            only builds the BlockData objects as they're accessed (saves memory on large courses)
+        :param structure_snapshot_interval: if set, store each new structure as the changes from its
+            previous version, with a full copy at least every this many versions
+        :param inherited_settings_cache_size: how many structure versions' tables of inherited settings
+            to keep in process for all requests to share (0 disables the cache)
         """
 
         super(SplitMongoModuleStore, self).__init__(contentstore, **kwargs)
 
-        self.db_connection = MongoConnection(**doc_store_config)
+        self.db_connection = MongoConnection(
+            compact_structures=compact_structures,
+            structure_snapshot_interval=structure_snapshot_interval,
+            **doc_store_config
+        )
         self.db = self.db_connection.database
 
         if default_class is not None:
@@ -674,6 +714,11 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
 
         self.signal_handler = signal_handler
 
+        # structure version -> table of the settings each block inherits (see _get_inherited_settings)
+        self.inherited_settings_cache_size = inherited_settings_cache_size
+        self.inherited_settings_cache = OrderedDict()
+        self._inherited_settings_lock = threading.Lock()
+
     def close_connections(self):
         """
         Closes any open connections to the underlying databases
@@ -745,6 +790,38 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
             system.module_data.update(new_module_data)
             return system.module_data
 
+    def prefetch_definitions(self, system, block_keys, course_key, depth=None):
+        """
+        Fetch the definitions of the given blocks and their descendants out to depth into the
+        runtime's definition cache, using one query per batch rather than one query per block
+        as each block's content is first accessed. Definitions which are already loaded or
+        cached aren't fetched again.
+
+        Arguments:
+            system: a CachingDescriptorSystem
+            block_keys: list of BlockKeys of the subtree roots
+            course_key: the destination course providing the context
+            depth: how deep below these to prefetch (None for the whole subtree)
+        """
+        with self.bulk_operations(course_key, emit_signals=False):
+            subtree = {}
+            for block_key in block_keys:
+                subtree = self.descendants(system.course_entry.structure['blocks'], block_key, depth, subtree)
+            system.module_data.update(subtree)
+
+            missing_ids = {
+                block.definition
+                for block in subtree.itervalues()
+                if not block.definition_loaded and block.definition is not None and
+                block.definition not in system.definitions
+            }
+            if missing_ids:
+                system.definitions.update(
+                    (definition['_id'], definition)
+                    for definition in self.get_definitions(course_key, list(missing_ids))
+                )
+            return system.definitions
+
     @contract(course_entry=CourseEnvelope, block_keys="list(BlockKey)", depth="int | None")
     def _load_items(self, course_entry, block_keys, depth=0, **kwargs):
         """
@@ -752,13 +829,20 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
 
         Load the definitions into each block if lazy is in kwargs and is False;
         otherwise, do not load the definitions - they'll be loaded later when needed.
+
+        If prefetch_depth is in kwargs, load the definitions of the blocks and their
+        descendants out to that depth (None for all) in bulk even when lazy.
         """
         runtime = self._get_cache(course_entry.structure['_id'])
+        lazy = kwargs.pop('lazy', True)
+        prefetch = 'prefetch_depth' in kwargs
+        prefetch_depth = kwargs.pop('prefetch_depth', None)
         if runtime is None:
-            lazy = kwargs.pop('lazy', True)
             runtime = self.create_runtime(course_entry, lazy)
             self._add_cache(course_entry.structure['_id'], runtime)
             self.cache_items(runtime, block_keys, course_entry.course_key, depth, lazy)
+        if prefetch:
+            self.prefetch_definitions(runtime, block_keys, course_entry.course_key, prefetch_depth)
 
         return [runtime.load_item(block_key, course_entry, **kwargs) for block_key in block_keys]
 
@@ -787,6 +871,12 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
         Should only be used by testing or something which implements transactional boundary semantics.
         :param course_version_guid: if provided, clear only this entry
         """
+        with self._inherited_settings_lock:
+            if course_version_guid:
+                self.inherited_settings_cache.pop(course_version_guid, None)
+            else:
+                self.inherited_settings_cache.clear()
+
         if self.request_cache is None:
             return
 
@@ -795,8 +885,210 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
                 del self.request_cache.data.setdefault('course_cache', {})[course_version_guid]
             except KeyError:
                 pass
+            self.request_cache.data.setdefault('structure_indexes', {}).pop(course_version_guid, None)
         else:
             self.request_cache.data['course_cache'] = {}
+            self.request_cache.data['structure_indexes'] = {}
+
+    def _get_structure_index(self, structure, name, build):
+        """
+        Return the structure's index called name, calling build() to make it the first time it's
+        needed for this structure version. The indexes are cached alongside the version's descriptor
+        cache (which update_structure clears); so, they must not be used for a structure while it's
+        being changed.
+        """
+        if self.request_cache is None:
+            return build()
+
+        indexes = self.request_cache.data.setdefault('structure_indexes', {}).setdefault(structure['_id'], {})
+        if name not in indexes:
+            indexes[name] = build()
+        return indexes[name]
+
+    def _get_parent_map(self, structure):
+        """
+        Return the index of the parents of each block in the structure, as a dict of child BlockKey
+        to the list of its parents' BlockKeys.
+        """
+        return self._get_structure_index(structure, 'parents', lambda: self._build_parent_map(structure['blocks']))
+
+    def _get_block_index(self, structure, field_name):
+        """
+        Return the index of the structure's blocks by field_name: 'block_type', 'name' (the block_id),
+        or one of INDEXED_SETTINGS. It's a dict of each value to the (ascending) positions of the
+        blocks with that value in the structure's block order (see _get_block_order). A block whose
+        value is a list is indexed under each of its elements.
+        """
+        return self._get_structure_index(
+            structure, field_name,
+            lambda: self._build_block_index(structure['blocks'], self._get_block_order(structure), field_name)
+        )
+
+    @classmethod
+    def _build_block_index(cls, blocks, block_order, field_name):
+        """
+        Build the index of the blocks, in block_order, by field_name (see _get_block_index)
+        """
+        get_fields = cls._fields_getter(blocks)
+        index = defaultdict(list)
+        for position, block_key in enumerate(block_order):
+            if field_name == 'block_type':
+                values = [block_key.type]
+            elif field_name == 'name':
+                values = [block_key.id]
+            else:
+                fields = get_fields(block_key)
+                if field_name not in fields:
+                    continue
+                values = fields[field_name]
+                if not isinstance(values, list):
+                    values = [values]
+            for value in values:
+                try:
+                    index[value].append(position)
+                except TypeError:
+                    # unhashable values can't be looked up by value anyway
+                    pass
+        return dict(index)
+
+    @staticmethod
+    def _fields_getter(blocks):
+        """
+        Return a function returning the (read-only) fields of a block in blocks by its BlockKey, which
+        doesn't build the BlockData of the blocks of a CompactBlockMap
+        """
+        if isinstance(blocks, CompactBlockMap):
+            return blocks.raw_fields
+        return lambda block_key: blocks[block_key].fields
+
+    def _get_block_order(self, structure):
+        """
+        Return the list of the structure's BlockKeys in its iteration order.
+        """
+        return self._get_structure_index(structure, 'order', lambda: list(structure['blocks']))
+
+    @staticmethod
+    def _index_values(criteria):
+        """
+        Return the list of values to look up in a block index for the get_items criteria, or None if
+        the criteria (e.g., a regex or function) can't be answered by looking values up.
+        """
+        if isinstance(criteria, dict):
+            if criteria.keys() != ['$in']:
+                return None
+            values = criteria['$in']
+        elif isinstance(criteria, (list, re._pattern_type)) or callable(criteria):  # pylint: disable=protected-access
+            return None
+        else:
+            values = [criteria]
+        for value in values:
+            if isinstance(value, (dict, list, re._pattern_type)) or callable(value):  # pylint: disable=protected-access
+                return None
+            try:
+                hash(value)
+            except TypeError:
+                return None
+        return values
+
+    def _find_candidates(self, structure, lookups):
+        """
+        Return the list of the structure's BlockKeys (in the structure's order) which might match
+        the lookups, a list of (index field_name, criteria), using the block indexes; or, None if
+        none of the criteria can be looked up.
+        """
+        positions = None
+        for field_name, criteria in lookups:
+            values = self._index_values(criteria)
+            if values is None:
+                continue
+            index = self._get_block_index(structure, field_name)
+            matches = set()
+            for value in values:
+                matches.update(index.get(value, []))
+            positions = matches if positions is None else positions & matches
+        if positions is None:
+            return None
+        block_order = self._get_block_order(structure)
+        return [block_order[position] for position in sorted(positions)]
+
+    def _get_inherited_settings(self, structure):
+        """
+        Return the table of the inheritable settings each block in the structure inherits from its
+        ancestors, as a dict of BlockKey to a dict of field name to the (json) value set by the nearest
+        ancestor which sets it. It's built once per structure version and kept in process for all
+        requests; so, like the other structure indexes, it must not be used for a structure while it's
+        being changed (update_structure clears it). Blocks share their dicts; so, never change them.
+        """
+        structure_id = structure['_id']
+        with self._inherited_settings_lock:
+            inherited_settings = self.inherited_settings_cache.pop(structure_id, None)
+            if inherited_settings is not None:
+                # mark it as the most recently used
+                self.inherited_settings_cache[structure_id] = inherited_settings
+                return inherited_settings
+
+        inherited_settings = self._build_inherited_settings(structure['blocks'], self._get_parent_map(structure))
+        if self.inherited_settings_cache_size > 0:
+            with self._inherited_settings_lock:
+                self.inherited_settings_cache[structure_id] = inherited_settings
+                while len(self.inherited_settings_cache) > self.inherited_settings_cache_size:
+                    self.inherited_settings_cache.popitem(last=False)
+        return inherited_settings
+
+    @classmethod
+    def _build_inherited_settings(cls, blocks, parent_map):
+        """
+        Compute the table for _get_inherited_settings. A block inherits from its last parent in the
+        parent_map (as the runtime's get_parent does). A block which doesn't set any inheritable setting
+        shares the dict it passes to its children with its own inherited one.
+        """
+        inheritable_names = inheritance.InheritanceMixin.fields
+        get_fields = cls._fields_getter(blocks)
+        inherited_settings = {}
+        # block key -> the settings its children inherit
+        passed_down = {}
+        for block_key in blocks:
+            # walk up to the nearest ancestor whose settings are already known
+            chain = []
+            ancestor = block_key
+            while ancestor is not None and ancestor not in inherited_settings and ancestor not in chain:
+                chain.append(ancestor)
+                parents = parent_map.get(ancestor)
+                ancestor = parents[-1] if parents else None
+            # a cycle is treated as having no ancestors (there's no top of it to inherit from)
+            settings = passed_down.get(ancestor, {})
+
+            for key in reversed(chain):
+                inherited_settings[key] = settings
+                local_settings = {
+                    field_name: value
+                    for field_name, value in get_fields(key).iteritems()
+                    if field_name in inheritable_names
+                }
+                if local_settings:
+                    settings = dict(settings, **local_settings)
+                passed_down[key] = settings
+        return inherited_settings
+
+    @staticmethod
+    def _build_parent_map(blocks):
+        """
+        Build the index of the parents of each block in blocks (see _get_parent_map)
+        """
+        if isinstance(blocks, CompactBlockMap):
+            # don't build every BlockData just to read its children
+            get_children = blocks.children
+        else:
+            get_children = lambda block_key: blocks[block_key].fields.get('children', [])
+
+        parent_map = {}
+        for block_key in blocks:
+            for child in get_children(block_key):
+                parents = parent_map.setdefault(BlockKey(*child), [])
+                # a child listed more than once still has the one parent
+                if not parents or parents[-1] != block_key:
+                    parents.append(block_key)
+        return parent_map
 
     def _lookup_course(self, course_key, head_validation=True):
         """
@@ -931,6 +1223,16 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
         # get the blocks for each course index (s/b the root)
         return self._get_structures_for_branch_and_locator(branch, self._create_course_locator, **kwargs)
 
+    def get_course_keys(self, branch, **kwargs):
+        """
+        Returns the keys of the courses on the branch without loading the courses. Accepts the optional
+        'org' filter of get_courses.
+        """
+        return [
+            self._create_course_locator(course_index, branch)
+            for course_index in self.find_matching_course_indexes(branch, org_target=kwargs.get('org'))
+        ]
+
     def get_libraries(self, branch="library", **kwargs):
         """
         Returns a list of "library" root blocks matching any given qualifiers.
@@ -966,6 +1268,86 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
             raise ItemNotFoundError(course_id)
         return self._get_structure(course_id, depth, **kwargs)
 
+    def get_courses_by_ids(self, course_keys, depth=0, **kwargs):
+        """
+        Returns a dict of the given course keys to the course descriptors of those courses which exist
+        in this modulestore.
+
+        Gets the indexes and structures of all the courses in one query each, other than for the
+        courses which are in bulk operations or have versions which are got one by one.
+        """
+        return self._load_courses_by_ids(self._prepare_courses_by_ids(course_keys)(), depth, **kwargs)
+
+    def _course_lookup_key(self, course_key):
+        """
+        Return the key to look up the course for the given key by (see get_courses_by_ids)
+        """
+        return course_key
+
+    def _prepare_courses_by_ids(self, course_keys):
+        """
+        Return a function which gets the entries of the given courses from the db for
+        _load_courses_by_ids. The function doesn't use any thread state (bulk operations, branch settings,
+        or the request cache) so it may be run in another thread.
+        """
+        batched = {}
+        individual = {}
+        for course_key in course_keys:
+            if not isinstance(course_key, CourseLocator) or course_key.deprecated:
+                # The supplied CourseKey is of the wrong type, so it can't possibly be stored in this modulestore.
+                continue
+            lookup_key = self._course_lookup_key(course_key)
+            if lookup_key.branch is None or lookup_key.version_guid or self._is_in_bulk_operation(lookup_key):
+                individual[course_key] = lookup_key
+            else:
+                batched[course_key] = lookup_key
+
+        def fetch():
+            """
+            Return the entries of the batched courses and the courses to get one by one
+            """
+            if not batched:
+                return {}, individual
+            indexes = {
+                (index['org'], index['course'], index['run']): index
+                for index in self.db_connection.find_course_indexes(batched.values())
+            }
+            version_guids = {}
+            for course_key, lookup_key in batched.iteritems():
+                index = indexes.get((lookup_key.org, lookup_key.course, lookup_key.run))
+                if index is not None and lookup_key.branch in index['versions']:
+                    version_guids[course_key] = index['versions'][lookup_key.branch]
+
+            structures = {
+                structure['_id']: structure
+                for structure in self.db_connection.find_structures_by_id(list(set(version_guids.values())))
+            }
+            entries = {
+                course_key: CourseEnvelope(
+                    batched[course_key].replace(version_guid=version_guid), structures[version_guid]
+                )
+                for course_key, version_guid in version_guids.iteritems()
+                if version_guid in structures
+            }
+            return entries, individual
+        return fetch
+
+    def _load_courses_by_ids(self, fetched, depth=0, **kwargs):
+        """
+        Load the course descriptors from the result of a _prepare_courses_by_ids function
+        """
+        entries, individual = fetched
+        courses = {}
+        for course_key, entry in entries.iteritems():
+            # _load_items consumes some of the kwargs
+            courses[course_key] = self._load_items(entry, [entry.structure['root']], depth, **dict(kwargs))[0]
+        for course_key, lookup_key in individual.iteritems():
+            try:
+                courses[course_key] = self._get_structure(lookup_key, depth, **dict(kwargs))
+            except ItemNotFoundError:
+                continue
+        return courses
+
     def get_library(self, library_id, depth=0, head_validation=True, **kwargs):
         """
         Gets the 'library' root block for the library identified by the locator
@@ -1080,30 +1462,46 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
 
         def _block_matches_all(block_data):
             """
-            Check that the block matches all the criteria
+            Check that the block matches all the criteria which don't require loading any additional data
             """
-            # do the checks which don't require loading any additional data
-            if (  # pylint: disable=bad-continuation
+            return (
                 self._block_matches(block_data, qualifiers) and
                 self._block_matches(block_data.fields, settings)
-            ):
-                if content:
-                    definition_block = self.get_definition(course_locator, block_data.definition)
-                    return self._block_matches(definition_block['fields'], content)
-                else:
-                    return True
+            )
+
+        def _content_matches(block_ids):
+            """
+            Return the block_ids whose definitions match the content criteria, fetching the
+            definitions in bulk rather than one at a time.
+            """
+            if not content:
+                return block_ids
+            blocks = course.structure['blocks']
+            definitions = {
+                definition['_id']: definition
+                for definition in self.get_definitions(
+                    course_locator, [blocks[block_id].definition for block_id in block_ids]
+                )
+            }
+            return [
+                block_id for block_id in block_ids
+                if blocks[block_id].definition in definitions and
+                self._block_matches(definitions[blocks[block_id].definition]['fields'], content)
+            ]
 
         if settings is None:
             settings = {}
+        blocks = course.structure['blocks']
         if 'name' in qualifiers:
             # odd case where we don't search just confirm
             block_name = qualifiers.pop('name')
             block_ids = []
-            for block_id, block in course.structure['blocks'].iteritems():
-                if block_name == block_id.id and _block_matches_all(block):
+            candidates = self._find_candidates(course.structure, [('name', block_name)])
+            for block_id in blocks if candidates is None else candidates:
+                if block_name == block_id.id and _block_matches_all(blocks[block_id]):
                     block_ids.append(block_id)
 
-            return self._load_items(course, block_ids, **kwargs)
+            return self._load_items(course, _content_matches(block_ids), **kwargs)
 
         if 'category' in qualifiers:
             qualifiers['block_type'] = qualifiers.pop('category')
@@ -1111,9 +1509,17 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
         # don't expect caller to know that children are in fields
         if 'children' in qualifiers:
             settings['children'] = qualifiers.pop('children')
-        for block_id, value in course.structure['blocks'].iteritems():
-            if _block_matches_all(value):
+
+        # narrow the blocks to check using the indexes for any criteria they can answer
+        lookups = [('block_type', qualifiers['block_type'])] if 'block_type' in qualifiers else []
+        lookups.extend(
+            (field_name, settings[field_name]) for field_name in self.INDEXED_SETTINGS if field_name in settings
+        )
+        candidates = self._find_candidates(course.structure, lookups)
+        for block_id in blocks if candidates is None else candidates:
+            if _block_matches_all(blocks[block_id]):
                 items.append(block_id)
+        items = _content_matches(items)
 
         if len(items) > 0:
             return self._load_items(course, items, depth=0, **kwargs)
@@ -1152,18 +1558,14 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
             # The supplied CourseKey is of the wrong type, so it can't possibly be stored in this modulestore.
             raise ItemNotFoundError(course_key)
 
-        detached_categories = [name for name, __ in XBlock.load_tagged_classes("detached")]
+        detached_categories = set(name for name, __ in XBlock.load_tagged_classes("detached"))
         course = self._lookup_course(course_key)
-        items = set(course.structure['blocks'].keys())
-        items.remove(course.structure['root'])
-        blocks = course.structure['blocks']
-        for block_id, block_data in blocks.iteritems():
-            items.difference_update(BlockKey(*child) for child in block_data.fields.get('children', []))
-            if block_data.block_type in detached_categories:
-                items.discard(block_id)
+        parent_map = self._get_parent_map(course.structure)
         return [
             course_key.make_usage_key(block_type=block_id.type, block_id=block_id.id)
-            for block_id in items
+            for block_id in course.structure['blocks']
+            if block_id not in parent_map and block_id != course.structure['root'] and
+            block_id.type not in detached_categories
         ]
 
     def get_course_index_info(self, course_key):
@@ -1303,8 +1705,13 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
             element_to_find = self._get_block_from_structure(course_struct, block_key).edit_info.update_version
             if element_to_find in possible_roots:
                 possible_roots = [element_to_find]
+            previous_versions = {
+                version: previous_version
+                for previous_version, versions in result.iteritems()
+                for version in versions
+            }
             for possibility in possible_roots:
-                if self._find_local_root(element_to_find, possibility, result):
+                if self._find_local_root(element_to_find, possibility, previous_versions):
                     possible_roots = [possibility]
                     break
         elif len(possible_roots) == 0:
@@ -1550,6 +1957,69 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
             # reconstruct the new_item from the cache
             return self.get_item(item_loc)
 
+    def create_items(self, user_id, course_key, items, force=False, **kwargs):
+        """
+        Add many new blocks to the course in one new version of its structure, each with a new
+        definition. Unlike create_item, this neither versions the structure per block nor loads the
+        new blocks back, so it suits copying whole courses; the definitions are written in batches
+        when the bulk operation ends.
+
+        :param items: an iterable of (block_type, block_id, fields) tuples, one per new block. block_id
+            may be None to have one generated, and fields holds the block's values in all scopes, as
+            create_item's fields do.
+
+        Returns the BlockUsageLocators of the new blocks in the order of items.
+
+        raises DuplicateItemError if any block_id is already in the structure.
+        raises VersionConflictError as create_item does.
+        """
+        with self.bulk_operations(course_key):
+            index_entry = self._get_index_if_valid(course_key, force)
+            structure = self._lookup_course(course_key).structure
+            new_structure = self.version_structure(course_key, structure, user_id)
+            new_id = new_structure['_id']
+
+            if index_entry is not None:
+                locator_course_key = course_key.version_agnostic()
+            else:
+                locator_course_key = CourseLocator(version_guid=new_id)
+
+            item_locs = []
+            for block_type, block_id, fields in items:
+                if block_id is not None:
+                    block_key = BlockKey(block_type, block_id)
+                    if block_key in new_structure['blocks']:
+                        raise DuplicateItemError(block_id, self, 'structures')
+                else:
+                    block_key = self._generate_block_key(new_structure['blocks'], block_type)
+
+                partitioned_fields = self.partition_fields_by_scope(block_type, fields)
+                definition_locator = self.create_definition_from_data(
+                    course_key, partitioned_fields.get(Scope.content, {}), block_type, user_id
+                )
+                block_fields = partitioned_fields.get(Scope.settings, {})
+                if Scope.children in partitioned_fields:
+                    block_fields.update(partitioned_fields[Scope.children])
+                self._update_block_in_structure(new_structure, block_key, self._new_block(
+                    user_id,
+                    block_type,
+                    block_fields,
+                    definition_locator.definition_id,
+                    new_id,
+                ))
+                if index_entry is not None:
+                    self._update_search_targets(index_entry, fields)
+                item_locs.append(BlockUsageLocator(locator_course_key, block_type=block_type, block_id=block_key.id))
+
+            self.update_structure(course_key, new_structure)
+            if index_entry is not None:
+                self._update_head(course_key, index_entry, course_key.branch, new_id)
+
+            if isinstance(course_key, LibraryLocator):
+                self._flag_library_updated_event(course_key)
+
+            return item_locs
+
     def create_child(self, user_id, parent_usage_key, block_type, block_id=None, fields=None, **kwargs):
         """
         Creates and saves a new xblock that as a child of the specified block
@@ -2114,6 +2584,11 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
         :param blacklist: a list of usage keys to not change in the destination: i.e., don't add
         if not there, don't update if there.
 
+        Only the blocks which changed since they were last copied are copied: the new destination
+        structure shares the records of all the other blocks with its prior version.
+
+        Returns the number of blocks copied (or changed) in the destination.
+
         Raises:
             ItemNotFoundError: if it cannot find the course. if the request is to publish a
                 subtree but the ancestors up to and including the course root are not published.
@@ -2141,12 +2616,15 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
                 )
             else:
                 destination_structure = self._lookup_course(destination_course).structure
-                destination_structure = self.version_structure(destination_course, destination_structure, user_id)
+                destination_structure = self.version_structure(
+                    destination_course, destination_structure, user_id, share_blocks=True
+                )
 
             if blacklist != EXCLUDE_ALL:
                 blacklist = [BlockKey.from_usage_key(shunned) for shunned in blacklist or []]
             # iterate over subtree list filtering out blacklist.
             orphans = set()
+            copied = set()
             destination_blocks = destination_structure['blocks']
             for subtree_root in subtree_list:
                 if BlockKey.from_usage_key(subtree_root) != source_structure['root']:
@@ -2158,13 +2636,19 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
                         # in the course export. Continue and only throw an exception if *no* parents are found.
                         if parent in destination_blocks:
                             parent_found = True
+                            # the destination's block records may be shared w/ its prior version, so
+                            # change a copy of the parent
+                            destination_parent = copy.deepcopy(destination_blocks[parent])
                             orphans.update(
                                 self._sync_children(
                                     source_structure['blocks'][parent],
-                                    destination_blocks[parent],
+                                    destination_parent,
                                     BlockKey.from_usage_key(subtree_root)
                                 )
                             )
+                            if destination_parent.fields['children'] != destination_blocks[parent].fields['children']:
+                                destination_blocks[parent] = destination_parent
+                                copied.add(parent)
                     if len(parents) and not parent_found:
                         raise ItemNotFoundError(parents)
                 # update/create the subtree and its children in destination (skipping blacklist)
@@ -2174,17 +2658,26 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
                         BlockKey.from_usage_key(subtree_root),
                         source_structure['blocks'],
                         destination_blocks,
-                        blacklist
+                        blacklist,
+                        copied
                     )
                 )
             # remove any remaining orphans
-            for orphan in orphans:
-                # orphans will include moved as well as deleted xblocks. Only delete the deleted ones.
-                self._delete_if_true_orphan(orphan, destination_structure)
+            if orphans:
+                # destination_structure is being changed; so, don't use (or cache) its _get_parent_map
+                parent_map = self._build_parent_map(destination_blocks)
+                for orphan in orphans:
+                    # orphans will include moved as well as deleted xblocks. Only delete the deleted ones.
+                    self._delete_if_true_orphan(orphan, destination_structure, parent_map)
 
             # update the db
             self.update_structure(destination_course, destination_structure)
             self._update_head(destination_course, index_entry, destination_course.branch, destination_structure['_id'])
+            log.debug(
+                u"Copied %d of %d blocks from %s to %s",
+                len(copied), len(destination_blocks), source_course, destination_course
+            )
+            return len(copied)
 
     @contract(source_keys="list(BlockUsageLocator)", dest_usage=BlockUsageLocator)
     def copy_from_template(self, source_keys, dest_usage, user_id, head_validation=True):
@@ -2411,7 +2904,7 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
 
             return result
 
-    @contract(block_key=BlockKey, blocks='dict(BlockKey: BlockData)')
+    @contract(block_key=BlockKey, blocks='map(BlockKey: BlockData)')
     def _remove_subtree(self, block_key, blocks):
         """
         Remove the subtree rooted at block_key
@@ -2436,7 +2929,31 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
         # in case the course is later restored.
         # super(SplitMongoModuleStore, self).delete_course(course_key, user_id)
 
-    @contract(block_map="dict(BlockKey: dict)", block_key=BlockKey)
+    def compact_structure_history(self, course_key, snapshot_interval=None, commit=True):
+        """
+        Re-store the history of each of the course's branches as the changes from each version to
+        the next, with a full copy at least every snapshot_interval versions (defaults to the
+        store's structure_snapshot_interval).
+
+        :param commit: if False, only count what would be stored
+
+        Returns a (number of full copies, number of deltas, number of versions rewritten) tuple.
+        """
+        index = self.get_course_index(course_key)
+        if index is None:
+            raise ItemNotFoundError(course_key)
+
+        original_versions = set(
+            self.get_structure(course_key, version)['original_version']
+            for version in index['versions'].itervalues()
+        )
+        totals = [0, 0, 0]
+        for original_version in original_versions:
+            counts = self.db_connection.rewrite_structure_history(original_version, snapshot_interval, commit)
+            totals = [total + count for total, count in zip(totals, counts)]
+        return tuple(totals)
+
+    @contract(block_map="map(BlockKey: *)", block_key=BlockKey)
     def inherit_settings(
         self, block_map, block_key, inherited_settings_map, inheriting_settings=None, inherited_from=None
     ):
@@ -2771,14 +3288,19 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
                     index_entry['versions'][course_key.branch]
                 )
 
-    def _find_local_root(self, element_to_find, possibility, tree):
-        if possibility not in tree:
-            return False
-        if element_to_find in tree[possibility]:
-            return True
-        for subtree in tree[possibility]:
-            if self._find_local_root(element_to_find, subtree, tree):
+    def _find_local_root(self, element_to_find, possibility, previous_versions):
+        """
+        Is the version possibility an ancestor of the version element_to_find?
+
+        :param previous_versions: the index of the previous version of each version
+        """
+        seen = set()
+        version = previous_versions.get(element_to_find)
+        while version is not None and version not in seen:
+            if version == possibility:
                 return True
+            seen.add(version)
+            version = previous_versions.get(version)
         return False
 
     def _update_search_targets(self, index_entry, fields):
@@ -2892,11 +3414,7 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
         Given a structure, find block_key's parent in that structure. Note returns
         the encoded format for parent
         """
-        return [
-            parent_block_key
-            for parent_block_key, value in structure['blocks'].iteritems()
-            if block_key in value.fields.get('children', [])
-        ]
+        return list(self._get_parent_map(structure).get(block_key, []))
 
     def _sync_children(self, source_parent, destination_parent, new_child):
         """
@@ -2915,17 +3433,24 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
 
     @contract(
         block_key=BlockKey,
-        source_blocks="dict(BlockKey: *)",
-        destination_blocks="dict(BlockKey: *)",
+        source_blocks="map(BlockKey: *)",
+        destination_blocks="map(BlockKey: *)",
         blacklist="list(BlockKey) | str",
     )
-    def _copy_subdag(self, user_id, destination_version, block_key, source_blocks, destination_blocks, blacklist):
+    def _copy_subdag(
+        self, user_id, destination_version, block_key, source_blocks, destination_blocks, blacklist, copied=None
+    ):
         """
         Update destination_blocks for the sub-dag rooted at block_key to be like the one in
         source_blocks excluding blacklist.
 
+        Blocks whose destination is already a copy of the source block are left as is; the others are
+        replaced by new records (never modified in place) and their keys are added to copied (a set).
+
         Return any newly discovered orphans (as a set)
         """
+        if copied is None:
+            copied = set()
         orphans = set()
         destination_block = destination_blocks.get(block_key)
         new_block = source_blocks[block_key]
@@ -2946,15 +3471,20 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
                 for index, child in enumerate(source_children):
                     if child not in blacklist:
                         destination_reordered[index] = child
-            # the history of the published leaps between publications and only points to
-            # previously published versions.
-            previous_version = destination_block.edit_info.update_version
-            destination_block = copy.deepcopy(new_block)
-            destination_block.fields['children'] = destination_reordered.compact_list()
-            destination_block.edit_info.previous_version = previous_version
-            destination_block.edit_info.update_version = destination_version
-            destination_block.edit_info.edited_by = user_id
-            destination_block.edit_info.edited_on = datetime.datetime.now(UTC)
+            destination_children = destination_reordered.compact_list()
+            if self._is_copy_of(destination_block, new_block, destination_children):
+                # nothing changed since the last copy, so keep the destination's record
+                new_block = None
+            else:
+                # the history of the published leaps between publications and only points to
+                # previously published versions.
+                previous_version = destination_block.edit_info.update_version
+                destination_block = copy.deepcopy(new_block)
+                destination_block.fields['children'] = destination_children
+                destination_block.edit_info.previous_version = previous_version
+                destination_block.edit_info.update_version = destination_version
+                destination_block.edit_info.edited_by = user_id
+                destination_block.edit_info.edited_on = datetime.datetime.now(UTC)
         else:
             destination_block = self._new_block(
                 user_id, new_block.block_type,
@@ -2969,20 +3499,35 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
                 if getattr(destination_block.edit_info, key) is None:
                     setattr(destination_block.edit_info, key, val)
 
-        # introduce new edit info field for tracing where copied/published blocks came
-        destination_block.edit_info.source_version = new_block.edit_info.update_version
+        if new_block is not None:
+            # introduce new edit info field for tracing where copied/published blocks came
+            destination_block.edit_info.source_version = new_block.edit_info.update_version
+            destination_blocks[block_key] = destination_block
+            copied.add(block_key)
 
         if blacklist != EXCLUDE_ALL:
             for child in destination_block.fields.get('children', []):
                 if child not in blacklist:
                     orphans.update(
                         self._copy_subdag(
-                            user_id, destination_version, BlockKey(*child), source_blocks, destination_blocks, blacklist
+                            user_id, destination_version, BlockKey(*child), source_blocks, destination_blocks,
+                            blacklist, copied
                         )
                     )
-        destination_blocks[block_key] = destination_block
         return orphans
 
+    def _is_copy_of(self, destination_block, source_block, destination_children):
+        """
+        Is destination_block an unchanged copy of source_block which would get destination_children?
+        """
+        return (
+            destination_block.edit_info.source_version == source_block.edit_info.update_version and
+            destination_block.block_type == source_block.block_type and
+            destination_block.definition == source_block.definition and
+            destination_block.defaults == source_block.defaults and
+            destination_block.fields == dict(source_block.fields, children=destination_children)
+        )
+
     @contract(blacklist='list(BlockKey) | str')
     def _filter_blacklist(self, fields, blacklist):
         """
@@ -2996,13 +3541,18 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
         return fields
 
     @contract(orphan=BlockKey)
-    def _delete_if_true_orphan(self, orphan, structure):
+    def _delete_if_true_orphan(self, orphan, structure, parent_map):
         """
         Delete the orphan and any of its descendants which no longer have parents.
+
+        :param parent_map: the structure's index of parents (see _build_parent_map), which this
+            keeps up to date as it deletes blocks
         """
-        if len(self._get_parents_from_structure(orphan, structure)) == 0:
+        if orphan in structure['blocks'] and not parent_map.get(orphan):
             for child in structure['blocks'][orphan].fields.get('children', []):
-                self._delete_if_true_orphan(BlockKey(*child), structure)
+                child = BlockKey(*child)
+                parent_map[child] = [parent for parent in parent_map.get(child, []) if parent != orphan]
+                self._delete_if_true_orphan(child, structure, parent_map)
             del structure['blocks'][orphan]
 
     @contract(returns=BlockData)
@@ -57,6 +57,9 @@ class DraftVersioningModuleStore(SplitMongoModuleStore, ModuleStoreDraftAndPubli
         course_id = self._map_revision_to_branch(course_id)
         return super(DraftVersioningModuleStore, self).get_course(course_id, depth=depth, **kwargs)
 
+    def _course_lookup_key(self, course_key):
+        return self._map_revision_to_branch(course_key)
+
     def get_library(self, library_id, depth=0, head_validation=True, **kwargs):
         if not head_validation and library_id.version_guid:
             return SplitMongoModuleStore.get_library(
@@ -86,6 +89,20 @@ class DraftVersioningModuleStore(SplitMongoModuleStore, ModuleStoreDraftAndPubli
         else:
             raise InsufficientSpecificationError()
 
+    def get_course_keys(self, **kwargs):
+        """
+        Returns the keys of all the courses on the Draft or Published branch depending on the branch setting.
+        """
+        branch_setting = self.get_branch_setting()
+        if branch_setting == ModuleStoreEnum.Branch.draft_preferred:
+            return super(DraftVersioningModuleStore, self).get_course_keys(ModuleStoreEnum.BranchName.draft, **kwargs)
+        elif branch_setting == ModuleStoreEnum.Branch.published_only:
+            return super(DraftVersioningModuleStore, self).get_course_keys(
+                ModuleStoreEnum.BranchName.published, **kwargs
+            )
+        else:
+            raise InsufficientSpecificationError()
+
     def _auto_publish_no_children(self, location, category, user_id, **kwargs):
         """
         Publishes item if the category is DIRECT_ONLY. This assumes another method has checked that
@@ -160,6 +177,17 @@ class DraftVersioningModuleStore(SplitMongoModuleStore, ModuleStoreDraftAndPubli
                 self._auto_publish_no_children(item.location, item.location.category, user_id, **kwargs)
             return item
 
+    def create_items(self, user_id, course_key, items, force=False, **kwargs):
+        """
+        See :py:meth `SplitMongoModuleStore.create_items`. Unlike create_item, this never auto-publishes
+        the new blocks.
+        """
+        course_key = self._map_revision_to_branch(course_key)
+        with self.bulk_operations(course_key, emit_signals=course_key.branch == ModuleStoreEnum.BranchName.published):
+            return super(DraftVersioningModuleStore, self).create_items(
+                user_id, course_key, items, force=force, **kwargs
+            )
+
     def create_child(
             self, user_id, parent_usage_key, block_type, block_id=None,
             fields=None, **kwargs
@@ -16,7 +16,7 @@ from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.modulestore.tests.factories import CourseFactory
 from xmodule.modulestore.tests.test_cross_modulestore_import_export import (
     MIXED_MODULESTORE_BOTH_SETUP, MODULESTORE_SETUPS,
-    XmlModulestoreBuilder, MixedModulestoreBuilder
+    MongoModulestoreBuilder, XmlModulestoreBuilder, MixedModulestoreBuilder
 )
 
 
@@ -635,6 +635,34 @@ class TestMongoAssetMetadataStorage(unittest.TestCase):
             )
             self.assertEquals(len(asset_page), 2)
 
+    def test_move_old_format_course_assets(self):
+        """
+        Old Mongo course asset documents which hold all of a course's assets get moved into documents
+        of their own on the first access
+        """
+        with MongoModulestoreBuilder().build() as (__, store):
+            course = CourseFactory.create(modulestore=store)
+            asset_mds = [
+                self._make_asset_metadata(course.id.make_asset_key(asset_type, filename))
+                for asset_type, filename in self.alls
+            ]
+            old_assets = {}
+            for asset_md in asset_mds:
+                old_assets.setdefault(asset_md.asset_id.asset_type, []).append(asset_md.to_storable())
+            for assets in old_assets.itervalues():
+                assets.sort(key=lambda asset: asset['filename'])
+            store.asset_collection.insert({'course_id': unicode(course.id), 'assets': old_assets})
+
+            self.assertEquals(len(store.get_all_asset_metadata(course.id, None)), len(self.alls))
+            for asset_md in asset_mds:
+                self.assertEquals(store.find_asset_metadata(asset_md.asset_id), asset_md)
+            self.assertEquals(store.asset_collection.find_one({'course_id': unicode(course.id)})['assets'], {})
+
+            # Changing one asset leaves the others alone.
+            self.assertEquals(store.delete_asset_metadata(asset_mds[0].asset_id, ModuleStoreEnum.UserID.test), 1)
+            self.assertEquals(len(store.get_all_asset_metadata(course.id, None)), len(self.alls) - 1)
+            self.assertIsNone(store.find_asset_metadata(asset_mds[0].asset_id))
+
     @ddt.data(XmlModulestoreBuilder(), MixedModulestoreBuilder([('xml', XmlModulestoreBuilder())]))
     def test_xml_not_yet_implemented(self, storebuilder):
         """
@@ -1,7 +1,9 @@
 """
  Test contentstore.mongo functionality
 """
+import json
 import logging
+import tarfile
 from uuid import uuid4
 import unittest
 import mimetypes
@@ -146,6 +148,45 @@ class TestContentstore(unittest.TestCase):
         finally:
             shutil.rmtree(root_dir)
 
+    @ddt.data(True, False)
+    def test_export_for_course_in_threads(self, deprecated):
+        """
+        Test exporting the assets in several threads
+        """
+        self.set_up_assets(deprecated)
+        root_dir = path.path(mkdtemp())
+        self.addCleanup(shutil.rmtree, root_dir)
+        self.contentstore.export_all_for_course(
+            self.course1_key, root_dir, path.path(root_dir / "policy.json"), workers=3
+        )
+        for filename in self.course1_files:
+            with open(DATA_DIR / 'static' / filename, 'rb') as original:
+                self.assertEqual((root_dir / filename).bytes(), original.read())
+        self.assertItemsEqual(json.loads((root_dir / "policy.json").text()).keys(), self.course1_files)
+
+    @ddt.data(True, False)
+    def test_export_for_course_to_tar(self, deprecated):
+        """
+        Test streaming the assets into a tar file
+        """
+        self.set_up_assets(deprecated)
+        root_dir = path.path(mkdtemp())
+        self.addCleanup(shutil.rmtree, root_dir)
+        with tarfile.open(root_dir / 'export.tar.gz', 'w:gz') as tar_file:
+            self.contentstore.export_all_for_course_to_tar(
+                self.course1_key, tar_file, 'course/static', path.path(root_dir / "policy.json")
+            )
+        with tarfile.open(root_dir / 'export.tar.gz') as tar_file:
+            self.assertItemsEqual(
+                tar_file.getnames(), ['course/static/{}'.format(filename) for filename in self.course1_files]
+            )
+            for filename in self.course1_files:
+                with open(DATA_DIR / 'static' / filename, 'rb') as original:
+                    self.assertEqual(
+                        tar_file.extractfile('course/static/{}'.format(filename)).read(), original.read()
+                    )
+        self.assertItemsEqual(json.loads((root_dir / "policy.json").text()).keys(), self.course1_files)
+
     @ddt.data(True, False)
     def test_get_all_content(self, deprecated):
         """
@@ -209,3 +250,100 @@ class TestContentstore(unittest.TestCase):
         # ensure it didn't remove any from other course
         __, count = self.contentstore.get_all_content_for_course(self.course2_key)
         self.assertEqual(count, len(self.course2_files))
+
+    def _body_count(self):
+        """
+        Return how many asset bodies the contentstore holds
+        """
+        return self.contentstore.bodies_files.find().count()
+
+    @ddt.data(True, False)
+    def test_identical_data_stored_once(self, deprecated):
+        """
+        Test that assets with the same data share one body, which outlives all but the last of them
+        """
+        self.set_up_assets(deprecated)
+        # picture1.jpg is in both courses
+        self.assertEqual(self._body_count(), len(set(self.course1_files + self.course2_files)))
+
+        # re-saving an asset keeps its body
+        self.save_asset('picture1.jpg', self.course1_key.make_asset_key('asset', 'picture1.jpg'), 'picture1.jpg', False)
+        self.assertEqual(self._body_count(), len(set(self.course1_files + self.course2_files)))
+
+        self.contentstore.delete(self.course1_key.make_asset_key('asset', 'picture1.jpg'))
+        self.assertIsNotNone(self.contentstore.find(self.course2_key.make_asset_key('asset', 'picture1.jpg')))
+        self.contentstore.delete(self.course2_key.make_asset_key('asset', 'picture1.jpg'))
+        self.assertEqual(self._body_count(), len(set(self.course1_files + self.course2_files)) - 1)
+
+    @ddt.data(True, False)
+    def test_copy_assets_shares_bodies(self, deprecated):
+        """
+        Test that copying a course's assets copies none of their data, and deleting either course keeps the other's
+        """
+        self.set_up_assets(deprecated)
+        bodies = self._body_count()
+        dest_course = CourseLocator('test', 'destination', 'copy')
+        self.contentstore.copy_all_course_assets(self.course1_key, dest_course)
+        self.assertEqual(self._body_count(), bodies)
+
+        self.contentstore.delete_all_course_assets(self.course1_key)
+        for filename in self.course1_files:
+            with open(DATA_DIR / 'static' / filename, 'rb') as original:
+                self.assertEqual(
+                    self.contentstore.find(dest_course.make_asset_key('asset', filename)).data, original.read()
+                )
+
+    def _refcount(self, asset_key):
+        """
+        Return the reference count of the body of the asset
+        """
+        content_id, __ = self.contentstore.asset_db_key(asset_key)
+        body_id = self.contentstore.fs_files.find_one({'_id': content_id})['content_ref']
+        return self.contentstore.bodies_files.find_one({'_id': body_id})['refcount']
+
+    @ddt.data(True, False)
+    def test_body_refcount(self, deprecated):
+        """
+        Test that a body counts the assets referring to it through saves, copies and deletes
+        """
+        self.set_up_assets(deprecated)
+        asset_key = self.course1_key.make_asset_key('asset', 'picture1.jpg')
+        # picture1.jpg is in both courses
+        self.assertEqual(self._refcount(asset_key), 2)
+        self.save_asset('picture1.jpg', asset_key, 'picture1.jpg', False)
+        self.assertEqual(self._refcount(asset_key), 2)
+
+        dest_course = CourseLocator('test', 'destination', 'copy')
+        self.contentstore.copy_all_course_assets(self.course1_key, dest_course)
+        self.assertEqual(self._refcount(asset_key), 3)
+        # copying over existing copies takes no more references
+        self.contentstore.copy_all_course_assets(self.course1_key, dest_course)
+        self.assertEqual(self._refcount(asset_key), 3)
+
+        self.contentstore.delete_all_course_assets(self.course2_key)
+        self.contentstore.delete(asset_key)
+        self.assertEqual(self._refcount(dest_course.make_asset_key('asset', 'picture1.jpg')), 1)
+
+    @ddt.data(True, False)
+    def test_dedupe_all_content(self, deprecated):
+        """
+        Test moving the data of assets which predate shared bodies into shared bodies
+        """
+        self.set_up_assets(deprecated)
+        # store a copy of an existing asset's data the way it was before bodies were shared
+        asset_key = CourseLocator('test', 'legacy', '2014_07').make_asset_key('asset', 'picture1.jpg')
+        content_id, content_son = self.contentstore.asset_db_key(asset_key)
+        with open(DATA_DIR / 'static' / 'picture1.jpg', 'rb') as original:
+            data = original.read()
+        self.contentstore.fs.put(
+            data, _id=content_id, filename=unicode(asset_key), content_type='image/jpeg',
+            displayname='picture1.jpg', content_son=content_son
+        )
+        bodies = self._body_count()
+
+        self.assertEqual(self.contentstore.dedupe_all_content(), (1, 1))
+        self.assertEqual(self._body_count(), bodies)
+        self.assertEqual(self.contentstore.fs_chunks.find({'files_id': content_id}).count(), 0)
+        self.assertEqual(self.contentstore.find(asset_key).data, data)
+        # there's nothing left to dedupe
+        self.assertEqual(self.contentstore.dedupe_all_content(), (0, 0))
@@ -920,6 +920,28 @@ class TestMixedModuleStore(CommonMixedModuleStoreSetup):
         course = self.store.get_item(self.course_locations[self.XML_COURSEID1])
         self.assertEqual(course.id, self.course_locations[self.XML_COURSEID1].course_key)
 
+    @ddt.data('draft', 'split')
+    def test_get_course_keys(self, default_ms):
+        self.initdb(default_ms)
+        self.assertEqual(
+            set(self.store.get_course_keys()),
+            set(course.id for course in self.store.get_courses())
+        )
+
+    @ddt.data('draft', 'split')
+    def test_get_courses_by_ids(self, default_ms):
+        self.initdb(default_ms)
+        course_keys = [
+            self.course_locations[self.MONGO_COURSEID].course_key,
+            self.course_locations[self.XML_COURSEID1].course_key,
+            self.store.make_course_key('NoSuchOrg', 'NoSuchCourse', 'NoSuchRun'),
+        ]
+        courses = self.store.get_courses_by_ids(course_keys)
+        self.assertEqual(set(courses), set(course_keys[:2]))
+        for course_key, course in courses.iteritems():
+            self.assertEqual(course.id, course_key)
+            self.assertEqual(course.location, self.store.get_course(course_key).location)
+
     @ddt.data('draft', 'split')
     def test_get_library(self, default_ms):
         """
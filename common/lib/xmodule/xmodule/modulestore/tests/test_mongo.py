@@ -12,6 +12,7 @@ from path import path
 import pymongo
 import logging
 import shutil
+import time
 from tempfile import mkdtemp
 from uuid import uuid4
 from datetime import datetime
@@ -800,6 +801,169 @@ class TestMongoModuleStoreWithNoAssetCollection(TestMongoModuleStore):
         self.assertRaises(ItemNotFoundError, lambda: self.draft_store.get_all_asset_metadata(course_key, 'asset')[:1])
 
 
+class ExpiringMemoryCache(object):
+    """
+    An in memory stand-in for a django cache w/ a timeout (which it doesn't enforce)
+    """
+    default_timeout = 300
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key, default=None):  # pylint: disable=missing-docstring
+        return self.data.get(key, default)
+
+    def set(self, key, value, timeout=None):  # pylint: disable=missing-docstring, unused-argument
+        self.data[key] = value
+
+    def add(self, key, value, timeout=None):  # pylint: disable=missing-docstring
+        if key in self.data:
+            return False
+        self.set(key, value, timeout)
+        return True
+
+    def delete(self, key):  # pylint: disable=missing-docstring
+        self.data.pop(key, None)
+
+
+class TestMetadataInheritanceCache(TestMongoModuleStoreBase):
+    """
+    Tests for caching the metadata inheritance trees
+    """
+    courses = ['toy']
+
+    def setUp(self):
+        super(TestMetadataInheritanceCache, self).setUp()
+        self.course_key = SlashSeparatedCourseKey('edX', 'toy', '2012_Fall')
+        self.cache = ExpiringMemoryCache()
+        patcher = patch.object(self.draft_store, 'metadata_inheritance_cache_subsystem', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tree = self.draft_store._compute_metadata_inheritance_tree(self.course_key)  # pylint: disable=protected-access
+        self.compute = patch.object(
+            self.draft_store, '_compute_metadata_inheritance_tree',
+            wraps=self.draft_store._compute_metadata_inheritance_tree  # pylint: disable=protected-access
+        ).start()
+        self.addCleanup(patch.stopall)
+
+    def _cache_tree(self, expires):
+        """
+        Cache self.tree as expiring at the given time
+        """
+        self.cache.set(unicode(self.course_key), (expires, self.tree))
+
+    def _get_tree(self):
+        """
+        Get the course's tree through the caches
+        """
+        return self.draft_store._get_cached_metadata_inheritance_tree(self.course_key)  # pylint: disable=protected-access
+
+    def test_fresh(self):
+        self._cache_tree(time.time() + 60)
+        self.assertEqual(self._get_tree(), self.tree)
+        self.assertFalse(self.compute.called)
+
+    def test_stale_while_recomputing(self):
+        # another process is recomputing the tree; so, this one serves the old tree
+        self._cache_tree(time.time() - 60)
+        self.cache.add(u'{}.lock'.format(self.course_key), True)
+        self.assertEqual(self._get_tree(), self.tree)
+        self.assertFalse(self.compute.called)
+
+    def test_stale_recompute(self):
+        self._cache_tree(time.time() - 60)
+        self.assertEqual(self._get_tree(), self.tree)
+        self.assertEqual(self.compute.call_count, 1)
+        expires, __ = self.cache.get(unicode(self.course_key))
+        self.assertGreater(expires, time.time())
+        self.assertNotIn(u'{}.lock'.format(self.course_key), self.cache.data)
+
+    def test_update_subtree(self):
+        self._cache_tree(time.time() + 60)
+        # an xblock w/o children doesn't change anything
+        html = self.draft_store.get_item(self.course_key.make_usage_key('html', 'toyhtml'))
+        self.draft_store.refresh_cached_metadata_inheritance_tree(self.course_key, xblock=html)
+        self.assertEqual(self._get_tree(), self.tree)
+
+        # the subtree of an xblock w/ children is recomputed w/ the same results as the whole tree
+        chapter = self.draft_store.get_item(self.course_key.make_usage_key('chapter', 'Overview'))
+        self.draft_store.refresh_cached_metadata_inheritance_tree(self.course_key, xblock=chapter)
+        self.assertEqual(self._get_tree(), self.tree)
+        self.assertFalse(self.compute.called)
+
+        # but a change of children recomputes the whole tree
+        chapter.children = chapter.children[1:]
+        self.draft_store.refresh_cached_metadata_inheritance_tree(self.course_key, xblock=chapter)
+        self.assertEqual(self.compute.call_count, 1)
+
+        # as does a change to the course
+        course = self.draft_store.get_course(self.course_key)
+        self.draft_store.refresh_cached_metadata_inheritance_tree(self.course_key, xblock=course)
+        self.assertEqual(self.compute.call_count, 2)
+
+
+class TestSingleQuerySubtrees(TestMongoModuleStoreBase):
+    """
+    Tests for loading whole courses in one query
+    """
+    courses = ['toy']
+
+    def setUp(self):
+        super(TestSingleQuerySubtrees, self).setUp()
+        self.course_key = SlashSeparatedCourseKey('edX', 'toy', '2012_Fall')
+        self.course_record = self.draft_store._find_one(  # pylint: disable=protected-access
+            self.course_key.make_usage_key('course', '2012_Fall')
+        )
+        self.find = patch.object(
+            self.draft_store.collection, 'find', wraps=self.draft_store.collection.find
+        ).start()
+        self.addCleanup(patch.stopall)
+
+    def _cache_children(self):
+        """
+        Return the records of the course's descendants, keyed by location
+        """
+        self.find.reset_mock()
+        return self.draft_store._cache_children(  # pylint: disable=protected-access
+            self.course_key, [self.course_record], depth=None
+        )
+
+    def _course_finds(self):
+        """
+        Return how many times the whole course was queried since the last _cache_children
+        """
+        return len([
+            call for call in self.find.call_args_list
+            if call[1].get('fields') == self.draft_store.ITEM_FIELDS
+        ])
+
+    def test_single_query(self):
+        per_level = self._cache_children()
+        per_level_finds = self.find.call_count
+        with patch.object(self.draft_store, 'single_query_subtrees', True):
+            self.assertEqual(self._cache_children(), per_level)
+        self.assertEqual(self.find.call_count, 1)
+        self.assertEqual(self._course_finds(), 1)
+        self.assertLess(self.find.call_count, per_level_finds)
+
+    def test_cached_course_items(self):
+        with patch.multiple(self.draft_store, single_query_subtrees=True, course_items_cache_size=1):
+            expected = self._cache_children()
+            # only the version check queries the collection once the items are cached
+            self.assertEqual(self._cache_children(), expected)
+            self.assertEqual(self._course_finds(), 0)
+
+            html = self.draft_store.get_item(self.course_key.make_usage_key('html', 'toyhtml'))
+            html.display_name = 'Changed'
+            self.draft_store.update_item(html, self.dummy_user)
+            self.course_record = self.draft_store._find_one(  # pylint: disable=protected-access
+                self.course_key.make_usage_key('course', '2012_Fall')
+            )
+            changed = self._cache_children()
+            self.assertEqual(self._course_finds(), 1)
+            self.assertNotEqual(changed, expected)
+
+
 class TestMongoKeyValueStore(unittest.TestCase):
     """
     Tests for MongoKeyValueStore.
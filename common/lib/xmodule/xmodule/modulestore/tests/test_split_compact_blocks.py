@@ -0,0 +1,172 @@
+"""
+Tests for the array-backed CompactBlockMap used for split structures.
+"""
+import copy
+import cPickle as pickle
+import unittest
+
+from bson.objectid import ObjectId
+
+from xmodule.modulestore import BlockData
+from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo.compact_blocks import CompactBlockMap
+from xmodule.modulestore.split_mongo.mongo_connection import structure_from_mongo, structure_to_mongo
+from xmodule.modulestore.split_mongo.split import SplitMongoModuleStore
+
+
+def make_mongo_structure():
+    """
+    Return a small structure as it's stored in mongo
+    """
+    version = ObjectId()
+
+    def block(block_type, block_id, children=None, **fields):
+        """
+        Return a mongo block document
+        """
+        if children is not None:
+            fields['children'] = [list(child) for child in children]
+        return {
+            'block_type': block_type,
+            'block_id': block_id,
+            'definition': ObjectId(),
+            'fields': fields,
+            'edit_info': {'update_version': version, 'edited_by': 1},
+        }
+
+    return {
+        '_id': version,
+        'root': ['course', 'course'],
+        'blocks': [
+            block('course', 'course', [('chapter', 'ch1'), ('chapter', 'ch2')], display_name='Course'),
+            block('chapter', 'ch1', [('problem', 'p1'), ('problem', 'p2')]),
+            block('chapter', 'ch2', []),
+            block('problem', 'p1', graded=True),
+            block('problem', 'p2'),
+        ],
+    }
+
+
+def storable_blocks(structure):
+    """
+    Return the mongo blocks of ``structure`` keyed by (block_type, block_id)
+    """
+    return {
+        (block['block_type'], block['block_id']): block
+        for block in structure_to_mongo(structure)['blocks']
+    }
+
+
+class TestCompactBlockMap(unittest.TestCase):
+    """
+    Tests for CompactBlockMap
+    """
+    def setUp(self):
+        super(TestCompactBlockMap, self).setUp()
+        self.structure = structure_from_mongo(make_mongo_structure(), compact=True)
+        self.blocks = self.structure['blocks']
+
+    def test_mapping_interface(self):
+        self.assertIsInstance(self.blocks, CompactBlockMap)
+        self.assertEqual(len(self.blocks), 5)
+        self.assertIn(BlockKey('problem', 'p1'), self.blocks)
+        self.assertNotIn(BlockKey('problem', 'nope'), self.blocks)
+        self.assertEqual(
+            set(self.blocks),
+            {
+                BlockKey('course', 'course'), BlockKey('chapter', 'ch1'), BlockKey('chapter', 'ch2'),
+                BlockKey('problem', 'p1'), BlockKey('problem', 'p2'),
+            }
+        )
+        self.assertIsNone(self.blocks.get(BlockKey('problem', 'nope')))
+
+    def test_lazy_block_data(self):
+        self.assertEqual(self.blocks.materialized_values(), [])
+        self.assertEqual(
+            self.blocks.children(BlockKey('chapter', 'ch1')),
+            [BlockKey('problem', 'p1'), BlockKey('problem', 'p2')]
+        )
+        self.assertEqual(self.blocks.materialized_values(), [])
+
+        chapter = self.blocks[BlockKey('chapter', 'ch1')]
+        self.assertIsInstance(chapter, BlockData)
+        self.assertEqual(chapter.fields['children'], [BlockKey('problem', 'p1'), BlockKey('problem', 'p2')])
+        self.assertIsInstance(chapter.fields['children'][0], BlockKey)
+        # the same object is returned on each access so edits stick
+        self.assertIs(self.blocks[BlockKey('chapter', 'ch1')], chapter)
+        self.assertEqual(self.blocks.materialized_values(), [chapter])
+
+    def test_raw_fields(self):
+        self.assertEqual(self.blocks.raw_fields(BlockKey('problem', 'p1')), {'graded': True})
+        self.assertEqual(self.blocks.raw_fields(BlockKey('chapter', 'ch1')), {})
+        with self.assertRaises(KeyError):
+            self.blocks.raw_fields(BlockKey('problem', 'nope'))
+        self.assertEqual(self.blocks.materialized_values(), [])
+
+        # once built, the BlockData is the authoritative copy
+        self.blocks[BlockKey('problem', 'p1')].fields['graded'] = False
+        self.assertEqual(self.blocks.raw_fields(BlockKey('problem', 'p1')), {'graded': False})
+
+    def test_indexes_built_lazily(self):
+        """
+        Test that building split's structure indexes doesn't build the blocks' BlockData
+        """
+        # pylint: disable=protected-access
+        build_parent_map = SplitMongoModuleStore._build_parent_map
+        build_inherited_settings = SplitMongoModuleStore._build_inherited_settings
+        build_block_index = SplitMongoModuleStore._build_block_index
+        block_order = list(self.blocks)
+        inherited_settings = build_inherited_settings(self.blocks, build_parent_map(self.blocks))
+        graded_index = build_block_index(self.blocks, block_order, 'graded')
+        self.assertEqual(self.blocks.materialized_values(), [])
+
+        dict_blocks = structure_from_mongo(make_mongo_structure())['blocks']
+        self.assertEqual(inherited_settings, build_inherited_settings(dict_blocks, build_parent_map(dict_blocks)))
+        self.assertEqual(graded_index, build_block_index(dict_blocks, block_order, 'graded'))
+
+    def test_edits(self):
+        chapter = self.blocks[BlockKey('chapter', 'ch2')]
+        chapter.fields['children'].append(BlockKey('html', 'new'))
+        self.blocks[BlockKey('html', 'new')] = BlockData(block_type='html', fields={'data': 'x'})
+        del self.blocks[BlockKey('problem', 'p2')]
+
+        self.assertEqual(len(self.blocks), 5)
+        self.assertNotIn(BlockKey('problem', 'p2'), self.blocks)
+        with self.assertRaises(KeyError):
+            self.blocks[BlockKey('problem', 'p2')]  # pylint: disable=pointless-statement
+        self.assertEqual(self.blocks.children(BlockKey('chapter', 'ch2')), [BlockKey('html', 'new')])
+
+        stored = storable_blocks(self.structure)
+        self.assertNotIn(('problem', 'p2'), stored)
+        self.assertEqual(stored[('chapter', 'ch2')]['fields']['children'], [BlockKey('html', 'new')])
+        self.assertEqual(stored[('html', 'new')]['fields'], {'data': 'x'})
+
+    def test_round_trip_matches_dict(self):
+        dict_structure = structure_from_mongo(make_mongo_structure())
+        expected = storable_blocks(dict_structure)
+        actual = storable_blocks(self.structure)
+        self.assertEqual(set(expected), set(actual))
+        for block_key, block in expected.iteritems():
+            actual_block = actual[block_key]
+            self.assertEqual(
+                [list(child) for child in block['fields'].pop('children', [])],
+                [list(child) for child in actual_block['fields'].pop('children', [])],
+            )
+            self.assertEqual(block['fields'], actual_block['fields'])
+            self.assertEqual(block['block_type'], actual_block['block_type'])
+
+    def test_dangling_child(self):
+        mongo_structure = make_mongo_structure()
+        mongo_structure['blocks'][2]['fields']['children'] = [['vertical', 'missing']]
+        blocks = structure_from_mongo(mongo_structure, compact=True)['blocks']
+        self.assertEqual(len(blocks), 5)
+        self.assertNotIn(BlockKey('vertical', 'missing'), blocks)
+        self.assertEqual(blocks[BlockKey('chapter', 'ch2')].fields['children'], [BlockKey('vertical', 'missing')])
+
+    def test_copy_and_pickle(self):
+        self.blocks[BlockKey('chapter', 'ch1')].fields['display_name'] = 'Edited'
+        for other in (copy.deepcopy(self.blocks), pickle.loads(pickle.dumps(self.blocks, pickle.HIGHEST_PROTOCOL))):
+            self.assertEqual(set(other), set(self.blocks))
+            self.assertEqual(other[BlockKey('chapter', 'ch1')].fields['display_name'], 'Edited')
+            other[BlockKey('chapter', 'ch2')].fields['display_name'] = 'Copy only'
+            self.assertNotIn('display_name', self.blocks[BlockKey('chapter', 'ch2')].fields)
@@ -1,7 +1,7 @@
 """
     Test split modulestore w/o using any django stuff.
 """
-from mock import patch
+from mock import Mock, patch
 import datetime
 from importlib import import_module
 from path import path
@@ -14,9 +14,9 @@ from contracts import contract
 from nose.plugins.attrib import attr
 
 from openedx.core.lib import tempdir
-from xblock.fields import Reference, ReferenceList, ReferenceValueDict
+from xblock.fields import Reference, ReferenceList, ReferenceValueDict, Scope
 from xmodule.course_module import CourseDescriptor
-from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore import BlockData, ModuleStoreEnum
 from xmodule.modulestore.exceptions import (
     ItemNotFoundError, VersionConflictError,
     DuplicateItemError, DuplicateCourseError,
@@ -27,10 +27,12 @@ from xmodule.modulestore.inheritance import InheritanceMixin
 from xmodule.x_module import XModuleMixin
 from xmodule.fields import Date, Timedelta
 from xmodule.modulestore.split_mongo.split import SplitMongoModuleStore
+from xmodule.modulestore.split_mongo.mongo_connection import CourseStructureCache
 from xmodule.modulestore.tests.test_modulestore import check_has_course_method
 from xmodule.modulestore.split_mongo import BlockKey
 from xmodule.modulestore.tests.mongo_connection import MONGO_PORT_NUM, MONGO_HOST
 from xmodule.modulestore.tests.utils import mock_tab_from_json
+from xmodule.modulestore.tests.factories import check_mongo_calls
 from xmodule.modulestore.edit_info import EditInfoMixin
 
 
@@ -979,6 +981,41 @@ class SplitModuleItemTests(SplitModuleTest):
         matches = modulestore().get_items(locator, settings={'group_access': {'$exists': False}})
         self.assertEqual(len(matches), 6)
 
+    def test_get_items_indexed(self):
+        """
+        Test that get_items looks up indexable criteria in indexes built once per structure version
+        """
+        locator = CourseLocator(org='testx', course='GreekHero', run="run", branch=BRANCH_NAME_DRAFT)
+        get_block_index = SplitMongoModuleStore._get_block_index  # pylint: disable=protected-access
+        with patch.object(modulestore(), 'request_cache', Mock(data={})):
+            with patch.object(
+                SplitMongoModuleStore, '_get_block_index', autospec=True, side_effect=get_block_index
+            ) as mock_index:
+                unindexed = [item.location for item in modulestore().get_items(locator)]
+                self.assertEqual(mock_index.call_count, 0)
+
+                chapters = modulestore().get_items(locator, qualifiers={'category': 'chapter'})
+                self.assertEqual(
+                    [item.location for item in chapters],
+                    [location for location in unindexed if location.block_type == 'chapter']
+                )
+                matches = modulestore().get_items(locator, qualifiers={'category': {'$in': ['chapter', 'course']}})
+                self.assertEqual(len(matches), 4)
+                matches = modulestore().get_items(locator, qualifiers={'name': 'chapter1'})
+                self.assertEqual([item.location.block_id for item in matches], ['chapter1'])
+                matches = modulestore().get_items(
+                    locator,
+                    qualifiers={'category': 'chapter'},
+                    settings={'display_name': re.compile(r'Hera')},
+                )
+                self.assertEqual(len(matches), 2)
+                self.assertGreater(mock_index.call_count, 0)
+
+            # each index is only built once for the version
+            indexes = modulestore().request_cache.data['structure_indexes']
+            self.assertEqual(len(indexes), 1)
+            self.assertItemsEqual(indexes.values()[0].keys(), ['order', 'block_type', 'name'])
+
     def test_get_parents(self):
         '''
         get_parent_location(locator): BlockUsageLocator
@@ -1000,6 +1037,34 @@ class SplitModuleItemTests(SplitModuleTest):
         parent = modulestore().get_parent_location(locator)
         self.assertIsNone(parent)
 
+    def test_parent_map_per_version(self):
+        """
+        Test that the index of parents is only built once per structure version
+        """
+        locator = BlockUsageLocator(
+            CourseLocator(org='testx', course='GreekHero', run="run", branch=BRANCH_NAME_DRAFT),
+            'chapter', block_id='chapter1'
+        )
+        build_parent_map = SplitMongoModuleStore._build_parent_map  # pylint: disable=protected-access
+        with patch.object(modulestore(), 'request_cache', Mock(data={})):
+            with patch.object(SplitMongoModuleStore, '_build_parent_map', wraps=build_parent_map) as mock_build:
+                self.assertEqual(modulestore().get_parent_location(locator).block_id, 'head12345')
+                self.assertEqual(
+                    modulestore().get_parent_location(locator.course_key.make_usage_key('chapter', 'chapter2')).block_id,
+                    'head12345'
+                )
+                modulestore().get_orphans(locator.course_key)
+                self.assertEqual(mock_build.call_count, 1)
+
+                # a new version gets its own index
+                new_module = modulestore().create_child(
+                    self.user_id, locator, 'sequential', fields={'display_name': 'new sequential'}
+                )
+                self.assertEqual(
+                    modulestore().get_parent_location(new_module.location.version_agnostic()).block_id, 'chapter1'
+                )
+                self.assertEqual(mock_build.call_count, 2)
+
     @patch('xmodule.tabs.CourseTab.from_json', side_effect=mock_tab_from_json)
     def test_get_children(self, _from_json):
         """
@@ -1019,6 +1084,26 @@ class SplitModuleItemTests(SplitModuleTest):
             expected_ids.remove(child.location.block_id)
         self.assertEqual(len(expected_ids), 0)
 
+    @patch('xmodule.tabs.CourseTab.from_json', side_effect=mock_tab_from_json)
+    def test_prefetch_definitions(self, _from_json):
+        """
+        Test that prefetching loads every definition in one go so reading content fields doesn't hit the db
+        """
+        locator = CourseLocator(org='testx', course='GreekHero', run="run", branch=BRANCH_NAME_DRAFT)
+        course = modulestore().get_course(locator, depth=None, prefetch_depth=None)
+        runtime = course.runtime
+        blocks = runtime.course_entry.structure['blocks']
+        self.assertEqual(
+            set(runtime.definitions),
+            set(block.definition for block in blocks.itervalues())
+        )
+        with check_mongo_calls(0):
+            for block_key in blocks:
+                block = runtime.load_item(block_key, runtime.course_entry)
+                for field in block.fields.itervalues():
+                    if field.scope == Scope.content:
+                        getattr(block, field.name)
+
 
 def version_agnostic(children):
     """
@@ -1114,6 +1199,36 @@ class TestItemCrud(SplitModuleTest):
         self.assertIn(new_module.location.version_agnostic(), version_agnostic(parent.children))
         self.assertEqual(new_module.definition_locator.definition_id, original.definition_locator.definition_id)
 
+    def test_create_items(self):
+        """
+        Test create_items makes all the blocks in one new version of the structure
+        """
+        locator = CourseLocator(org='testx', course='GreekHero', run="run", branch=BRANCH_NAME_DRAFT)
+        premod_course = modulestore().get_course(locator)
+        new_locators = modulestore().create_items('user123', locator, [
+            ('chapter', 'many_chapter', {
+                'display_name': 'many chapter',
+                'children': [BlockUsageLocator(locator, 'html', 'many_html')],
+            }),
+            ('html', 'many_html', {'display_name': 'many html', 'data': '<p>many</p>'}),
+            ('problem', None, {}),
+        ])
+        self.assertEqual([loc.block_type for loc in new_locators], ['chapter', 'html', 'problem'])
+        self.assertIsNotNone(new_locators[2].block_id)
+
+        current_course = modulestore().get_course(locator)
+        history_info = modulestore().get_course_history_info(current_course.location.course_key)
+        self.assertEqual(history_info['previous_version'], premod_course.location.version_guid)
+
+        chapter = modulestore().get_item(new_locators[0])
+        self.assertEqual(chapter.display_name, 'many chapter')
+        html = chapter.get_children()[0]
+        self.assertEqual(html.location.block_id, 'many_html')
+        self.assertEqual(html.data, '<p>many</p>')
+
+        with self.assertRaises(DuplicateItemError):
+            modulestore().create_items('user123', locator, [('chapter', 'many_chapter', {})])
+
     def test_unique_naming(self):
         """
         Check that 2 modules of same type get unique block_ids. Also check that if creation provides
@@ -1742,6 +1857,73 @@ class TestInheritance(SplitModuleTest):
         # overridden
         self.assertEqual(node.graceperiod, datetime.timedelta(hours=4))
 
+    @patch('xmodule.tabs.CourseTab.from_json', side_effect=mock_tab_from_json)
+    def test_inherited_settings_per_version(self, _from_json):
+        """
+        Test that the table of inherited settings is computed once per structure version and shared
+        by later requests
+        """
+        course_key = CourseLocator(org='testx', course='GreekHero', run="run", branch=BRANCH_NAME_DRAFT)
+        build_inherited_settings = SplitMongoModuleStore._build_inherited_settings  # pylint: disable=protected-access
+        request_cache = Mock(data={})
+        with patch.object(modulestore(), 'request_cache', request_cache), patch.object(
+            SplitMongoModuleStore, '_build_inherited_settings', wraps=build_inherited_settings
+        ) as mock_build:
+            node = modulestore().get_item(BlockUsageLocator(course_key, 'problem', 'problem3_2'))
+            self.assertEqual(node.graceperiod, datetime.timedelta(hours=2))
+            self.assertEqual(mock_build.call_count, 1)
+
+            # a new request for the same version reuses the table
+            request_cache.data = {}
+            node = modulestore().get_item(BlockUsageLocator(course_key, 'problem', 'problem1'))
+            self.assertEqual(node.graceperiod, datetime.timedelta(hours=4))
+            self.assertEqual(mock_build.call_count, 1)
+
+            # a new version gets its own table
+            chapter = modulestore().get_item(BlockUsageLocator(course_key, 'chapter', 'chapter3'))
+            chapter.graceperiod = datetime.timedelta(hours=3)
+            modulestore().update_item(chapter, self.user_id)
+            node = modulestore().get_item(BlockUsageLocator(course_key, 'problem', 'problem3_2'))
+            self.assertEqual(node.graceperiod, datetime.timedelta(hours=3))
+            self.assertEqual(mock_build.call_count, 2)
+
+    def test_build_inherited_settings(self):
+        """
+        Test computing the settings each block inherits
+        """
+        def block(**fields):
+            """
+            Return a BlockData w/ just the given fields
+            """
+            return BlockData(block_type='html', fields=fields)
+
+        blocks = {
+            BlockKey('course', 'course'): block(graded=False, display_name='Course'),
+            BlockKey('chapter', 'chapter'): block(display_name='Chapter'),
+            BlockKey('sequential', 'sequential'): block(graded=True, due='2015-01-01T00:00:00Z'),
+            BlockKey('html', 'html'): block(due='2016-01-01T00:00:00Z'),
+            BlockKey('html', 'orphan'): block(),
+        }
+        parent_map = {
+            BlockKey('chapter', 'chapter'): [BlockKey('course', 'course')],
+            BlockKey('sequential', 'sequential'): [BlockKey('chapter', 'chapter')],
+            BlockKey('html', 'html'): [BlockKey('sequential', 'sequential')],
+        }
+        inherited_settings = SplitMongoModuleStore._build_inherited_settings(  # pylint: disable=protected-access
+            blocks, parent_map
+        )
+        self.assertEqual(inherited_settings[BlockKey('course', 'course')], {})
+        self.assertEqual(inherited_settings[BlockKey('chapter', 'chapter')], {'graded': False})
+        self.assertEqual(inherited_settings[BlockKey('sequential', 'sequential')], {'graded': False})
+        self.assertEqual(
+            inherited_settings[BlockKey('html', 'html')], {'graded': True, 'due': '2015-01-01T00:00:00Z'}
+        )
+        self.assertEqual(inherited_settings[BlockKey('html', 'orphan')], {})
+        # blocks which don't set any inheritable settings share their parent's
+        self.assertIs(
+            inherited_settings[BlockKey('sequential', 'sequential')], inherited_settings[BlockKey('chapter', 'chapter')]
+        )
+
     def test_inheritance_not_saved(self):
         """
         Was saving inherited settings with updated blocks causing inheritance to be sticky
@@ -1852,6 +2034,38 @@ class TestPublish(SplitModuleTest):
         pub_module = modulestore().get_item(new_module.location.map_into_course(dest_course))
         self._check_course(source_course, dest_course, expected, unexpected)
 
+    @patch('xmodule.tabs.CourseTab.from_json', side_effect=mock_tab_from_json)
+    def test_publish_copies_only_changes(self, _from_json):
+        """
+        Test that republishing only copies the blocks which changed since they were last published
+        """
+        source_course = CourseLocator(org='testx', course='GreekHero', run="run", branch=BRANCH_NAME_DRAFT)
+        dest_course = CourseLocator(org='testx', course='GreekHero', run="run", branch=BRANCH_NAME_PUBLISHED)
+        head = source_course.make_usage_key('course', "head12345")
+        chapter1 = source_course.make_usage_key('chapter', 'chapter1')
+        chapter2 = source_course.make_usage_key('chapter', 'chapter2')
+        chapter3 = source_course.make_usage_key('chapter', 'chapter3')
+        copied = modulestore().copy(self.user_id, source_course, dest_course, [head], [chapter2, chapter3])
+        self.assertEqual(copied, 2)
+        # nothing changed
+        self.assertEqual(modulestore().copy(self.user_id, source_course, dest_course, [head], [chapter2, chapter3]), 0)
+        chapter1_version = modulestore().get_item(chapter1.map_into_course(dest_course)).update_version
+
+        # change the course's settings but not chapter1
+        course = modulestore().get_item(head)
+        course.display_name = 'Changed'
+        modulestore().update_item(course, self.user_id)
+        self.assertEqual(modulestore().copy(self.user_id, source_course, dest_course, [head], [chapter2, chapter3]), 1)
+        self.assertEqual(modulestore().get_item(head.map_into_course(dest_course)).display_name, 'Changed')
+        self.assertEqual(
+            modulestore().get_item(chapter1.map_into_course(dest_course)).update_version, chapter1_version
+        )
+        self._check_course(
+            source_course, dest_course,
+            [BlockKey.from_usage_key(head), BlockKey.from_usage_key(chapter1)],
+            [BlockKey.from_usage_key(chapter2), BlockKey.from_usage_key(chapter3)]
+        )
+
     def test_exceptions(self):
         """
         Test the exceptions which preclude successful publication
@@ -1996,6 +2210,111 @@ class TestSchema(SplitModuleTest):
             )
 
 
+class DictCache(object):
+    """
+    A minimal stand-in for a shared (e.g. memcached) django cache.
+    """
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, timeout):  # pylint: disable=unused-argument
+        self.data[key] = value
+
+
+class TestCourseStructureCache(SplitModuleTest):
+    """
+    Test the cross-request course structure cache
+    """
+    def setUp(self):
+        super(TestCourseStructureCache, self).setUp()
+        self.shared_cache = DictCache()
+        self.new_course = modulestore().create_course(
+            'org', 'course', 'test_run', self.user_id, BRANCH_NAME_DRAFT,
+        )
+        self.version_guid = self.new_course.location.as_object_id(self.new_course.location.version_guid)
+
+    def _use_cache(self, local_size):
+        """
+        Make the modulestore use a fresh cache with the given in-process size and the test's shared tier.
+        """
+        modulestore().db_connection.structure_cache = CourseStructureCache(
+            local_size=local_size, shared_cache=self.shared_cache
+        )
+
+    def assertStructuresEqual(self, structure, other):  # pylint: disable=invalid-name
+        """
+        BlockData doesn't define equality, so compare the storable forms of the structures.
+        """
+        def storable(structure):
+            """
+            Return a comparable form of the structure
+            """
+            result = dict(structure)
+            result['blocks'] = {
+                block_key: block.to_storable() for block_key, block in structure['blocks'].iteritems()
+            }
+            return result
+        self.assertEqual(storable(structure), storable(other))
+
+    def test_local_cache(self):
+        self._use_cache(local_size=2)
+        with check_mongo_calls(1):
+            not_cached_structure = modulestore().db_connection.get_structure(self.version_guid)
+        with check_mongo_calls(0):
+            cached_structure = modulestore().db_connection.get_structure(self.version_guid)
+        self.assertStructuresEqual(cached_structure, not_cached_structure)
+        # each hit is a separate copy so callers can't corrupt the cache
+        self.assertIsNot(cached_structure, not_cached_structure)
+        cached_structure['blocks'].clear()
+        self.assertStructuresEqual(
+            modulestore().db_connection.get_structure(self.version_guid), not_cached_structure
+        )
+
+    def test_shared_cache(self):
+        self._use_cache(local_size=0)
+        with check_mongo_calls(1):
+            not_cached_structure = modulestore().db_connection.get_structure(self.version_guid)
+        # simulate another process with its own (empty) in-process tier
+        self._use_cache(local_size=2)
+        with check_mongo_calls(0):
+            cached_structure = modulestore().db_connection.get_structure(self.version_guid)
+        self.assertStructuresEqual(cached_structure, not_cached_structure)
+
+    def test_find_structures_by_id(self):
+        self._use_cache(local_size=2)
+        modulestore().db_connection.get_structure(self.version_guid)
+        with check_mongo_calls(0):
+            structures = modulestore().db_connection.find_structures_by_id([self.version_guid])
+        self.assertEqual([structure['_id'] for structure in structures], [self.version_guid])
+
+    def test_lru_eviction(self):
+        cache = CourseStructureCache(local_size=2, shared_cache=None)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, {'_id': key})
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), {'_id': 'b'})
+        cache.set('d', {'_id': 'd'})
+        # 'b' was used more recently than 'c'
+        self.assertIsNone(cache.get('c'))
+        self.assertEqual(cache.get('b'), {'_id': 'b'})
+
+    def test_shared_cache_timeout(self):
+        shared_cache = Mock()
+        cache = CourseStructureCache(local_size=0, shared_cache=shared_cache, timeout=3600)
+        cache.set('a', {'_id': 'a'})
+        # django would take None to mean the cache's default timeout
+        self.assertEqual(shared_cache.set.call_args[0][2], 3600)
+
+    def test_disabled(self):
+        cache = CourseStructureCache(local_size=0, shared_cache=None)
+        self.assertFalse(cache.enabled)
+        cache.set('a', {'_id': 'a'})
+        self.assertIsNone(cache.get('a'))
+
+
 # ===========================================
 def modulestore():
     """
@@ -686,6 +686,24 @@ class TestBulkWriteMixinOpen(TestBulkWriteMixin):
             self.structure['_id']
         )
 
+    def test_version_structure_share_blocks(self):
+        # Sharing the blocks w/ the original structure should last only until the structure
+        # is versioned again for editing in place
+        block = {'fields': {'display_name': 'shared'}}
+        structure = dict(self.structure, blocks={'block': block})
+        self.bulk.insert_course_index(self.course_key, {'versions': {}})
+        shared = self.bulk.version_structure(self.course_key, structure, 'user_id', share_blocks=True)
+        self.assertIsNot(shared['blocks'], structure['blocks'])
+        self.assertIs(shared['blocks']['block'], block)
+        self.assertIs(
+            self.bulk.version_structure(self.course_key, shared, 'user_id', share_blocks=True)['blocks']['block'],
+            block
+        )
+        edited = self.bulk.version_structure(self.course_key, shared, 'user_id')
+        self.assertIs(edited, shared)
+        self.assertIsNot(edited['blocks']['block'], block)
+        self.assertEqual(edited['blocks']['block'], block)
+
     def test_copy_branch_versions(self):
         # Directly updating an index so that the draft branch points to the published index
         # version should work, and should only persist a single structure
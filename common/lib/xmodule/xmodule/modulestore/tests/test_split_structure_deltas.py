@@ -0,0 +1,187 @@
+"""
+Tests for storing split structures as deltas against their previous versions.
+"""
+import copy
+import unittest
+import uuid
+
+from bson.objectid import ObjectId
+
+from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo.mongo_connection import (
+    MongoConnection, apply_structure_delta, structure_delta, structure_to_mongo
+)
+from xmodule.modulestore.tests.mongo_connection import MONGO_PORT_NUM, MONGO_HOST
+
+
+def make_block(block_type, block_id, version, children=None, **fields):
+    """
+    Return a block as it's stored in mongo
+    """
+    if children is not None:
+        fields['children'] = [list(child) for child in children]
+    return {
+        'block_type': block_type,
+        'block_id': block_id,
+        'definition': ObjectId(),
+        'defaults': {},
+        'fields': fields,
+        'edit_info': {'update_version': version, 'previous_version': None, 'edited_by': 1},
+    }
+
+
+def make_structure(num_problems=6):
+    """
+    Return the first version of a structure as it's stored in mongo
+    """
+    version = ObjectId()
+    problems = [('problem', 'p{}'.format(index)) for index in range(num_problems)]
+    return {
+        '_id': version,
+        'root': ['course', 'course'],
+        'previous_version': None,
+        'original_version': version,
+        'blocks': [
+            make_block('course', 'course', version, [('chapter', 'ch1')]),
+            make_block('chapter', 'ch1', version, problems),
+        ] + [make_block(block_type, block_id, version) for block_type, block_id in problems],
+    }
+
+
+def next_version(structure):
+    """
+    Return a copy of the mongo structure as its next version
+    """
+    new_structure = copy.deepcopy(structure)
+    new_structure['_id'] = ObjectId()
+    new_structure['previous_version'] = structure['_id']
+    return new_structure
+
+
+def blocks_by_key(structure):
+    """
+    Return the blocks of the mongo structure keyed by (block_type, block_id)
+    """
+    return {(block['block_type'], block['block_id']): block for block in structure['blocks']}
+
+
+class TestStructureDeltas(unittest.TestCase):
+    """
+    Tests for computing and applying structure deltas
+    """
+    def setUp(self):
+        super(TestStructureDeltas, self).setUp()
+        self.base = make_structure()
+        self.structure = next_version(self.base)
+        blocks = blocks_by_key(self.structure)
+        blocks[('problem', 'p0')]['fields']['display_name'] = 'Changed'
+        self.structure['blocks'].remove(blocks[('problem', 'p1')])
+        blocks[('chapter', 'ch1')]['fields']['children'].remove(['problem', 'p1'])
+        self.structure['blocks'].append(make_block('html', 'new', self.structure['_id']))
+
+    def test_delta(self):
+        delta = structure_delta(self.structure, self.base, [self.base['_id']])
+        self.assertEqual(
+            sorted((block['block_type'], block['block_id']) for block in delta['blocks']),
+            [('chapter', 'ch1'), ('html', 'new'), ('problem', 'p0')]
+        )
+        self.assertEqual(delta['removed_blocks'], [['problem', 'p1']])
+        self.assertEqual(delta['delta_base'], self.base['_id'])
+        self.assertEqual(delta['delta_chain'], [self.base['_id']])
+        self.assertEqual(delta['previous_version'], self.base['_id'])
+
+    def test_round_trip(self):
+        delta = structure_delta(self.structure, self.base, [self.base['_id']])
+        rebuilt = apply_structure_delta(self.base, delta)
+        self.assertEqual(blocks_by_key(rebuilt), blocks_by_key(self.structure))
+        self.assertEqual(
+            {key: value for key, value in rebuilt.iteritems() if key != 'blocks'},
+            {key: value for key, value in self.structure.iteritems() if key != 'blocks'},
+        )
+
+    def test_tuples_match_lists(self):
+        # the structures being stored have BlockKeys where the ones read back have lists
+        blocks = blocks_by_key(self.structure)
+        blocks[('chapter', 'ch1')]['fields']['children'] = [
+            BlockKey(*child) for child in blocks[('chapter', 'ch1')]['fields']['children']
+        ]
+        unchanged = next_version(self.structure)
+        self.assertEqual(structure_delta(unchanged, self.structure, [])['blocks'], [])
+
+
+class TestDeltaStorage(unittest.TestCase):
+    """
+    Tests for storing and reading structures as deltas
+    """
+    SNAPSHOT_INTERVAL = 3
+
+    def setUp(self):
+        super(TestDeltaStorage, self).setUp()
+        self.connection = MongoConnection(
+            db='test_xmodule',
+            collection='modulestore{0}'.format(uuid.uuid4().hex[:5]),
+            host=MONGO_HOST,
+            port=MONGO_PORT_NUM,
+            structure_snapshot_interval=self.SNAPSHOT_INTERVAL,
+        )
+        self.addCleanup(self.connection.structures.drop)
+
+    def _history(self, length):
+        """
+        Store ``length`` versions of a structure, changing one problem in each, and return them
+        """
+        versions = [make_structure()]
+        for index in range(1, length):
+            structure = next_version(versions[-1])
+            blocks = blocks_by_key(structure)
+            blocks[('problem', 'p{}'.format(index % 6))]['fields']['display_name'] = 'Version {}'.format(index)
+            versions.append(structure)
+        for structure in versions:
+            self.connection.structures.insert(
+                self.connection._structure_document(copy.deepcopy(structure))  # pylint: disable=protected-access
+            )
+        return versions
+
+    def assertStored(self, versions):
+        """
+        Assert that every version reads back in full
+        """
+        for structure in versions:
+            stored = structure_to_mongo(self.connection.get_structure(structure['_id']))
+            self.assertEqual(blocks_by_key(stored).keys(), blocks_by_key(structure).keys())
+            for key, block in blocks_by_key(structure).iteritems():
+                fields = blocks_by_key(stored)[key]['fields']
+                if 'children' in fields:
+                    fields['children'] = [list(child) for child in fields['children']]
+                self.assertEqual(fields, block['fields'])
+        self.assertEqual(
+            set(structure['_id'] for structure in self.connection.find_structures_by_id(
+                [structure['_id'] for structure in versions]
+            )),
+            set(structure['_id'] for structure in versions)
+        )
+
+    def test_snapshot_interval(self):
+        versions = self._history(7)
+        deltas = [
+            'delta_base' in self.connection.structures.find_one({'_id': structure['_id']})
+            for structure in versions
+        ]
+        self.assertEqual(deltas, [False, True, True, False, True, True, False])
+        self.assertStored(versions)
+
+    def test_rewrite_history(self):
+        self.connection.structure_snapshot_interval = None
+        versions = self._history(7)
+        self.assertEqual(
+            self.connection.rewrite_structure_history(versions[0]['_id'], snapshot_interval=3, commit=False),
+            (3, 4, 4)
+        )
+        self.assertFalse(any('delta_base' in doc for doc in self.connection.structures.find()))
+
+        self.assertEqual(self.connection.rewrite_structure_history(versions[0]['_id'], snapshot_interval=3), (3, 4, 4))
+        self.assertEqual(len([doc for doc in self.connection.structures.find() if 'delta_base' in doc]), 4)
+        self.assertStored(versions)
+        # only the documents whose chains change are rewritten
+        self.assertEqual(self.connection.rewrite_structure_history(versions[0]['_id'], snapshot_interval=7), (1, 6, 4))
+        self.assertStored(versions)
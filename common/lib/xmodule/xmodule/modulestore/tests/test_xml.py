@@ -3,6 +3,8 @@ Tests around our XML modulestore, including importing
 well-formed and not-well-formed XML.
 """
 import os.path
+import shutil
+import tempfile
 import unittest
 from glob import glob
 from mock import patch, Mock
@@ -148,3 +150,54 @@ class TestXMLModuleStore(unittest.TestCase):
         other_parent = store.get_item(other_parent_loc)
         # children rather than get_children b/c the instance returned by get_children != shared_item
         self.assertIn(shared_item_loc, other_parent.children)
+
+    def _assert_same_courses(self, store, expected_store):
+        """
+        Assert that store loaded the same courses, blocks and field values as expected_store
+        """
+        self.assertItemsEqual(store.courses.keys(), expected_store.courses.keys())
+        for course_dir, expected_course in expected_store.courses.iteritems():
+            course_id = expected_course.id
+            self.assertEqual(store.courses[course_dir].location, expected_course.location)
+            self.assertItemsEqual(store.modules[course_id].keys(), expected_store.modules[course_id].keys())
+            for location, expected_block in expected_store.modules[course_id].iteritems():
+                block = store.modules[course_id][location]
+                self.assertEqual(type(block).__name__, type(expected_block).__name__)
+                for name, field in expected_block.fields.iteritems():
+                    self.assertEqual(field.read_json(block), field.read_json(expected_block), (location, name))
+
+    def test_load_processes(self):
+        """
+        Test parsing courses in several processes
+        """
+        source_dirs = ['toy', 'simple']
+        serial_store = XMLModuleStore(DATA_DIR, source_dirs=source_dirs, xblock_mixins=(XModuleMixin,))
+        store = XMLModuleStore(DATA_DIR, source_dirs=source_dirs, xblock_mixins=(XModuleMixin,), load_processes=2)
+        self._assert_same_courses(store, serial_store)
+
+        course = store.get_course(SlashSeparatedCourseKey('edX', 'toy', '2012_Fall'))
+        self.assertEqual(course.data_dir, 'toy')
+        self.assertTrue(all(child.parent == course.location for child in course.get_children()))
+
+    def test_parsed_cache(self):
+        """
+        Test loading courses from the parsed course cache
+        """
+        data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, data_dir)
+        shutil.copytree(os.path.join(DATA_DIR, 'toy'), os.path.join(data_dir, 'toy'))
+        cache_dir = os.path.join(data_dir, 'parsed')
+
+        parsed_store = XMLModuleStore(data_dir, source_dirs=['toy'], parsed_cache_dir=cache_dir)
+        with patch.object(XMLModuleStore, 'try_load_course') as mock_load:
+            cached_store = XMLModuleStore(data_dir, source_dirs=['toy'], parsed_cache_dir=cache_dir)
+            self.assertFalse(mock_load.called)
+        self._assert_same_courses(cached_store, parsed_store)
+
+        # changing the course makes it get parsed again
+        course_xml = os.path.join(data_dir, 'toy', 'course.xml')
+        mtime = os.path.getmtime(course_xml) + 10
+        os.utime(course_xml, (mtime, mtime))
+        with patch.object(XMLModuleStore, 'try_load_course') as mock_load:
+            XMLModuleStore(data_dir, source_dirs=['toy'], parsed_cache_dir=cache_dir)
+            mock_load.assert_called_once_with('toy', None, None)
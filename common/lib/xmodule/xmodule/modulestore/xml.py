@@ -1,11 +1,14 @@
+import cPickle as pickle
 import hashlib
 import itertools
 import json
 import logging
+import multiprocessing
 import os
 import re
 import sys
 import glob
+import tempfile
 
 from collections import defaultdict
 from cStringIO import StringIO
@@ -30,13 +33,15 @@ from opaque_keys.edx.locations import SlashSeparatedCourseKey, Location
 from opaque_keys.edx.locator import CourseLocator, LibraryLocator
 
 from xblock.field_data import DictFieldData
-from xblock.runtime import DictKeyValueStore
+from xblock.runtime import DictKeyValueStore, KvsFieldData
 from xblock.fields import ScopeIds
 
 import dogstats_wrapper as dog_stats_api
 
 from .exceptions import ItemNotFoundError
-from .inheritance import compute_inherited_metadata, inheriting_field_data, InheritanceKeyValueStore
+from .inheritance import (
+    compute_inherited_metadata, inheriting_field_data, InheritanceKeyValueStore, InheritingFieldData
+)
 
 
 edx_xml_parser = etree.XMLParser(dtd_validation=False, load_dtd=False,
@@ -276,6 +281,36 @@ class ImportSystem(XMLParsingSystem, MakoDescriptorSystem):
         block.children.append(child_block.scope_ids.usage_id)
 
 
+# The XMLModuleStore which the forked processes of its course parsing pool load courses for
+_parsing_store = None
+
+
+def _init_course_parser(xmlstore):
+    """
+    Set the XMLModuleStore which a course parsing process loads courses for
+    """
+    global _parsing_store  # pylint: disable=global-statement
+    _parsing_store = xmlstore
+
+
+def _parse_course(args):
+    """
+    Load the course in course_dir in a course parsing process, and return the compact picklable
+    form of it which XMLModuleStore rebuilds the course from, or None if that fails.
+    """
+    course_dir, course_ids, target_course_id = args
+    # pylint: disable=protected-access
+    try:
+        _parsing_store.try_load_course(course_dir, course_ids, target_course_id)
+        return _parsing_store._dump_course(course_dir)
+    except Exception:  # pylint: disable=broad-except
+        log.exception("Failed to parse courselike '%s' in a worker process", course_dir)
+        return None
+    finally:
+        # the process loads many courses; only the parent needs to keep them
+        _parsing_store._unload_course(course_dir)
+
+
 class CourseLocationManager(OpaqueKeyReader, AsideKeyGenerator):
     """
     IdGenerator for Location-based definition ids and usage ids
@@ -332,10 +367,14 @@ class XMLModuleStore(ModuleStoreReadBase):
     """
     parent_xml = COURSE_ROOT
 
+    # Change whenever the form of the parsed courses in the parsed course cache changes
+    PARSED_CACHE_VERSION = 1
+
     def __init__(
             self, data_dir, default_class=None, source_dirs=None, course_ids=None,
             load_error_modules=True, i18n_service=None, fs_service=None, user_service=None,
-            signal_handler=None, target_course_id=None, **kwargs   # pylint: disable=unused-argument
+            signal_handler=None, target_course_id=None, load_processes=1, parsed_cache_dir=None,
+            **kwargs   # pylint: disable=unused-argument
     ):
         """
         Initialize an XMLModuleStore from data_dir
@@ -348,6 +387,13 @@ class XMLModuleStore(ModuleStoreReadBase):
 
             source_dirs or course_ids (list of str): If specified, the list of source_dirs or course_ids to load.
                 Otherwise, load all courses. Note, providing both
+
+            load_processes (int): how many processes to parse the courses in. Courses are parsed in
+                forked worker processes when it's more than 1, and rebuilt in this process.
+
+            parsed_cache_dir (str): if specified, a directory to keep the parsed courses in, so that
+                the courses which haven't changed on disk since they were last parsed don't get parsed
+                again. The entries don't notice changes to the code, so clear it when deploying.
         """
         super(XMLModuleStore, self).__init__(**kwargs)
 
@@ -374,6 +420,7 @@ class XMLModuleStore(ModuleStoreReadBase):
         self.i18n_service = i18n_service
         self.fs_service = fs_service
         self.user_service = user_service
+        self.parsed_cache_dir = path(parsed_cache_dir) if parsed_cache_dir else None
 
         # If we are specifically asked for missing courses, that should
         # be an error.  If we are asked for "all" courses, find the ones
@@ -384,8 +431,11 @@ class XMLModuleStore(ModuleStoreReadBase):
         if source_dirs is None:
             source_dirs = sorted([d for d in os.listdir(self.data_dir) if
                                   os.path.exists(self.data_dir / d / self.parent_xml)])
-        for course_dir in source_dirs:
-            self.try_load_course(course_dir, course_ids, target_course_id)
+        if load_processes > 1 or self.parsed_cache_dir is not None:
+            self._load_parsed_courses(source_dirs, course_ids, target_course_id, load_processes)
+        else:
+            for course_dir in source_dirs:
+                self.try_load_course(course_dir, course_ids, target_course_id)
 
     def try_load_course(self, course_dir, course_ids=None, target_course_id=None):
         '''
@@ -419,6 +469,206 @@ class XMLModuleStore(ModuleStoreReadBase):
             course_id = self.id_from_descriptor(course_descriptor)
             self._course_errors[course_id] = errorlog
 
+    def _load_parsed_courses(self, source_dirs, course_ids, target_course_id, load_processes):
+        """
+        Load the courses in source_dirs from the parsed course cache where they haven't changed since
+        they were cached, and parse the rest in a pool of load_processes processes (or in this
+        process if that's 1), caching what gets parsed.
+        """
+        parsed = {}
+        cache_keys = {}
+        if self.parsed_cache_dir is not None:
+            for course_dir in source_dirs:
+                # take the key before parsing, so that the entry is stale if the course changes meanwhile
+                cache_keys[course_dir] = self._parsed_cache_key(course_dir, course_ids, target_course_id)
+                parsed[course_dir] = self._read_parsed_course(course_dir, cache_keys[course_dir])
+
+        to_parse = [course_dir for course_dir in source_dirs if parsed.get(course_dir) is None]
+        if load_processes > 1 and len(to_parse) > 1:
+            pool = multiprocessing.Pool(
+                min(load_processes, len(to_parse)), initializer=_init_course_parser, initargs=(self,)
+            )
+            try:
+                dumps = pool.map(
+                    _parse_course,
+                    [(course_dir, course_ids, target_course_id) for course_dir in to_parse],
+                    chunksize=1
+                )
+            finally:
+                pool.close()
+                pool.join()
+            for course_dir, dump in zip(to_parse, dumps):
+                parsed[course_dir] = dump
+                if dump is not None and course_dir in cache_keys:
+                    self._write_parsed_course(course_dir, cache_keys[course_dir], dump)
+
+        # load in source_dirs order, so that the same course ids come out on top as when loading serially
+        for course_dir in source_dirs:
+            dump = parsed.get(course_dir)
+            if dump is not None:
+                self._restore_course(course_dir, dump, target_course_id)
+                continue
+            self.try_load_course(course_dir, course_ids, target_course_id)
+            if course_dir in cache_keys and course_dir in to_parse:
+                self._write_parsed_course(course_dir, cache_keys[course_dir], self._dump_course(course_dir))
+
+    def _dump_course(self, course_dir):
+        """
+        Return a compact picklable form of the course loaded from course_dir, holding the class,
+        ids and field values of each of its blocks, which _restore_course rebuilds it from.
+        """
+        course = self.courses.get(course_dir)
+        if course is None:
+            errorlog = self.errored_courses.get(course_dir)
+            return {
+                'errored': errorlog is not None,
+                'errors': list(errorlog.errors) if errorlog is not None else [],
+                'course_id': None,
+            }
+
+        course_id = self.id_from_descriptor(course)
+        return {
+            'errored': False,
+            'errors': list(self._course_errors[course_id].errors),
+            'course_id': course_id,
+            'course_location': course.location,
+            'blocks': [self._dump_block(block) for block in self.modules[course_id].itervalues()],
+        }
+
+    def _dump_block(self, block):
+        """
+        Return the class, scope ids, kind of field data storage, explicitly set field values (in
+        their json form), inherited settings and data_dir of the block.
+        """
+        field_data = block._field_data  # pylint: disable=protected-access
+        kvs = getattr(field_data, '_kvs', None)
+        inherited_settings = None
+        if field_data is self.field_data:
+            storage = 'runtime'
+        elif isinstance(kvs, InheritanceKeyValueStore):
+            storage = 'inheriting' if isinstance(field_data, InheritingFieldData) else 'kvs'
+            inherited_settings = kvs.inherited_settings
+        else:
+            storage = 'dict'
+        fields = {
+            name: field.read_json(block)
+            for name, field in block.fields.iteritems()
+            if field.is_set_on(block)
+        }
+        return (
+            getattr(type(block), 'unmixed_class', type(block)),
+            block.scope_ids,
+            storage,
+            fields,
+            inherited_settings,
+            getattr(block, 'data_dir', None),
+        )
+
+    def _restore_course(self, course_dir, dump, target_course_id=None):
+        """
+        Rebuild the course from course_dir in this store from the form of it made by _dump_course
+        """
+        errorlog = make_error_tracker()
+        errorlog.errors.extend(dump['errors'])
+        if dump['errored']:
+            self.errored_courses[course_dir] = errorlog
+            return
+        course_id = dump['course_id']
+        if course_id is None:
+            return
+
+        # the policy only applies while parsing the xml
+        system = self._create_import_system(
+            course_dir, course_id, errorlog.tracker, lambda usage_id: {}, target_course_id
+        )
+        for block_class, scope_ids, storage, fields, inherited_settings, data_dir in dump['blocks']:
+            if storage == 'runtime':
+                block = system.construct_xblock_from_class(block_class, scope_ids, self.field_data)
+                for name, value in fields.iteritems():
+                    self.field_data.set(block, name, value)
+            else:
+                if storage == 'dict':
+                    field_data = DictFieldData(fields)
+                else:
+                    kvs = InheritanceKeyValueStore(initial_values=fields, inherited_settings=inherited_settings)
+                    field_data = inheriting_field_data(kvs) if storage == 'inheriting' else KvsFieldData(kvs)
+                block = system.construct_xblock_from_class(block_class, scope_ids, field_data)
+            if data_dir is not None:
+                block.data_dir = data_dir
+            self.modules[course_id][scope_ids.usage_id] = block
+
+        self.courses[course_dir] = self.modules[course_id][dump['course_location']]
+        self._course_errors[course_id] = errorlog
+
+    def _unload_course(self, course_dir):
+        """
+        Forget the course loaded from course_dir
+        """
+        course = self.courses.pop(course_dir, None)
+        self.errored_courses.pop(course_dir, None)
+        if course is not None:
+            course_id = self.id_from_descriptor(course)
+            self.modules.pop(course_id, None)
+            self._course_errors.pop(course_id, None)
+
+    def _parsed_cache_key(self, course_dir, course_ids, target_course_id):
+        """
+        Return what the parsed course cache entry of course_dir must have been made with to be fresh:
+        how this store loads courses and the newest modification time of anything in the course.
+        """
+        newest, count = 0, 0
+        for dirpath, __, filenames in os.walk(self.data_dir / course_dir):
+            for filepath in itertools.chain([dirpath], (os.path.join(dirpath, name) for name in filenames)):
+                try:
+                    newest = max(newest, os.path.getmtime(filepath))
+                except OSError:
+                    continue
+                count += 1
+        return (
+            self.PARSED_CACHE_VERSION,
+            self.__class__.__name__,
+            unicode(self.data_dir / course_dir),
+            getattr(self.default_class, '__name__', None),
+            self.load_error_modules,
+            sorted(unicode(course_id) for course_id in course_ids) if course_ids is not None else None,
+            unicode(target_course_id) if target_course_id is not None else None,
+            newest,
+            count,
+        )
+
+    def _parsed_cache_path(self, course_dir):
+        """
+        Return the path of the parsed course cache entry of course_dir
+        """
+        return self.parsed_cache_dir / u'{}.{}.pickle'.format(course_dir, self.__class__.__name__)
+
+    def _read_parsed_course(self, course_dir, cache_key):
+        """
+        Return the parsed course cached for course_dir if it was cached with cache_key, else None
+        """
+        try:
+            with open(self._parsed_cache_path(course_dir), 'rb') as cache_file:
+                entry_key, dump = pickle.load(cache_file)
+        except Exception:  # pylint: disable=broad-except
+            # missing, or made by a version of the code which can't read it back
+            return None
+        return dump if entry_key == cache_key else None
+
+    def _write_parsed_course(self, course_dir, cache_key, dump):
+        """
+        Cache the parsed course of course_dir with cache_key. Failing to is logged, not raised.
+        """
+        try:
+            if not os.path.isdir(self.parsed_cache_dir):
+                os.makedirs(self.parsed_cache_dir)
+            # write to a temporary file and rename it, so readers never see a partial entry
+            handle, temp_path = tempfile.mkstemp(dir=self.parsed_cache_dir)
+            with os.fdopen(handle, 'wb') as cache_file:
+                pickle.dump((cache_key, dump), cache_file, pickle.HIGHEST_PROTOCOL)
+            os.rename(temp_path, self._parsed_cache_path(course_dir))
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Failed to cache the parsed courselike '%s'", course_dir)
+
     def __unicode__(self):
         '''
         String representation - for debugging
@@ -549,30 +799,7 @@ class XMLModuleStore(ModuleStoreReadBase):
                 """
                 return policy.get(policy_key(usage_id), {})
 
-            services = {}
-            if self.i18n_service:
-                services['i18n'] = self.i18n_service
-
-            if self.fs_service:
-                services['fs'] = self.fs_service
-
-            if self.user_service:
-                services['user'] = self.user_service
-
-            system = ImportSystem(
-                xmlstore=self,
-                course_id=course_id,
-                course_dir=course_dir,
-                error_tracker=tracker,
-                load_error_modules=self.load_error_modules,
-                get_policy=get_policy,
-                mixins=self.xblock_mixins,
-                default_class=self.default_class,
-                select=self.xblock_select,
-                field_data=self.field_data,
-                services=services,
-                target_course_id=target_course_id,
-            )
+            system = self._create_import_system(course_dir, course_id, tracker, get_policy, target_course_id)
             course_descriptor = system.process_xml(etree.tostring(course_data, encoding='unicode'))
             # If we fail to load the course, then skip the rest of the loading steps
             if isinstance(course_descriptor, ErrorDescriptor):
@@ -583,6 +810,35 @@ class XMLModuleStore(ModuleStoreReadBase):
             log.debug('========> Done with courselike import from %s', course_dir)
             return course_descriptor
 
+    def _create_import_system(self, course_dir, course_id, tracker, get_policy, target_course_id=None):
+        """
+        Return the ImportSystem for the blocks of the course in course_dir
+        """
+        services = {}
+        if self.i18n_service:
+            services['i18n'] = self.i18n_service
+
+        if self.fs_service:
+            services['fs'] = self.fs_service
+
+        if self.user_service:
+            services['user'] = self.user_service
+
+        return ImportSystem(
+            xmlstore=self,
+            course_id=course_id,
+            course_dir=course_dir,
+            error_tracker=tracker,
+            load_error_modules=self.load_error_modules,
+            get_policy=get_policy,
+            mixins=self.xblock_mixins,
+            default_class=self.default_class,
+            select=self.xblock_select,
+            field_data=self.field_data,
+            services=services,
+            target_course_id=target_course_id,
+        )
+
     def content_importers(self, system, course_descriptor, course_dir, url_name):
         """
         Load all extra non-course content, and calculate metadata inheritance.
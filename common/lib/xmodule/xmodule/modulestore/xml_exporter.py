@@ -107,7 +107,7 @@ class ExportManager(object):
     """
     Manages XML exporting for courselike objects.
     """
-    def __init__(self, modulestore, contentstore, courselike_key, root_dir, target_dir):
+    def __init__(self, modulestore, contentstore, courselike_key, root_dir, target_dir, asset_workers=1):
         """
         Export all modules from `modulestore` and content from `contentstore` as xml to `root_dir`.
 
@@ -116,12 +116,16 @@ class ExportManager(object):
         `courselike_key`: The Locator of the Descriptor to export
         `root_dir`: The directory to write the exported xml to
         `target_dir`: The name of the directory inside `root_dir` to write the content to
+        `asset_workers`: How many of the static assets to export at once, in threads
         """
         self.modulestore = modulestore
         self.contentstore = contentstore
         self.courselike_key = courselike_key
         self.root_dir = root_dir
         self.target_dir = target_dir
+        self.asset_workers = asset_workers
+        # the tarfile to stream the static assets into, when exporting with export_to_tarball
+        self.tar_file = None
 
     @abstractmethod
     def get_key(self):
@@ -180,6 +184,36 @@ class ExportManager(object):
             # Any last pass adjustments
             self.post_process(root, export_fs)
 
+    def export_to_tarball(self, tar_file):
+        """
+        Perform the export into an open tarfile.TarFile, under `target_dir`.
+
+        The static assets are streamed from the contentstore straight into the tarfile, so that only
+        the xml and policies are staged in `root_dir`.
+        """
+        self.tar_file = tar_file
+        try:
+            self.export()
+        finally:
+            self.tar_file = None
+        tar_file.add(self.root_dir + '/' + self.target_dir, arcname=self.target_dir)
+
+    def export_static_assets(self, root_courselike_dir):
+        """
+        Export the static assets from the contentstore into root_courselike_dir/static (or into the
+        tarfile being exported to) and their policy into root_courselike_dir/policies/assets.json.
+        """
+        assets_policy_file = root_courselike_dir + '/policies/assets.json'
+        if self.tar_file is not None:
+            self.contentstore.export_all_for_course_to_tar(
+                self.courselike_key, self.tar_file, self.target_dir + '/static', assets_policy_file,
+            )
+        else:
+            self.contentstore.export_all_for_course(
+                self.courselike_key, root_courselike_dir + '/static/', assets_policy_file,
+                workers=self.asset_workers,
+            )
+
 
 class CourseExportManager(ExportManager):
     """
@@ -219,11 +253,7 @@ class CourseExportManager(ExportManager):
         # export the static assets
         policies_dir = export_fs.makeopendir('policies')
         if self.contentstore:
-            self.contentstore.export_all_for_course(
-                self.courselike_key,
-                root_courselike_dir + '/static/',
-                root_courselike_dir + '/policies/assets.json',
-            )
+            self.export_static_assets(root_courselike_dir)
 
             # If we are using the default course image, export it to the
             # legacy location to support backwards compatibility.
@@ -323,11 +353,7 @@ class LibraryExportManager(ExportManager):
         export_fs.makeopendir('policies')
 
         if self.contentstore:
-            self.contentstore.export_all_for_course(
-                self.courselike_key,
-                self.root_dir + '/' + self.target_dir + '/static/',
-                self.root_dir + '/' + self.target_dir + '/policies/assets.json',
-            )
+            self.export_static_assets(root_courselike_dir)
 
     def post_process(self, root, export_fs):
         """
@@ -343,11 +369,13 @@ class LibraryExportManager(ExportManager):
         xml_file.close()
 
 
-def export_course_to_xml(modulestore, contentstore, course_key, root_dir, course_dir):
+def export_course_to_xml(modulestore, contentstore, course_key, root_dir, course_dir, asset_workers=1):
     """
     Thin wrapper for the Course Export Manager. See ExportManager for details.
     """
-    CourseExportManager(modulestore, contentstore, course_key, root_dir, course_dir).export()
+    CourseExportManager(
+        modulestore, contentstore, course_key, root_dir, course_dir, asset_workers=asset_workers
+    ).export()
 
 
 def export_library_to_xml(modulestore, contentstore, library_key, root_dir, library_dir):
@@ -357,6 +385,20 @@ def export_library_to_xml(modulestore, contentstore, library_key, root_dir, libr
     LibraryExportManager(modulestore, contentstore, library_key, root_dir, library_dir).export()
 
 
+def export_course_to_tarball(modulestore, contentstore, course_key, root_dir, course_dir, tar_file):
+    """
+    Thin wrapper for the Course Export Manager's export into a tarfile. See ExportManager.export_to_tarball.
+    """
+    CourseExportManager(modulestore, contentstore, course_key, root_dir, course_dir).export_to_tarball(tar_file)
+
+
+def export_library_to_tarball(modulestore, contentstore, library_key, root_dir, library_dir, tar_file):
+    """
+    Thin wrapper for the Library Export Manager's export into a tarfile. See ExportManager.export_to_tarball.
+    """
+    LibraryExportManager(modulestore, contentstore, library_key, root_dir, library_dir).export_to_tarball(tar_file)
+
+
 def adapt_references(subtree, destination_course_key, export_fs):
     """
     Map every reference in the subtree into destination_course_key and set it back into the xblock fields
@@ -43,11 +43,12 @@ import xblock
 from xmodule.tabs import CourseTabList
 from xmodule.assetstore import AssetMetadata
 from xmodule.modulestore.django import ASSET_IGNORE_REGEX
-from xmodule.modulestore.exceptions import DuplicateCourseError
+from xmodule.modulestore.exceptions import DuplicateCourseError, ItemNotFoundError
 from xmodule.modulestore.mongo.base import MongoRevisionKey
 from xmodule.modulestore import ModuleStoreEnum
 from xmodule.modulestore.store_utilities import draft_node_constructor, get_draft_subtree_roots
 from xmodule.modulestore.tests.utils import LocationMixin
+from xmodule.util.threads import run_in_threads
 
 
 log = logging.getLogger(__name__)
@@ -55,8 +56,16 @@ log = logging.getLogger(__name__)
 
 def import_static_content(
         course_data_path, static_content_store,
-        target_id, subpath='static', verbose=False):
+        target_id, subpath='static', verbose=False, workers=1, progress_callback=None):
+    """
+    Import the files under course_data_path/subpath into static_content_store as the assets of
+    target_id, reading, thumbnailing and saving up to `workers` of them at once in threads.
+
+    progress_callback, if given, is called with how many of the files have been imported and how many
+    there are to import as each one is done, in the thread which imported it.
 
+    Returns the dict of each file's path under subpath to its asset key.
+    """
     remap_dict = {}
 
     # now import all static assets
@@ -75,6 +84,7 @@ def import_static_content(
     mimetypes.add_type('application/octet-stream', '.srt')
     mimetypes_list = mimetypes.types_map.values()
 
+    content_paths = []
     for dirname, _, filenames in os.walk(static_dir):
         for filename in filenames:
 
@@ -85,56 +95,75 @@ def import_static_content(
                     log.debug('skipping static content %s...', content_path)
                 continue
 
-            if verbose:
-                log.debug('importing static content %s...', content_path)
+            content_paths.append((content_path, filename))
 
-            try:
-                with open(content_path, 'rb') as f:
-                    data = f.read()
-            except IOError:
-                if filename.startswith('._'):
-                    # OS X "companion files". See
-                    # http://www.diigo.com/annotated/0c936fda5da4aa1159c189cea227e174
-                    continue
-                # Not a 'hidden file', then re-raise exception
-                raise
+    imported = []
 
-            # strip away leading path from the name
-            fullname_with_subpath = content_path.replace(static_dir, '')
-            if fullname_with_subpath.startswith('/'):
-                fullname_with_subpath = fullname_with_subpath[1:]
-            asset_key = StaticContent.compute_location(target_id, fullname_with_subpath)
-
-            policy_ele = policy.get(asset_key.path, {})
-            displayname = policy_ele.get('displayname', filename)
-            locked = policy_ele.get('locked', False)
-            mime_type = policy_ele.get('contentType')
-
-            # Check extracted contentType in list of all valid mimetypes
-            if not mime_type or mime_type not in mimetypes_list:
-                mime_type = mimetypes.guess_type(filename)[0]   # Assign guessed mimetype
-            content = StaticContent(
-                asset_key, displayname, mime_type, data,
-                import_path=fullname_with_subpath, locked=locked
-            )
+    def import_file(content_path_and_name):
+        """
+        Save the file at content_path, and its thumbnail, in the content store
+        """
+        content_path, filename = content_path_and_name
+        if verbose:
+            log.debug('importing static content %s...', content_path)
 
-            # first let's save a thumbnail so we can get back a thumbnail location
-            thumbnail_content, thumbnail_location = static_content_store.generate_thumbnail(content)
+        try:
+            with open(content_path, 'rb') as f:
+                data = f.read()
+        except IOError:
+            if filename.startswith('._'):
+                # OS X "companion files". See
+                # http://www.diigo.com/annotated/0c936fda5da4aa1159c189cea227e174
+                return
+            # Not a 'hidden file', then re-raise exception
+            raise
+
+        # strip away leading path from the name
+        fullname_with_subpath = content_path.replace(static_dir, '')
+        if fullname_with_subpath.startswith('/'):
+            fullname_with_subpath = fullname_with_subpath[1:]
+        asset_key = StaticContent.compute_location(target_id, fullname_with_subpath)
+
+        policy_ele = policy.get(asset_key.path, {})
+        displayname = policy_ele.get('displayname', filename)
+        locked = policy_ele.get('locked', False)
+        mime_type = policy_ele.get('contentType')
+
+        # Check extracted contentType in list of all valid mimetypes
+        if not mime_type or mime_type not in mimetypes_list:
+            mime_type = mimetypes.guess_type(filename)[0]   # Assign guessed mimetype
+        content = StaticContent(
+            asset_key, displayname, mime_type, data,
+            import_path=fullname_with_subpath, locked=locked
+        )
 
-            if thumbnail_content is not None:
-                content.thumbnail_location = thumbnail_location
+        # first let's save a thumbnail so we can get back a thumbnail location
+        thumbnail_content, thumbnail_location = static_content_store.generate_thumbnail(content)
 
-            # then commit the content
-            try:
-                static_content_store.save(content)
-            except Exception as err:
-                log.exception(u'Error importing {0}, error={1}'.format(
-                    fullname_with_subpath, err
-                ))
+        if thumbnail_content is not None:
+            content.thumbnail_location = thumbnail_location
 
-            # store the remapping information which will be needed
-            # to subsitute in the module data
-            remap_dict[fullname_with_subpath] = asset_key
+        # then commit the content
+        try:
+            static_content_store.save(content)
+        except Exception as err:
+            log.exception(u'Error importing {0}, error={1}'.format(
+                fullname_with_subpath, err
+            ))
+
+        # store the remapping information which will be needed
+        # to subsitute in the module data
+        remap_dict[fullname_with_subpath] = asset_key
+
+        imported.append(fullname_with_subpath)
+        if progress_callback is not None:
+            progress_callback(len(imported), len(content_paths))
+
+    if workers > 1 and len(content_paths) > 1:
+        run_in_threads(import_file, content_paths, min(workers, len(content_paths)))
+    else:
+        for content_path in content_paths:
+            import_file(content_path)
 
     return remap_dict
 
@@ -171,16 +200,31 @@ class ImportManager(object):
             Otherwise, it throws an InvalidLocationError if the courselike does not exist.
 
         default_class, load_error_modules: are arguments for constructing the XMLModuleStore (see its doc)
+
+        asset_workers: how many of the static files to import at once, in threads.
+
+        progress_callback: if given, called with the destination key, the stage (one of the STAGE_*
+            constants), how much of the stage is done and how much there is to do, as the import
+            progresses. For STAGE_STATIC, it's called from the threads importing the files.
     """
     store_class = XMLModuleStore
 
+    # The stages of importing a courselike which progress is reported for
+    STAGE_STATIC = 'static'
+    STAGE_ASSET_METADATA = 'asset_metadata'
+    STAGE_STRUCTURE = 'structure'
+    STAGE_DRAFTS = 'drafts'
+
+    # How many blocks to import between reports of the progress of STAGE_STRUCTURE
+    PROGRESS_INTERVAL = 100
+
     def __init__(
             self, store, user_id, data_dir, source_dirs=None,
             default_class='xmodule.raw_module.RawDescriptor',
             load_error_modules=True, static_content_store=None,
             target_id=None, verbose=False,
             do_import_static=True, create_if_not_present=False,
-            raise_on_failure=False
+            raise_on_failure=False, asset_workers=1, progress_callback=None
     ):
         self.store = store
         self.user_id = user_id
@@ -193,6 +237,8 @@ class ImportManager(object):
         self.do_import_static = do_import_static
         self.create_if_not_present = create_if_not_present
         self.raise_on_failure = raise_on_failure
+        self.asset_workers = asset_workers
+        self.progress_callback = progress_callback
         self.xml_module_store = self.store_class(
             data_dir,
             default_class=default_class,
@@ -213,15 +259,31 @@ class ImportManager(object):
         if self.target_id:
             assert len(self.xml_module_store.modules) == 1
 
+    def report_progress(self, dest_id, stage, done, total):
+        """
+        Report that `done` of the `total` steps of the stage of importing dest_id are done
+        """
+        if self.verbose:
+            log.debug(u'Importing %s: %s %d/%d', dest_id, stage, done, total)
+        if self.progress_callback is not None:
+            self.progress_callback(dest_id, stage, done, total)
+
     def import_static(self, data_path, dest_id):
         """
         Import all static items into the content store.
         """
+        def report_static_progress(done, total):
+            """
+            Report the progress of importing the static files
+            """
+            self.report_progress(dest_id, self.STAGE_STATIC, done, total)
+
         if self.static_content_store is not None and self.do_import_static:
             # first pass to find everything in /static/
             import_static_content(
                 data_path, self.static_content_store,
-                dest_id, subpath='static', verbose=self.verbose
+                dest_id, subpath='static', verbose=self.verbose,
+                workers=self.asset_workers, progress_callback=report_static_progress
             )
 
         elif self.verbose and not self.do_import_static:
@@ -244,7 +306,8 @@ class ImportManager(object):
         if os.path.exists(data_path / simport):
             import_static_content(
                 data_path, self.static_content_store,
-                dest_id, subpath=simport, verbose=self.verbose
+                dest_id, subpath=simport, verbose=self.verbose,
+                workers=self.asset_workers, progress_callback=report_static_progress
             )
 
     def import_asset_metadata(self, data_dir, course_id):
@@ -292,6 +355,7 @@ class ImportManager(object):
         # Now add all asset metadata to the modulestore.
         if len(all_assets) > 0:
             self.store.save_asset_metadata_list(all_assets, all_assets[0].edited_by, import_only=True)
+        self.report_progress(course_id, self.STAGE_ASSET_METADATA, len(all_assets), len(all_assets))
 
     def import_courselike(self, runtime, courselike_key, dest_id, source_courselike):
         """
@@ -369,52 +433,67 @@ class ImportManager(object):
         """
         Recursively imports all child blocks from the temporary modulestore into the
         target modulestore.
+
+        Each block is dropped from the temporary modulestore once it and its descendants are
+        imported, so that the source course is let go of as the import goes rather than being
+        held alongside the whole of the imported one.
         """
-        all_locs = set(self.xml_module_store.modules[courselike_key].keys())
+        source_modules = self.xml_module_store.modules[courselike_key]
+        all_locs = set(source_modules.keys())
         all_locs.remove(source_courselike.location)
+        total = len(all_locs)
+        imported_locs = set()
+
+        def import_block(block):
+            """
+            Import the block into the target modulestore, and report the progress every so often
+            """
+            if self.verbose:
+                log.debug('importing module location %s', block.location)
+
+            _update_and_import_module(
+                block,
+                self.store,
+                self.user_id,
+                courselike_key,
+                dest_id,
+                do_import_static=self.do_import_static,
+                runtime=courselike.runtime,
+            )
+            imported_locs.add(block.location)
+            if len(imported_locs) % self.PROGRESS_INTERVAL == 0 or len(imported_locs) == total:
+                self.report_progress(dest_id, self.STAGE_STRUCTURE, len(imported_locs), total)
 
         def depth_first(subtree):
             """
             Import top down just so import code can make assumptions about parents always being available
             """
             if subtree.has_children:
-                for child in subtree.get_children():
-                    try:
-                        all_locs.remove(child.location)
-                    except KeyError:
+                # load the children one at a time rather than with get_children, which would keep
+                # them all (and their descendants) in memory for as long as subtree is. Loading the
+                # course (compute_inherited_metadata) already cached them on subtree, so drop those.
+                subtree._child_instances = None  # pylint: disable=protected-access
+                for child_loc in subtree.children:
+                    if child_loc in imported_locs:
                         # tolerate same child occurring under 2 parents such as in
                         # ContentStoreTest.test_image_import
-                        pass
-                    if self.verbose:
-                        log.debug('importing module location %s', child.location)
-
-                    _update_and_import_module(
-                        child,
-                        self.store,
-                        self.user_id,
-                        courselike_key,
-                        dest_id,
-                        do_import_static=self.do_import_static,
-                        runtime=courselike.runtime,
-                    )
+                        continue
+                    try:
+                        child = self.xml_module_store.get_item(child_loc)
+                    except ItemNotFoundError:
+                        log.warning(u'Unable to load item %s, skipping', child_loc)
+                        continue
+                    all_locs.discard(child_loc)
 
+                    import_block(child)
                     depth_first(child)
+                    source_modules.pop(child_loc, None)
 
         depth_first(source_courselike)
 
         for leftover in all_locs:
-            if self.verbose:
-                log.debug('importing module location %s', leftover)
-
-            _update_and_import_module(
-                self.xml_module_store.get_item(leftover),
-                self.store,
-                self.user_id,
-                courselike_key,
-                dest_id,
-                do_import_static=self.do_import_static,
-                runtime=courselike.runtime,
-            )
+            import_block(self.xml_module_store.get_item(leftover))
+            source_modules.pop(leftover, None)
 
     def run_imports(self):
         """
@@ -449,6 +528,7 @@ class ImportManager(object):
             with self.store.bulk_operations(dest_id):
                 # Import all draft items into the courselike.
                 courselike = self.import_drafts(courselike, courselike_key, data_path, dest_id)
+            self.report_progress(dest_id, self.STAGE_DRAFTS, 1, 1)
 
             yield courselike
 
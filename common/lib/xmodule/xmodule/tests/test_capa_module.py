@@ -1715,6 +1715,18 @@ class CapaDescriptorTest(unittest.TestCase):
             descriptor.display_name = name
         return descriptor
 
+    def test_max_score_is_user_independent(self):
+        descriptor = self._create_descriptor('<problem><stringresponse answer="a"/></problem>')
+        descriptor.rerandomize = RANDOMIZATION.PER_STUDENT
+        self.assertTrue(descriptor.max_score_is_user_independent)
+
+        scripted_xml = '<problem><script type="loncapa/python">n = len(anonymous_student_id)</script></problem>'
+        descriptor = self._create_descriptor(scripted_xml)
+        descriptor.rerandomize = RANDOMIZATION.NEVER
+        self.assertFalse(descriptor.max_score_is_user_independent)
+        descriptor.rerandomize = RANDOMIZATION.PER_STUDENT
+        self.assertFalse(descriptor.max_score_is_user_independent)
+
     @ddt.data(*responsetypes.registry.registered_tags())
     def test_all_response_types(self, response_tag):
         """ Tests that every registered response tag is correctly returned """
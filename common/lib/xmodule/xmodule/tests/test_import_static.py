@@ -39,3 +39,34 @@ class IgnoredFilesTestCase(unittest.TestCase):
         self.assertNotIn(".DS_Store", name_val)
         self.assertIn("GREEN", name_val["example.txt"])
         self.assertIn("BLUE", name_val[".example.txt"])
+
+    def test_import_in_threads(self):
+        """
+        Test importing the static files in several threads
+        """
+        course_dir = DATA_DIR / "dot-underscore"
+        course_id = SlashSeparatedCourseKey("edX", "dot-underscore", "2014_Fall")
+        content_store = Mock()
+        content_store.generate_thumbnail.return_value = ("content", "location")
+        progress_callback = Mock()
+        remap_dict = import_static_content(
+            course_dir, content_store, course_id, workers=4, progress_callback=progress_callback
+        )
+        saved_static_content = [call[0][0] for call in content_store.save.call_args_list]
+        self.assertItemsEqual([sc.name for sc in saved_static_content], ["example.txt", ".example.txt"])
+        self.assertItemsEqual(remap_dict.keys(), ["example.txt", ".example.txt"])
+        self.assertItemsEqual(
+            [call[0] for call in progress_callback.call_args_list],
+            [(1, 2), (2, 2)]
+        )
+
+    def test_import_in_threads_error(self):
+        """
+        Test that an error importing a file in a thread is raised
+        """
+        course_dir = DATA_DIR / "dot-underscore"
+        course_id = SlashSeparatedCourseKey("edX", "dot-underscore", "2014_Fall")
+        content_store = Mock()
+        content_store.generate_thumbnail.side_effect = ValueError
+        with self.assertRaises(ValueError):
+            import_static_content(course_dir, content_store, course_id, workers=4)
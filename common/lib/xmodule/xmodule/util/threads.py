@@ -0,0 +1,47 @@
+"""
+Helpers for doing I/O-bound work in several threads at once.
+"""
+import sys
+import threading
+from Queue import Queue
+
+
+def run_in_threads(function, items, workers):
+    """
+    Call function on each of items in a pool of `workers` threads, reading ahead of them only a
+    few items at a time, and re-raise the first exception that any of the calls raised.
+    """
+    work = Queue(maxsize=workers * 2)
+    errors = []
+
+    def work_through_queue():
+        """
+        Call function on the items on the queue until taking the None which marks the end
+        """
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            if errors:
+                # keep draining the queue so that the producer doesn't block
+                continue
+            try:
+                function(item)
+            except Exception:  # pylint: disable=broad-except
+                errors.append(sys.exc_info())
+
+    threads = [threading.Thread(target=work_through_queue) for __ in range(workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for item in items:
+            if errors:
+                break
+            work.put(item)
+    finally:
+        for __ in threads:
+            work.put(None)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0][0], errors[0][1], errors[0][2]
@@ -285,6 +285,11 @@ class XModuleMixin(XModuleFields, XBlockMixin):
     # student interacts with the module on the page.  A specific example is
     # FoldIt, which posts grade-changing updates through a separate API.
     always_recalculate_grades = False
+
+    # True if this descriptor's max_score() is the same for every student, so that
+    # grading can reuse it across students rather than instantiate the module for each.
+    max_score_is_user_independent = False
+
     # The default implementation of get_icon_class returns the icon_class
     # attribute of the class
     #
@@ -116,6 +116,10 @@ def get_course_with_access(user, action, course_key, depth=0, check_if_enrolled=
 def course_image_url(course):
     """Try to look up the image url for the course.  If it's not found,
     log an error and return the dead link"""
+    # imported here as the course_overviews models import this module
+    from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+    if isinstance(course, CourseOverview):
+        return course.course_image_url
     if course.static_asset_path or modulestore().get_modulestore_type(course.id) == ModuleStoreEnum.Type.xml:
         # If we are a static course with the course_image attribute
         # set different than the default, return that path so that
@@ -1,30 +1,37 @@
 # Compute grades using real division, with no integer truncation
 from __future__ import division
 from collections import defaultdict
+import hashlib
+from itertools import islice
 import json
 import random
 import logging
 
 from contextlib import contextmanager
+import numpy
 from django.conf import settings
-from django.db import transaction
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
 from django.test.client import RequestFactory
+from django.utils import timezone
 
 import dogstats_wrapper as dog_stats_api
 
 from courseware import courses
-from courseware.model_data import FieldDataCache
+from courseware.access import has_access
+from courseware.model_data import FieldDataCache, ScoresClient
 from student.models import anonymous_id_for_user
 from util.module_utils import yield_dynamic_descriptor_descendants
 from xmodule import graders
 from xmodule.graders import Score
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.exceptions import ItemNotFoundError
-from .models import StudentModule
+from .models import PersistentCourseGrade, PersistentGradesInvalidation, PersistentSubsectionGrade, StudentModule
 from .module_render import get_module_for_descriptor
 from submissions import api as sub_api  # installed from the edx-submissions repository
+from submissions.models import ScoreSummary
 from opaque_keys import InvalidKeyError
-from opaque_keys.edx.keys import CourseKey
+from opaque_keys.edx.keys import CourseKey, UsageKey
 
 
 log = logging.getLogger("edx.courseware")
@@ -122,16 +129,16 @@ def answer_distributions(course_key):
 
 
 @transaction.commit_manually
-def grade(student, request, course, keep_raw_scores=False):
+def grade(student, request, course, keep_raw_scores=False, scores_client=None, invalidations=None):
     """
     Wraps "_grade" with the manual_transaction context manager just in case
     there are unanticipated errors.
     """
     with manual_transaction():
-        return _grade(student, request, course, keep_raw_scores)
+        return _grade(student, request, course, keep_raw_scores, scores_client, invalidations)
 
 
-def _grade(student, request, course, keep_raw_scores):
+def _grade(student, request, course, keep_raw_scores, scores_client=None, invalidations=None):
     """
     Unwrapped version of "grade"
 
@@ -151,16 +158,50 @@ def _grade(student, request, course, keep_raw_scores):
       for every graded module
 
     More information on the format is in the docstring for CourseGrader.
+
+    scores_client: an already fetched ScoresClient of the student's scores in the course, if any
+    invalidations: the count of invalidations of the student's stored grades, read before scores_client
+        was fetched; required with scores_client if persistent grades are enabled
+
+    If persistent grades are enabled, the grade and the scores of each section are stored, and
+    read back rather than recomputed until the student's scores or the course change. They aren't
+    stored if the student's scores changed while they were graded, nor if they depend on which
+    problems the student can access (see _grade_section).
     """
-    grading_context = course.grading_context
+    grading_context = grading_context_for(course)
     raw_scores = []
 
+    course_version = _persistent_grades_version(course)
+    # some problems have state that is updated independently of interaction
+    # with the LMS, so their sections need to always be scored. (E.g. foldit.,
+    # combinedopenended)
+    always_recalculated_sections = set(
+        section['usage_key']
+        for sections in grading_context['graded_sections'].itervalues()
+        for section in sections
+        if section['always_recalculate']
+    )
+    store_course_grade = course_version is not None and not always_recalculated_sections
+    if store_course_grade and not keep_raw_scores:
+        grade_summary = _stored_grade_summary(student, course, course_version)
+        if grade_summary is not None:
+            return grade_summary
+
+    # read before the scores, to tell whether they changed before the grades computed from them are stored
+    if course_version is not None and invalidations is None:
+        with manual_transaction():
+            invalidations = _persistent_grades_invalidations([student.id], course.id)[student.id]
+    stored_subsection_scores = _stored_subsection_scores(student, course, course_version)
+    subsection_grades = []
+
     # Dict of item_ids -> (earned, possible) point tuples. This *only* grabs
     # scores that were registered with the submissions API, which for the moment
-    # means only openassessment (edx-ora2)
-    submissions_scores = sub_api.get_scores(
-        course.id.to_deprecated_string(), anonymous_id_for_user(student, course.id)
-    )
+    # means only openassessment (edx-ora2). Fetched once a section needs grading,
+    # as are all of the student's scores in the course and the cached max scores.
+    submissions_scores = None
+    if scores_client is None:
+        scores_client = ScoresClient(course.id, student.id)
+    max_scores_cache = MaxScoresCache.create_for_course(course)
 
     totaled_scores = {}
     # This next complicated loop is just to collect the totaled_scores, which is
@@ -168,80 +209,35 @@ def _grade(student, request, course, keep_raw_scores):
     for section_format, sections in grading_context['graded_sections'].iteritems():
         format_scores = []
         for section in sections:
-            section_descriptor = section['section_descriptor']
-            section_name = section_descriptor.display_name_with_default
+            section_name = section['display_name']
+            section_key = section['usage_key']
 
-            # some problems have state that is updated independently of interaction
-            # with the LMS, so they need to always be scored. (E.g. foldit.,
-            # combinedopenended)
-            should_grade_section = any(
-                descriptor.always_recalculate_grades for descriptor in section['xmoduledescriptors']
-            )
-
-            # If there are no problems that always have to be regraded, check to
-            # see if any of our locations are in the scores from the submissions
-            # API. If scores exist, we have to calculate grades for this section.
-            if not should_grade_section:
-                should_grade_section = any(
-                    descriptor.location.to_deprecated_string() in submissions_scores
-                    for descriptor in section['xmoduledescriptors']
+            if section_key in stored_subsection_scores and section_key not in always_recalculated_sections:
+                scores = stored_subsection_scores[section_key]
+            else:
+                if submissions_scores is None:
+                    submissions_scores = sub_api.get_scores(
+                        course.id.to_deprecated_string(), anonymous_id_for_user(student, course.id)
+                    )
+                    max_scores_cache.fetch_from_remote(grading_context['all_usage_keys'])
+                scores, access_independent = _grade_section(
+                    student, request, course, section, section_key in always_recalculated_sections,
+                    submissions_scores, scores_client, max_scores_cache
                 )
-
-            if not should_grade_section:
-                with manual_transaction():
-                    should_grade_section = StudentModule.objects.filter(
-                        student=student,
-                        module_state_key__in=[
-                            descriptor.location for descriptor in section['xmoduledescriptors']
-                        ]
-                    ).exists()
+                if not access_independent:
+                    store_course_grade = False
+                elif course_version is not None and section_key not in always_recalculated_sections:
+                    subsection_grades.append(PersistentSubsectionGrade(
+                        user=student,
+                        course_id=course.id,
+                        usage_key=section_key,
+                        course_version=course_version,
+                        scores=json.dumps(_serialize_scores(scores)) if scores is not None else None,
+                    ))
 
             # If we haven't seen a single problem in the section, we don't have
             # to grade it at all! We can assume 0%
-            if should_grade_section:
-                scores = []
-
-                def create_module(descriptor):
-                    '''creates an XModule instance given a descriptor'''
-                    # TODO: We need the request to pass into here. If we could forego that, our arguments
-                    # would be simpler
-                    with manual_transaction():
-                        field_data_cache = FieldDataCache([descriptor], course.id, student)
-                    return get_module_for_descriptor(
-                        student, request, descriptor, field_data_cache, course.id, course=course
-                    )
-
-                for module_descriptor in yield_dynamic_descriptor_descendants(
-                        section_descriptor, student.id, create_module
-                ):
-
-                    (correct, total) = get_score(
-                        course.id, student, module_descriptor, create_module, scores_cache=submissions_scores
-                    )
-                    if correct is None and total is None:
-                        continue
-
-                    if settings.GENERATE_PROFILE_SCORES:  	# for debugging!
-                        if total > 1:
-                            correct = random.randrange(max(total - 2, 1), total + 1)
-                        else:
-                            correct = total
-
-                    graded = module_descriptor.graded
-                    if not total > 0:
-                        # We simply cannot grade a problem that is 12/0, because we might need it as a percentage
-                        graded = False
-
-                    scores.append(
-                        Score(
-                            correct,
-                            total,
-                            graded,
-                            module_descriptor.display_name_with_default,
-                            module_descriptor.location
-                        )
-                    )
-
+            if scores is not None:
                 _, graded_total = graders.aggregate_scores(scores, section_name)
                 if keep_raw_scores:
                     raw_scores += scores
@@ -254,13 +250,36 @@ def _grade(student, request, course, keep_raw_scores):
             else:
                 log.info(
                     "Unable to grade a section with a total possible score of zero. " +
-                    str(section_descriptor.location)
+                    str(section_key)
                 )
 
         totaled_scores[section_format] = format_scores
 
     # Grading policy might be overriden by a CCX, need to reset it
     course.set_grading_policy(course.grading_policy)
+    grade_summary = _grade_summary(course, totaled_scores)
+
+    max_scores_cache.push_to_remote()
+    if (subsection_grades or store_course_grade) and not _persistent_grades_invalidated(
+            student, course, invalidations
+    ):
+        if subsection_grades:
+            _store_subsection_grades(student, course, subsection_grades)
+        if store_course_grade:
+            _store_grade_summary(student, course, course_version, grade_summary)
+
+    if keep_raw_scores:
+        # way to get all RAW scores out to instructor
+        # so grader can be double-checked
+        grade_summary['raw_scores'] = raw_scores
+    return grade_summary
+
+
+def _grade_summary(course, totaled_scores):
+    """
+    Return the course grader's output for the totaled scores of a student's graded sections, augmented
+    with the final letter grade and the totaled scores themselves.
+    """
     grade_summary = course.grader.grade(totaled_scores, generate_random_scores=settings.GENERATE_PROFILE_SCORES)
 
     # We round the grade here, to make sure that the grade is an whole percentage and
@@ -270,13 +289,364 @@ def _grade(student, request, course, keep_raw_scores):
     letter_grade = grade_for_percentage(course.grade_cutoffs, grade_summary['percent'])
     grade_summary['grade'] = letter_grade
     grade_summary['totaled_scores'] = totaled_scores  	# make this available, eg for instructor download & debugging
-    if keep_raw_scores:
-        # way to get all RAW scores out to instructor
-        # so grader can be double-checked
-        grade_summary['raw_scores'] = raw_scores
     return grade_summary
 
 
+def _grade_section(
+        student, request, course, section, always_recalculate, submissions_scores, scores_client, max_scores_cache
+):
+    """
+    Return the list of Scores of the student on the problems of the graded section from the
+    grading context, or None if the student hasn't seen a single problem in it; along with whether
+    the Scores don't depend on which of the problems the student can access. Which problems a student
+    can load changes with release dates and the student's cohort and groups, which don't invalidate
+    stored grades, so Scores which left out a problem the student couldn't load aren't to be stored.
+
+    scores_client: a ScoresClient of the student's scores in the course
+    max_scores_cache: the MaxScoresCache of the course
+    """
+    scored_usage_keys = [block['usage_key'] for block in section['blocks'] if block['has_score']]
+
+    should_grade_section = always_recalculate
+
+    # If there are no problems that always have to be regraded, check to
+    # see if any of our locations are in the scores from the submissions
+    # API. If scores exist, we have to calculate grades for this section.
+    if not should_grade_section:
+        should_grade_section = any(
+            usage_key.to_deprecated_string() in submissions_scores for usage_key in scored_usage_keys
+        )
+
+    if not should_grade_section:
+        with manual_transaction():
+            should_grade_section = any(usage_key in scores_client for usage_key in scored_usage_keys)
+
+    if not should_grade_section:
+        return None, True
+
+    section_descriptor = _section_descriptor(course, section['usage_key'])
+    scores = []
+    unloadable = []
+
+    def create_module(descriptor):
+        '''creates an XModule instance given a descriptor'''
+        # TODO: We need the request to pass into here. If we could forego that, our arguments
+        # would be simpler
+        with manual_transaction():
+            field_data_cache = FieldDataCache([descriptor], course.id, student)
+        module = get_module_for_descriptor(
+            student, request, descriptor, field_data_cache, course.id, course=course
+        )
+        if module is None:
+            unloadable.append(descriptor.location)
+        return module
+
+    for module_descriptor in yield_dynamic_descriptor_descendants(
+            section_descriptor, student.id, create_module
+    ):
+
+        (correct, total) = get_score(
+            course.id, student, module_descriptor, create_module, scores_cache=submissions_scores,
+            scores_client=scores_client, max_scores_cache=max_scores_cache
+        )
+        if correct is None and total is None:
+            continue
+
+        if settings.GENERATE_PROFILE_SCORES:  	# for debugging!
+            if total > 1:
+                correct = random.randrange(max(total - 2, 1), total + 1)
+            else:
+                correct = total
+
+        graded = module_descriptor.graded
+        if not total > 0:
+            # We simply cannot grade a problem that is 12/0, because we might need it as a percentage
+            graded = False
+
+        scores.append(
+            Score(
+                correct,
+                total,
+                graded,
+                module_descriptor.display_name_with_default,
+                module_descriptor.location
+            )
+        )
+    return scores, not unloadable
+
+
+def _course_content_version(course):
+    """
+    Return a string which changes whenever the content of the course does, or None if the course's
+    modulestore doesn't keep track of that.
+    """
+    # split-Mongo versions the whole structure; old Mongo records when anything in the course last changed
+    course_entry = getattr(course.runtime, 'course_entry', None)
+    if course_entry is not None:
+        return unicode(course_entry.structure['_id'])
+    try:
+        subtree_edited_on = course.subtree_edited_on
+    except AttributeError:
+        return None
+    return subtree_edited_on.isoformat() if subtree_edited_on is not None else None
+
+
+GRADING_CONTEXT_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def grading_context_for(course):
+    """
+    Return the grading context of the course: the lightweight version of course.grading_context
+    which grading works from. It holds no descriptors, so it's computed from them once per version
+    of the course and cached across processes. Its keys are:
+
+    graded_sections - A dictionary keyed by section format of lists of the graded sections with
+        that format, each a dictionary of
+            "usage_key" : The section's location
+            "display_name" : The section's display name
+            "always_recalculate" : Whether any block in the section always recalculates its grade
+            "has_dynamic_children" : Whether any block in the section has dynamic children, so
+                that the blocks in the section can differ between students
+            "blocks" : The section and all of its (static) descendants, in the order their scores
+                are listed in, each a dictionary of their "usage_key", "display_name", "has_score",
+                "graded", "weight" and "max_score_is_user_independent"
+
+    all_usage_keys - The locations of all of the blocks in the graded sections
+    """
+    try:
+        return course._grades_grading_context  # pylint: disable=protected-access
+    except AttributeError:
+        pass
+
+    content_version = _course_content_version(course)
+    cache_key = u"grades.grading_context.{}.{}".format(course.id, content_version)
+    serialized = cache.get(cache_key) if content_version is not None else None
+    if serialized is None:
+        serialized = _serialize_grading_context(course)
+        if content_version is not None:
+            cache.set(cache_key, serialized, GRADING_CONTEXT_CACHE_TIMEOUT)
+
+    def usage_key(serialized_usage_key):
+        """
+        Return the location, with the course run old Mongo locations lack
+        """
+        return UsageKey.from_string(serialized_usage_key).map_into_course(course.id)
+
+    grading_context = {'graded_sections': {}, 'all_usage_keys': []}
+    for section_format, sections in serialized['graded_sections'].iteritems():
+        grading_context['graded_sections'][section_format] = []
+        for section in sections:
+            section = dict(section, usage_key=usage_key(section['usage_key']))
+            section['blocks'] = [dict(block, usage_key=usage_key(block['usage_key'])) for block in section['blocks']]
+            grading_context['graded_sections'][section_format].append(section)
+            grading_context['all_usage_keys'].extend(block['usage_key'] for block in section['blocks'])
+
+    # a course is graded many times in a row, e.g. for grade reports
+    course._grades_grading_context = grading_context  # pylint: disable=protected-access
+    return grading_context
+
+
+def _serialize_grading_context(course):
+    """
+    Return the grading context of the course (see grading_context_for) with its locations as strings
+    """
+    graded_sections = {}
+    for section_format, sections in course.grading_context['graded_sections'].iteritems():
+        graded_sections[section_format] = []
+        for section in sections:
+            section_descriptor = section['section_descriptor']
+            # in the order yield_dynamic_descriptor_descendants yields them if there are no dynamic children
+            descriptors = []
+            stack = [section_descriptor]
+            while stack:
+                block_descriptor = stack.pop()
+                stack.extend(block_descriptor.get_children())
+                descriptors.append(block_descriptor)
+
+            graded_sections[section_format].append({
+                'usage_key': unicode(section_descriptor.location),
+                'display_name': section_descriptor.display_name_with_default,
+                'always_recalculate': any(descriptor.always_recalculate_grades for descriptor in descriptors),
+                'has_dynamic_children': any(descriptor.has_dynamic_children() for descriptor in descriptors),
+                'blocks': [
+                    {
+                        'usage_key': unicode(descriptor.location),
+                        'display_name': descriptor.display_name_with_default,
+                        'has_score': descriptor.has_score,
+                        'graded': descriptor.graded,
+                        'weight': getattr(descriptor, 'weight', None) if descriptor.has_score else None,
+                        'max_score_is_user_independent': getattr(descriptor, 'max_score_is_user_independent', False),
+                    }
+                    for descriptor in descriptors
+                ],
+            })
+    return {'graded_sections': graded_sections}
+
+
+def _section_descriptor(course, usage_key):
+    """
+    Return the descriptor of the course's section at usage_key
+    """
+    for chapter in course.get_children():
+        for section in chapter.get_children():
+            if section.location == usage_key:
+                return section
+    raise ItemNotFoundError(usage_key)
+
+
+def _persistent_grades_version(course):
+    """
+    Return a string identifying the version of the course's content and grading policy, which stored
+    grades are valid for, or None if grades in the course aren't to be stored.
+    """
+    if not settings.FEATURES.get('ENABLE_PERSISTENT_GRADES', False) or settings.GENERATE_PROFILE_SCORES:
+        return None
+
+    content_version = _course_content_version(course)
+    if content_version is None:
+        return None
+
+    # a CCX can override the grading policy without changing the content
+    policy_version = hashlib.md5(json.dumps(course.grading_policy, sort_keys=True)).hexdigest()
+    return u'{}:{}'.format(content_version, policy_version)
+
+
+def _serialize_scores(scores):
+    """
+    Return the list of Scores as a list which can be dumped to JSON
+    """
+    return [list(score[:4]) + [unicode(score.module_id) if score.module_id else None] for score in scores]
+
+
+def _deserialize_scores(scores):
+    """
+    Return the list of Scores from its _serialize_scores form
+    """
+    return [
+        Score(*(score[:4] + [UsageKey.from_string(score[4]) if score[4] else None]))
+        for score in scores
+    ]
+
+
+def _stored_subsection_scores(student, course, course_version):
+    """
+    Return a dict of the student's stored scores on the graded subsections of the course, for this
+    version of the course, keyed by subsection location. The scores of a subsection are None if the
+    student hasn't seen any of its problems.
+    """
+    if course_version is None:
+        return {}
+    with manual_transaction():
+        subsection_grades = list(PersistentSubsectionGrade.objects.filter(
+            user=student, course_id=course.id, course_version=course_version
+        ))
+    return {
+        subsection_grade.usage_key.map_into_course(course.id): (
+            _deserialize_scores(json.loads(subsection_grade.scores)) if subsection_grade.scores is not None else None
+        )
+        for subsection_grade in subsection_grades
+    }
+
+
+def _persistent_grades_invalidations(user_ids, course_key):
+    """
+    Return a dict of the counts of invalidations of the stored grades in the course of each of the users,
+    keyed by user id
+    """
+    invalidations = dict.fromkeys(user_ids, 0)
+    invalidations.update(
+        PersistentGradesInvalidation.objects.filter(user__in=user_ids, course_id=course_key).values_list(
+            'user_id', 'count'
+        )
+    )
+    return invalidations
+
+
+def _persistent_grades_invalidated(student, course, invalidations):
+    """
+    Return whether the student's stored grades in the course have been invalidated since their count of
+    invalidations was invalidations, i.e. whether grades computed from scores read after it may be stale.
+
+    The count stays locked until the end of the transaction, so a change of the student's scores
+    waits for the grades to be stored, and then deletes them.
+    """
+    counts = list(
+        PersistentGradesInvalidation.objects.select_for_update().filter(
+            user=student, course_id=course.id
+        ).values_list('count', flat=True)
+    )
+    return (counts[0] if counts else 0) != invalidations
+
+
+def _store_subsection_grades(student, course, subsection_grades):
+    """
+    Store the unsaved PersistentSubsectionGrades, replacing the student's previous grades of their subsections
+    """
+    PersistentSubsectionGrade.objects.filter(
+        user=student, course_id=course.id,
+        usage_key__in=[subsection_grade.usage_key for subsection_grade in subsection_grades]
+    ).delete()
+    try:
+        PersistentSubsectionGrade.objects.bulk_create(subsection_grades)
+    except IntegrityError:
+        # another request stored them meanwhile
+        log.info(u"Subsection grades of %s in %s already stored", student.id, course.id)
+
+
+def _stored_grade_summary(student, course, course_version):
+    """
+    Return the student's stored grade summary for this version of the course, or None if there's none.
+    """
+    with manual_transaction():
+        try:
+            course_grade = PersistentCourseGrade.objects.get(
+                user=student, course_id=course.id, course_version=course_version
+            )
+        except PersistentCourseGrade.DoesNotExist:
+            return None
+    return _stored_grade_summary_of(course_grade)
+
+
+def _stored_grade_summary_of(course_grade):
+    """
+    Return the grade summary stored in the PersistentCourseGrade
+    """
+    grade_summary = json.loads(course_grade.gradeset)
+    grade_summary['totaled_scores'] = {
+        section_format: _deserialize_scores(scores)
+        for section_format, scores in grade_summary['totaled_scores'].iteritems()
+    }
+    grade_summary['percent'] = course_grade.percent
+    grade_summary['grade'] = course_grade.letter_grade
+    return grade_summary
+
+
+def _store_grade_summary(student, course, course_version, grade_summary):
+    """
+    Store the student's grade summary for this version of the course, replacing any previous one.
+    """
+    gradeset = dict(grade_summary)
+    del gradeset['percent']
+    del gradeset['grade']
+    gradeset['totaled_scores'] = {
+        section_format: _serialize_scores(scores)
+        for section_format, scores in grade_summary['totaled_scores'].iteritems()
+    }
+    values = {
+        'course_version': course_version,
+        'percent': grade_summary['percent'],
+        'letter_grade': grade_summary['grade'],
+        'gradeset': json.dumps(gradeset),
+    }
+    course_grades = PersistentCourseGrade.objects.filter(user=student, course_id=course.id)
+    if not course_grades.update(modified=timezone.now(), **values):
+        try:
+            PersistentCourseGrade.objects.create(user=student, course_id=course.id, **values)
+        except IntegrityError:
+            # another request stored it meanwhile
+            log.info(u"Grade of %s in %s already stored", student.id, course.id)
+
+
 def grade_for_percentage(grade_cutoffs, percentage):
     """
     Returns a letter grade as defined in grading_policy (e.g. 'A' 'B' 'C' for 6.002x) or None.
@@ -349,6 +719,10 @@ def _progress_summary(student, request, course):
         course_module = getattr(course_module, '_x_module', course_module)
 
     submissions_scores = sub_api.get_scores(course.id.to_deprecated_string(), anonymous_id_for_user(student, course.id))
+    scores_client = ScoresClient(course.id, student.id)
+    max_scores_cache = MaxScoresCache.create_for_course(course)
+    max_scores_cache.fetch_from_remote(grading_context_for(course)['all_usage_keys'])
+    stored_subsection_scores = _stored_subsection_scores(student, course, _persistent_grades_version(course))
 
     chapters = []
     # Don't include chapters that aren't displayable (e.g. due to error)
@@ -370,25 +744,32 @@ def _progress_summary(student, request, course):
 
                 module_creator = section_module.xmodule_runtime.get_module
 
-                for module_descriptor in yield_dynamic_descriptor_descendants(
-                        section_module, student.id, module_creator
-                ):
-                    course_id = course.id
-                    (correct, total) = get_score(
-                        course_id, student, module_descriptor, module_creator, scores_cache=submissions_scores
-                    )
-                    if correct is None and total is None:
-                        continue
-
-                    scores.append(
-                        Score(
-                            correct,
-                            total,
-                            graded,
-                            module_descriptor.display_name_with_default,
-                            module_descriptor.location
+                if stored_subsection_scores.get(section_module.location) is not None:
+                    # the scores grading last stored for the section
+                    scores = [
+                        score._replace(graded=graded) for score in stored_subsection_scores[section_module.location]
+                    ]
+                else:
+                    for module_descriptor in yield_dynamic_descriptor_descendants(
+                            section_module, student.id, module_creator
+                    ):
+                        course_id = course.id
+                        (correct, total) = get_score(
+                            course_id, student, module_descriptor, module_creator, scores_cache=submissions_scores,
+                            scores_client=scores_client, max_scores_cache=max_scores_cache
+                        )
+                        if correct is None and total is None:
+                            continue
+
+                        scores.append(
+                            Score(
+                                correct,
+                                total,
+                                graded,
+                                module_descriptor.display_name_with_default,
+                                module_descriptor.location
+                            )
                         )
-                    )
 
                 scores.reverse()
                 section_total, _ = graders.aggregate_scores(
@@ -412,10 +793,83 @@ def _progress_summary(student, request, course):
             'sections': sections
         })
 
+    max_scores_cache.push_to_remote()
     return chapters
 
 
-def get_score(course_id, user, problem_descriptor, module_creator, scores_cache=None):
+class MaxScoresCache(object):
+    """
+    A cache, shared across processes, of the max scores of the problems in a version of a course
+    which are worth the same for every student (see XModuleMixin.max_score_is_user_independent),
+    so that grading students who haven't been scored on those problems needn't instantiate them.
+    """
+    CACHE_TIMEOUT = 60 * 60 * 24
+
+    def __init__(self, cache_prefix):
+        """
+        cache_prefix: the prefix of the cache keys, identifying the version of the course; None to
+            disable the cache
+        """
+        self.cache_prefix = cache_prefix
+        self._max_scores = {}
+        self._updates = {}
+
+    @classmethod
+    def create_for_course(cls, course):
+        """
+        Return the MaxScoresCache of the current version of the course
+        """
+        content_version = _course_content_version(course)
+        if content_version is None:
+            return cls(None)
+        return cls(u"grades.max_scores.{}.{}".format(course.id, content_version))
+
+    def _cache_key(self, location):
+        """
+        Return the cache key of the max score of the problem at location
+        """
+        return u"{}.{}".format(self.cache_prefix, location)
+
+    def fetch_from_remote(self, locations):
+        """
+        Fetch the cached max scores of the problems at the locations at once
+        """
+        if self.cache_prefix is None:
+            return
+        cache_keys = {self._cache_key(location): location for location in locations}
+        for cache_key, max_score in cache.get_many(cache_keys.keys()).iteritems():
+            self._max_scores[cache_keys[cache_key]] = max_score
+
+    def push_to_remote(self):
+        """
+        Cache the max scores set since they were fetched
+        """
+        if self.cache_prefix is None or not self._updates:
+            return
+        cache.set_many(
+            {self._cache_key(location): max_score for location, max_score in self._updates.iteritems()},
+            self.CACHE_TIMEOUT
+        )
+        self._updates = {}
+
+    def get(self, location):
+        """
+        Return the fetched or set max score of the problem at location, or None if it's unknown
+        """
+        return self._max_scores.get(location)
+
+    def set(self, location, max_score):
+        """
+        Set the max score of the problem at location, to be cached by push_to_remote
+        """
+        if self.cache_prefix is not None and self._max_scores.get(location) != max_score:
+            self._max_scores[location] = self._updates[location] = max_score
+
+
+def get_score(
+        course_id, user, problem_descriptor, module_creator, scores_cache=None, scores_client=None,
+        max_scores_cache=None
+):
     """
     Return the score for a user on a problem, as a tuple (correct, total).
     e.g. (5,7) if you got 5 out of 7 points.
@@ -429,6 +883,10 @@ def get_score(course_id, user, problem_descriptor, module_creator, scores_cache=
            Can return None if user doesn't have access, or if something else went wrong.
     scores_cache: A dict of location names to (earned, possible) point tuples.
            If an entry is found in this cache, it takes precedence.
+    scores_client: A ScoresClient of the user's scores in the course, to read the user's StudentModule
+           score from rather than querying it.
+    max_scores_cache: A MaxScoresCache of the course, to read the max score of a problem the user hasn't
+           been scored on from rather than instantiating the problem, if it's the same for every student.
     """
     scores_cache = scores_cache or {}
 
@@ -455,39 +913,54 @@ def get_score(course_id, user, problem_descriptor, module_creator, scores_cache=
         # These are not problems, and do not have a score
         return (None, None)
 
-    try:
-        student_module = StudentModule.objects.get(
-            student=user,
-            course_id=course_id,
-            module_state_key=problem_descriptor.location
-        )
-    except StudentModule.DoesNotExist:
-        student_module = None
-
-    if student_module is not None and student_module.max_grade is not None:
-        correct = student_module.grade if student_module.grade is not None else 0
-        total = student_module.max_grade
+    if scores_client is not None:
+        score = scores_client.get(problem_descriptor.location)
     else:
-        # If the problem was not in the cache, or hasn't been graded yet,
-        # we need to instantiate the problem.
-        # Otherwise, the max score (cached in student_module) won't be available
-        problem = module_creator(problem_descriptor)
-        if problem is None:
-            return (None, None)
+        try:
+            student_module = StudentModule.objects.get(
+                student=user,
+                course_id=course_id,
+                module_state_key=problem_descriptor.location
+            )
+            score = ScoresClient.Score(student_module.grade, student_module.max_grade)
+        except StudentModule.DoesNotExist:
+            score = None
 
+    if score is not None and score.total is not None:
+        correct = score.correct if score.correct is not None else 0
+        total = score.total
+    else:
         correct = 0.0
-        total = problem.max_score()
+        cache_max_score = max_scores_cache is not None and getattr(
+            problem_descriptor, 'max_score_is_user_independent', False
+        )
+        total = max_scores_cache.get(problem_descriptor.location) if cache_max_score else None
+        # the access check which instantiating the problem would do
+        if total is not None and not has_access(user, 'load', problem_descriptor, course_id):
+            total = None
 
-        # Problem may be an error module (if something in the problem builder failed)
-        # In which case total might be None
         if total is None:
-            return (None, None)
+            # If the problem was not in the cache, or hasn't been graded yet,
+            # we need to instantiate the problem.
+            # Otherwise, the max score (cached in student_module) won't be available
+            problem = module_creator(problem_descriptor)
+            if problem is None:
+                return (None, None)
+
+            total = problem.max_score()
+
+            # Problem may be an error module (if something in the problem builder failed)
+            # In which case total might be None
+            if total is None:
+                return (None, None)
+            if cache_max_score:
+                max_scores_cache.set(problem_descriptor.location, total)
 
     # Now we re-weight the problem, if specified
     weight = problem_descriptor.weight
     if weight is not None:
         if total == 0:
-            log.exception("Cannot reweight a problem with zero total points. Problem: " + str(student_module))
+            log.exception(u"Cannot reweight a problem with zero total points. Problem: %s", problem_descriptor.location)
             return (correct, total)
         correct = correct * weight / total
         total = weight
@@ -525,6 +998,9 @@ def iterate_grades_for(course_or_id, students, keep_raw_scores=False):
     - grade_breakdown : A breakdown of the major components that
         make up the final grade. (For display)
     - raw_scores: contains scores for every graded module
+
+    Unless what they're graded on differs between students, the students are graded a batch at a
+    time by a BatchGrader.
     """
     if isinstance(course_or_id, (basestring, CourseKey)):
         course = courses.get_course_by_id(course_or_id)
@@ -536,20 +1012,246 @@ def iterate_grades_for(course_or_id, students, keep_raw_scores=False):
     # grading that student.
     request = RequestFactory().get('/')
 
-    for student in students:
-        with dog_stats_api.timer('lms.grades.iterate_grades_for', tags=[u'action:{}'.format(course.id)]):
+    if _can_grade_in_batches(course):
+        for result in BatchGrader(course).iter_grades(students, request, keep_raw_scores):
+            yield result
+    else:
+        for student in students:
+            yield _grade_for_iteration(student, request, course, keep_raw_scores)
+
+
+def _grade_for_iteration(student, request, course, keep_raw_scores, scores_client=None, invalidations=None):
+    """
+    Grade the student on their own for iterate_grades_for, returning its (student, gradeset, err_msg) tuple
+    """
+    with dog_stats_api.timer('lms.grades.iterate_grades_for', tags=[u'action:{}'.format(course.id)]):
+        try:
+            request.user = student
+            # Grading calls problem rendering, which calls masquerading,
+            # which checks session vars -- thus the empty session dict below.
+            # It's not pretty, but untangling that is currently beyond the
+            # scope of this feature.
+            request.session = {}
+            gradeset = grade(student, request, course, keep_raw_scores, scores_client, invalidations)
+            return student, gradeset, ""
+        except Exception as exc:  # pylint: disable=broad-except
+            # Keep marching on even if this student couldn't be graded for
+            # some reason, but log it for future reference.
+            log.exception(
+                'Cannot grade student %s (%s) in course %s because of exception: %s',
+                student.username,
+                student.id,
+                course.id,
+                exc.message
+            )
+            return student, {}, exc.message
+
+
+def _submissions_scores_for_users(course_id, students):
+    """
+    Return a dict, keyed by student id, of the scores of each of the students in the course which were
+    registered with the submissions API, as sub_api.get_scores returns them: dicts of location urls to
+    (earned, possible) point tuples.
+
+    The submissions API only gets one student's scores at a time, so this queries its models the way
+    sub_api.get_scores does, for all of the students at once.
+    """
+    scores = {student.id: {} for student in students}
+    # the ids are derived from the students and the course, so they needn't be read from the database
+    student_ids = {anonymous_id_for_user(student, course_id, save=False): student.id for student in students}
+    score_summaries = ScoreSummary.objects.filter(
+        student_item__course_id=course_id.to_deprecated_string(),
+        student_item__student_id__in=student_ids.keys(),
+    ).select_related('latest', 'student_item')
+    for summary in score_summaries:
+        # as sub_api.get_scores does, leave out the hidden (e.g. reset) scores
+        if not summary.latest.is_hidden():
+            scores[student_ids[summary.student_item.student_id]][summary.student_item.item_id] = (
+                summary.latest.points_earned, summary.latest.points_possible
+            )
+    return scores
+
+
+def _can_grade_in_batches(course):
+    """
+    Whether the students of the course can be graded by a BatchGrader, i.e. whether the problems
+    each student is graded on are the same for every student and scored without instantiating them.
+    """
+    if settings.GENERATE_PROFILE_SCORES:
+        return False
+    return not any(
+        section['has_dynamic_children'] or section['always_recalculate']
+        for sections in grading_context_for(course)['graded_sections'].itervalues()
+        for section in sections
+    )
+
+
+class BatchGrader(object):
+    """
+    Grades the students of a course a batch at a time, the same way as grade(), but from the scores
+    of the whole batch fetched at once and laid out as students x problems matrices, so that neither
+    queries nor problems are needed per student and problem.
+
+    Only for courses which _can_grade_in_batches. A student is graded by grade() instead if they
+    have seen a section with a problem they haven't been scored on whose max score isn't cached.
+    """
+    BATCH_SIZE = 500
+
+    def __init__(self, course):
+        self.course = course
+        # the graded sections of the grading context as (format, section) pairs, and a column per
+        # scored block in the sections (theirs and their descendants'), section by section
+        self.sections = []
+        self.blocks = []
+        section_starts = []
+        for section_format, sections in grading_context_for(course)['graded_sections'].iteritems():
+            for section in sections:
+                self.sections.append((section_format, section))
+                section_starts.append(len(self.blocks))
+                self.blocks.extend(block for block in section['blocks'] if block['has_score'])
+        section_ends = section_starts[1:] + [len(self.blocks)]
+        self.section_columns = [range(start, end) for start, end in zip(section_starts, section_ends)]
+        # the sections with scored blocks, and the columns they start at
+        self.scored_sections = numpy.array(
+            [start < end for start, end in zip(section_starts, section_ends)], dtype=bool
+        )
+        self.scored_section_starts = numpy.array(
+            [start for start, end in zip(section_starts, section_ends) if start < end], dtype=int
+        )
+        self.columns = {block['usage_key']: column for column, block in enumerate(self.blocks)}
+        self.columns_by_url = {
+            block['usage_key'].to_deprecated_string(): column for column, block in enumerate(self.blocks)
+        }
+        self.graded = numpy.array([bool(block['graded']) for block in self.blocks], dtype=bool)
+        self.weights = numpy.array([block['weight'] for block in self.blocks], dtype=float)
+        self._descriptors = None
+
+    def _descriptor(self, column):
+        """
+        Return the descriptor of the block of the column, loading the graded sections' descriptors the
+        first time
+        """
+        if self._descriptors is None:
+            self._descriptors = {}
+            for __, section in self.sections:
+                # none of the descriptors has dynamic children, so there's no module to create
+                for descriptor in yield_dynamic_descriptor_descendants(
+                        _section_descriptor(self.course, section['usage_key']), None, None
+                ):
+                    self._descriptors[descriptor.location] = descriptor
+        return self._descriptors[self.blocks[column]['usage_key']]
+
+    def _sum_by_section(self, matrix):
+        """
+        Return the students x sections matrix of the sums of the students x columns matrix over the columns
+        of each section
+        """
+        sums = numpy.zeros((matrix.shape[0], len(self.sections)), dtype=matrix.dtype)
+        # reduceat can't sum over no columns, so only the sections with columns are summed
+        if len(self.scored_section_starts):
+            sums[:, self.scored_sections] = numpy.add.reduceat(matrix, self.scored_section_starts, axis=1)
+        return sums
+
+    def iter_grades(self, students, request, keep_raw_scores=False):
+        """
+        Grade the students a batch at a time, yielding a (student, gradeset, err_msg) tuple per student
+        as iterate_grades_for does
+        """
+        students = iter(students)
+        while True:
+            batch = list(islice(students, self.BATCH_SIZE))
+            if not batch:
+                return
+            try:
+                with dog_stats_api.timer(
+                    'lms.grades.iterate_grades_for.batch', tags=[u'action:{}'.format(self.course.id)]
+                ):
+                    results = self._grade_batch(batch, request, keep_raw_scores)
+            except Exception:  # pylint: disable=broad-except
+                log.exception(u'Cannot grade a batch of students in course %s, grading them one by one', self.course.id)
+                results = [
+                    _grade_for_iteration(student, request, self.course, keep_raw_scores) for student in batch
+                ]
+            for result in results:
+                yield result
+
+    def _grade_batch(self, students, request, keep_raw_scores):
+        """
+        Return the list of (student, gradeset, err_msg) tuples of the batch of students
+        """
+        course = self.course
+        course_version = _persistent_grades_version(course)
+        stored_grade_summaries = {}
+        if course_version is not None and not keep_raw_scores:
+            stored_grade_summaries = {
+                course_grade.user_id: _stored_grade_summary_of(course_grade)
+                for course_grade in PersistentCourseGrade.objects.filter(
+                    user__in=[student.id for student in students], course_id=course.id, course_version=course_version
+                )
+            }
+        ungraded_students = [student for student in students if student.id not in stored_grade_summaries]
+
+        invalidations = {}
+        if course_version is not None:
+            # read before the scores, to tell whether they changed before the grades computed from them are stored
+            invalidations = _persistent_grades_invalidations([student.id for student in ungraded_students], course.id)
+        scores_clients = ScoresClient.create_for_users(course.id, [student.id for student in ungraded_students])
+        max_scores_cache = MaxScoresCache.create_for_course(course)
+        max_scores_cache.fetch_from_remote(block['usage_key'] for block in self.blocks)
+        earned, possible, included, touched, unknown, unloadable = self._score_matrices(
+            ungraded_students, scores_clients, max_scores_cache
+        )
+
+        graded = included & self.graded & (possible > 0)
+        section_earned = self._sum_by_section(numpy.where(graded, earned, 0.0))
+        section_possible = self._sum_by_section(numpy.where(graded, possible, 0.0))
+
+        # Grading policy might be overriden by a CCX, need to reset it
+        course.set_grading_policy(course.grading_policy)
+        gradesets = {}
+        for row, student in enumerate(ungraded_students):
+            if unknown[row]:
+                continue
             try:
-                request.user = student
-                # Grading calls problem rendering, which calls masquerading,
-                # which checks session vars -- thus the empty session dict below.
-                # It's not pretty, but untangling that is currently beyond the
-                # scope of this feature.
-                request.session = {}
-                gradeset = grade(student, request, course, keep_raw_scores)
-                yield student, gradeset, ""
+                totaled_scores = {}
+                raw_scores = []
+                for index, (section_format, section) in enumerate(self.sections):
+                    section_name = section['display_name']
+                    if touched[row, index]:
+                        graded_total = Score(
+                            float(section_earned[row, index]), float(section_possible[row, index]), True,
+                            section_name, None
+                        )
+                        raw_scores.extend(
+                            Score(
+                                float(earned[row, column]),
+                                float(possible[row, column]),
+                                bool(graded[row, column]),
+                                self.blocks[column]['display_name'],
+                                self.blocks[column]['usage_key']
+                            )
+                            for column in self.section_columns[index] if included[row, column]
+                        )
+                    else:
+                        graded_total = Score(0.0, 1.0, True, section_name, None)
+                    format_scores = totaled_scores.setdefault(section_format, [])
+                    if graded_total.possible > 0:
+                        format_scores.append(graded_total)
+                    else:
+                        log.info(
+                            "Unable to grade a section with a total possible score of zero. " +
+                            str(section['usage_key'])
+                        )
+                grade_summary = _grade_summary(course, totaled_scores)
+                # as grade() does, the grade isn't stored if it left out a problem the student couldn't load
+                if course_version is not None and not unloadable[row]:
+                    with transaction.commit_on_success():
+                        if not _persistent_grades_invalidated(student, course, invalidations[student.id]):
+                            _store_grade_summary(student, course, course_version, grade_summary)
+                if keep_raw_scores:
+                    grade_summary['raw_scores'] = raw_scores
+                gradesets[student.id] = (student, grade_summary, "")
             except Exception as exc:  # pylint: disable=broad-except
-                # Keep marching on even if this student couldn't be graded for
-                # some reason, but log it for future reference.
                 log.exception(
                     'Cannot grade student %s (%s) in course %s because of exception: %s',
                     student.username,
@@ -557,4 +1259,84 @@ def iterate_grades_for(course_or_id, students, keep_raw_scores=False):
                     course.id,
                     exc.message
                 )
-                yield student, {}, exc.message
+                gradesets[student.id] = (student, {}, exc.message)
+
+        results = []
+        for student in students:
+            if student.id in stored_grade_summaries:
+                results.append((student, stored_grade_summaries[student.id], ""))
+            elif student.id in gradesets:
+                results.append(gradesets[student.id])
+            else:
+                results.append(_grade_for_iteration(
+                    student, request, course, keep_raw_scores, scores_clients[student.id],
+                    invalidations.get(student.id)
+                ))
+        return results
+
+    def _score_matrices(self, students, scores_clients, max_scores_cache):
+        """
+        Return the students' scores on the problems, as get_score would score and reweight them, as
+        students x columns matrices of the points earned and possible and of whether the problem counts, along with a
+        students x sections matrix of whether the student has seen a problem in the section, a
+        vector of whether the student has to be graded by grade() instead and a vector of whether a
+        problem was left out because the student couldn't load it.
+        """
+        course = self.course
+        shape = (len(students), len(self.blocks))
+        earned = numpy.zeros(shape)
+        possible = numpy.zeros(shape)
+        scored = numpy.zeros(shape, dtype=bool)
+        seen = numpy.zeros(shape, dtype=bool)
+        submitted = numpy.zeros(shape, dtype=bool)
+        submissions_scores = _submissions_scores_for_users(course.id, students)
+        for row, student in enumerate(students):
+            for location, score in scores_clients[student.id].iteritems():
+                column = self.columns.get(location)
+                if column is not None:
+                    seen[row, column] = True
+                    if score.total is not None:
+                        scored[row, column] = True
+                        earned[row, column] = score.correct if score.correct is not None else 0
+                        possible[row, column] = score.total
+            # scores registered with the submissions API take precedence, and aren't reweighted
+            for location_url, (sub_earned, sub_possible) in submissions_scores[student.id].iteritems():
+                column = self.columns_by_url.get(location_url)
+                if column is not None:
+                    submitted[row, column] = seen[row, column] = True
+                    earned[row, column] = sub_earned
+                    possible[row, column] = sub_possible
+
+        scored &= ~submitted
+        touched = self._sum_by_section(seen.astype(int)) > 0
+        included = scored | submitted
+        unknown = numpy.zeros(len(students), dtype=bool)
+        unloadable = numpy.zeros(len(students), dtype=bool)
+
+        # The problems a student isn't scored on in the sections they've seen are worth their max score,
+        # if it's the same for every student, cached and the student has access to the problem.
+        section_of_column = numpy.repeat(
+            numpy.arange(len(self.sections)), [len(columns) for columns in self.section_columns]
+        )
+        unscored = touched[:, section_of_column] & ~included
+        for row, column in numpy.argwhere(unscored):
+            if unknown[row]:
+                continue
+            block = self.blocks[column]
+            max_score = None
+            if block['max_score_is_user_independent']:
+                max_score = max_scores_cache.get(block['usage_key'])
+            if max_score is None:
+                unknown[row] = True
+            elif has_access(students[row], 'load', self._descriptor(column), course.id):
+                included[row, column] = True
+                possible[row, column] = max_score
+            else:
+                unloadable[row] = True
+
+        # reweight the problems which are worth a weight, other than those of zero total points
+        reweighted = included & ~submitted & ~numpy.isnan(self.weights) & (possible > 0)
+        weights = numpy.broadcast_arrays(self.weights, possible)[0]
+        earned[reweighted] = earned[reweighted] * weights[reweighted] / possible[reweighted]
+        possible[reweighted] = weights[reweighted]
+        return earned, possible, included, touched, unknown, unloadable
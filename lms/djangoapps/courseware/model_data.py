@@ -19,11 +19,13 @@ UserStateSummaryCache: A cache for Scope.user_state_summary
 PreferencesCache: A cache for Scope.preferences
 UserInfoCache: A cache for Scope.user_info
 DjangoOrmFieldCache: A base-class for single-row-per-field caches.
+
+:class:`ScoresClient`: A read-only prefetch cache of a user's scores in a course.
 """
 
 import json
 from abc import abstractmethod, ABCMeta
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 from .models import (
     StudentModule,
     XModuleUserStateSummaryField,
@@ -955,3 +957,79 @@ class FieldDataCache(object):
 
     def __len__(self):
         return sum(len(cache) for cache in self.cache.values())
+
+
+class ScoresClient(object):
+    """
+    A read-only cache of a user's scores (the grade and max_grade of their StudentModules) in a
+    course, all fetched in one query, for grading the user without a query per problem.
+    """
+    Score = namedtuple('Score', 'correct total')
+
+    def __init__(self, course_key, user_id):
+        self.course_key = course_key
+        self.user_id = user_id
+        self._locations_to_scores = None
+
+    def fetch_scores(self):
+        """
+        Fetch the scores of all of the user's StudentModules in the course
+        """
+        scores = StudentModule.objects.filter(
+            student_id=self.user_id,
+            course_id=self.course_key,
+        ).values_list('module_state_key', 'grade', 'max_grade')
+        # Locations in StudentModule don't necessarily have course key info
+        # attached to them (since old mongo identifiers don't include runs).
+        # So we have to add that info back in before we put it into our lookup.
+        self._locations_to_scores = {
+            UsageKey.from_string(location).map_into_course(self.course_key): self.Score(correct, total)
+            for location, correct, total in scores
+        }
+
+    @classmethod
+    def create_for_users(cls, course_key, user_ids):
+        """
+        Return a dict, keyed by user id, of ScoresClients of the users with all of their scores in the
+        course fetched in one query
+        """
+        scores_clients = {}
+        for user_id in user_ids:
+            scores_clients[user_id] = cls(course_key, user_id)
+            scores_clients[user_id]._locations_to_scores = {}  # pylint: disable=protected-access
+        scores = StudentModule.objects.filter(
+            student_id__in=user_ids,
+            course_id=course_key,
+        ).values_list('student_id', 'module_state_key', 'grade', 'max_grade')
+        for user_id, location, correct, total in scores:
+            scores_clients[user_id]._locations_to_scores[  # pylint: disable=protected-access
+                UsageKey.from_string(location).map_into_course(course_key)
+            ] = cls.Score(correct, total)
+        return scores_clients
+
+    def _scores(self):
+        """
+        Return the dict of the user's scores keyed by location, fetching them the first time
+        """
+        if self._locations_to_scores is None:
+            self.fetch_scores()
+        return self._locations_to_scores
+
+    def __contains__(self, location):
+        """
+        Whether the user has a StudentModule for the location, graded or not
+        """
+        return location.map_into_course(self.course_key) in self._scores()
+
+    def get(self, location):
+        """
+        Return the user's Score for the location, or None if they have no StudentModule for it. The
+        correct and total of the Score are None if the StudentModule hasn't been graded.
+        """
+        return self._scores().get(location.map_into_course(self.course_key))
+
+    def iteritems(self):
+        """
+        Iterate over the (location, Score) pairs of all of the user's StudentModules in the course
+        """
+        return self._scores().iteritems()
@@ -17,13 +17,18 @@ import itertools
 
 from django.contrib.auth.models import User
 from django.conf import settings
-from django.db import models
-from django.db.models.signals import post_save
+from django.db import IntegrityError, models
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver, Signal
 
 from model_utils.models import TimeStampedModel
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey, UsageKey
 from student.models import user_by_anonymous_id
 from submissions.models import score_set, score_reset
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.exceptions import ItemNotFoundError
 
 from xmodule_django.models import CourseKeyField, LocationKeyField, BlockTypeKeyField  # pylint: disable=import-error
 log = logging.getLogger(__name__)
@@ -276,6 +281,64 @@ class OfflineComputedGradeLog(models.Model):
         return "[OCGLog] %s: %s" % (self.course_id.to_deprecated_string(), self.created)  # pylint: disable=no-member
 
 
+class PersistentSubsectionGrade(TimeStampedModel):
+    """
+    The scores of a student on the problems of a graded subsection, as last computed by
+    courseware.grades for the version of the course in course_version. Deleted when one of the
+    student's scores in the subsection changes.
+    """
+    user = models.ForeignKey(User, db_index=True)
+    course_id = CourseKeyField(max_length=255)
+    usage_key = LocationKeyField(max_length=255)
+    course_version = models.CharField(max_length=255)
+
+    # The Scores of the problems, stored as JSON; null if the student hasn't touched any of them
+    scores = models.TextField(null=True, blank=True)
+
+    class Meta(object):  # pylint: disable=missing-docstring
+        unique_together = (('user', 'course_id', 'usage_key'),)
+
+    def __unicode__(self):
+        return u"[PersistentSubsectionGrade] {}: {} ({})".format(self.user, self.usage_key, self.course_version)
+
+
+class PersistentCourseGrade(TimeStampedModel):
+    """
+    The grade of a student in a course, as last computed by courseware.grades for the version of the
+    course in course_version. Deleted when any of the student's scores in the course changes.
+    """
+    user = models.ForeignKey(User, db_index=True)
+    course_id = CourseKeyField(max_length=255)
+    course_version = models.CharField(max_length=255)
+
+    percent = models.FloatField()
+    letter_grade = models.CharField(max_length=255, null=True, blank=True)
+    # the rest of the grade summary, stored as JSON
+    gradeset = models.TextField()
+
+    class Meta(object):  # pylint: disable=missing-docstring
+        unique_together = (('user', 'course_id'),)
+
+    def __unicode__(self):
+        return u"[PersistentCourseGrade] {}: {} = {}".format(self.user, self.course_id, self.percent)
+
+
+class PersistentGradesInvalidation(models.Model):
+    """
+    How many times the stored grades of a student in a course have been invalidated, so that grading
+    only stores the grades it computed if none of the scores it read has changed since.
+    """
+    user = models.ForeignKey(User, db_index=True)
+    course_id = CourseKeyField(max_length=255)
+    count = models.IntegerField(default=0)
+
+    class Meta(object):  # pylint: disable=missing-docstring
+        unique_together = (('user', 'course_id'),)
+
+    def __unicode__(self):
+        return u"[PersistentGradesInvalidation] {}: {} = {}".format(self.user, self.course_id, self.count)
+
+
 class StudentFieldOverride(TimeStampedModel):
     """
     Holds the value of a specific field overriden for a student.  This is used
@@ -389,3 +452,76 @@ def submissions_score_reset_handler(sender, **kwargs):  # pylint: disable=unused
             u"Failed to process score_reset signal from Submissions API. "
             "user: %s, course_id: %s, usage_id: %s", user, course_id, usage_id
         )
+
+
+def _subsection_containing(usage_key):
+    """
+    Return the key of the subsection (the child of a chapter) which contains the block at usage_key, or
+    None if it isn't in a subsection.
+    """
+    store = modulestore()
+    try:
+        child, parent = usage_key, store.get_parent_location(usage_key)
+        while parent is not None and parent.block_type != 'chapter':
+            child, parent = parent, store.get_parent_location(parent)
+    except ItemNotFoundError:
+        return None
+    return child if parent is not None else None
+
+
+def invalidate_persistent_grades(user_id, course_key, usage_key):
+    """
+    Delete the stored grades of the user which the score of the block at usage_key counts toward: the
+    user's course grade and the grade of the subsection containing the block (or of all the course's
+    subsections, if that can't be found). They're recomputed the next time the user is graded.
+
+    The user's count of invalidations is incremented first, and stays locked until the change of the
+    score is committed, so that grading which read the previous score doesn't store its grades.
+    """
+    if not settings.FEATURES.get('ENABLE_PERSISTENT_GRADES', False):
+        return
+    invalidations = PersistentGradesInvalidation.objects.filter(user_id=user_id, course_id=course_key)
+    if not invalidations.update(count=F('count') + 1):
+        try:
+            PersistentGradesInvalidation.objects.create(user_id=user_id, course_id=course_key, count=1)
+        except IntegrityError:
+            # another request created it meanwhile
+            invalidations.update(count=F('count') + 1)
+    PersistentCourseGrade.objects.filter(user_id=user_id, course_id=course_key).delete()
+    subsection_grades = PersistentSubsectionGrade.objects.filter(user_id=user_id, course_id=course_key)
+    subsection_key = _subsection_containing(usage_key)
+    if subsection_key is not None:
+        subsection_grades = subsection_grades.filter(usage_key=subsection_key)
+    subsection_grades.delete()
+
+
+@receiver(SCORE_CHANGED)
+def score_changed_grades_handler(sender, **kwargs):  # pylint: disable=unused-argument
+    """
+    Consume the SCORE_CHANGED signal to invalidate the user's stored grades which the score counts toward.
+    """
+    try:
+        course_key = CourseKey.from_string(kwargs['course_id'])
+        usage_key = UsageKey.from_string(kwargs['usage_id']).map_into_course(course_key)
+    except (KeyError, InvalidKeyError):
+        log.exception(u"Failed to invalidate stored grades for SCORE_CHANGED signal: %s", kwargs)
+        return
+    invalidate_persistent_grades(kwargs['user_id'], course_key, usage_key)
+
+
+@receiver(post_save, sender=StudentModule)
+def student_module_created_grades_handler(sender, instance, created, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidate the student's stored grades which a new StudentModule counts toward, as grading counts
+    the problems a student has touched differently from the ones they haven't.
+    """
+    if created:
+        invalidate_persistent_grades(instance.student_id, instance.course_id, instance.module_state_key)
+
+
+@receiver(post_delete, sender=StudentModule)
+def student_module_deleted_grades_handler(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidate the student's stored grades which a deleted StudentModule counted toward.
+    """
+    invalidate_persistent_grades(instance.student_id, instance.course_id, instance.module_state_key)
@@ -11,6 +11,7 @@ import courseware.access as access
 from courseware.masquerade import CourseMasquerade
 from courseware.tests.factories import UserFactory, StaffFactory, InstructorFactory
 from courseware.tests.helpers import LoginEnrollmentTestCase
+from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
 from student.tests.factories import AnonymousUserFactory, CourseEnrollmentAllowedFactory, CourseEnrollmentFactory
 from xmodule.course_module import (
     CATALOG_VISIBILITY_CATALOG_AND_ABOUT, CATALOG_VISIBILITY_ABOUT,
@@ -297,6 +298,30 @@ class AccessTestCase(LoginEnrollmentTestCase, ModuleStoreTestCase):
         self.assertTrue(access._has_access_course_desc(staff, 'see_in_catalog', course))
         self.assertTrue(access._has_access_course_desc(staff, 'see_about_page', course))
 
+    @patch.dict("django.conf.settings.FEATURES", {'DISABLE_START_DATES': False})
+    def test_course_overview(self):
+        """
+        Tests that access to a course's overview matches access to the course
+        """
+        user = UserFactory.create()
+        yesterday = datetime.datetime.now(pytz.utc) - datetime.timedelta(days=1)
+        tomorrow = datetime.datetime.now(pytz.utc) + datetime.timedelta(days=1)
+        for course_kwargs in (
+                {'start': yesterday},
+                {'start': tomorrow},
+                {'start': yesterday, 'visible_to_staff_only': True},
+                {'enrollment_start': tomorrow, 'catalog_visibility': CATALOG_VISIBILITY_ABOUT},
+                {'invitation_only': True},
+        ):
+            course = CourseFactory.create(**course_kwargs)
+            course_overview = CourseOverview.get_from_id(course.id)
+            for action in ('load', 'enroll', 'see_exists', 'see_in_catalog', 'see_about_page', 'staff'):
+                self.assertEqual(
+                    access.has_access(user, action, course_overview),
+                    access.has_access(user, action, course),
+                    (action, course_kwargs)
+                )
+
     @patch.dict("django.conf.settings.FEATURES", {'ENABLE_PREREQUISITE_COURSES': True, 'MILESTONES_APP': True})
     def test_access_on_course_with_pre_requisites(self):
         """
@@ -14,7 +14,7 @@ from django.test.client import RequestFactory
 from opaque_keys.edx.locations import SlashSeparatedCourseKey
 
 from courseware.courses import (
-    get_course_by_id, get_cms_course_link, course_image_url,
+    get_course_by_id, get_courses, get_cms_course_link, course_image_url,
     get_course_info_section, get_course_about_section, get_cms_block_link
 )
 from courseware.module_render import get_module_for_descriptor
@@ -53,6 +53,16 @@ class CoursesTest(ModuleStoreTestCase):
         cms_url = u"//{}/course/{}".format(CMS_BASE_TEST, unicode(self.course.location))
         self.assertEqual(cms_url, get_cms_block_link(self.course, 'course'))
 
+    @mock.patch.dict(settings.FEATURES, {'ACCESS_REQUIRE_STAFF_FOR_COURSE': True})
+    def test_get_courses_requiring_staff(self):
+        """
+        Tests that only public courses are listed for non-staff when courses require staff access
+        """
+        public_course = CourseFactory.create(org='org', number='public', ispublic=True)
+        CourseFactory.create(org='org', number='private')
+        courses = get_courses(UserFactory.create())
+        self.assertEqual([course.id for course in courses], [public_course.id])
+
 
 @attr('shard_1')
 class ModuleStoreBranchSettingTest(ModuleStoreTestCase):
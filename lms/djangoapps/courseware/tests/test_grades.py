@@ -1,14 +1,22 @@
 """
 Test grade calculation.
 """
+from django.conf import settings
 from django.http import Http404
+from django.test.client import RequestFactory
 from mock import patch
 from nose.plugins.attrib import attr
 from opaque_keys.edx.locations import SlashSeparatedCourseKey
+from submissions import api as sub_api
 
-from courseware.grades import grade, iterate_grades_for
+from courseware import grades
+from courseware.grades import grade, grading_context_for, iterate_grades_for, BatchGrader, MaxScoresCache
+from courseware.models import PersistentCourseGrade, PersistentSubsectionGrade, StudentModule
+from courseware.tests.factories import StudentModuleFactory
+from student.models import anonymous_id_for_user
 from student.tests.factories import UserFactory
-from xmodule.modulestore.tests.factories import CourseFactory
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 
 
@@ -75,7 +83,8 @@ class TestGradeIteration(ModuleStoreTestCase):
             self.assertEqual(gradeset['percent'], 0.0)
 
     @patch('courseware.grades.grade', _grade_with_errors)
-    def test_grading_exception(self):
+    @patch('courseware.grades._can_grade_in_batches', return_value=False)
+    def test_grading_exception(self, _mock_can_grade_in_batches):
         """Test that we correctly capture exception messages that bubble up from
         grading. Note that we only see errors at this level if the grading
         process for this student fails entirely due to an unexpected event --
@@ -121,3 +130,299 @@ class TestGradeIteration(ModuleStoreTestCase):
                 students_to_errors[student] = err_msg
 
         return students_to_gradesets, students_to_errors
+
+
+@attr('shard_1')
+@patch.dict(settings.FEATURES, {'ENABLE_PERSISTENT_GRADES': True})
+class TestPersistentGrades(ModuleStoreTestCase):
+    """
+    Test storing grades and reading them back until the student's scores change.
+    """
+    def setUp(self):
+        super(TestPersistentGrades, self).setUp()
+        course = CourseFactory.create()
+        chapter = ItemFactory.create(parent=course, category='chapter')
+        self.sections = [
+            ItemFactory.create(
+                parent=chapter, category='sequential', graded=True, format='Homework',
+                display_name='Homework {}'.format(index)
+            )
+            for index in range(2)
+        ]
+        self.problems = [ItemFactory.create(parent=section, category='problem') for section in self.sections]
+        self.course = modulestore().get_course(course.id)
+        self.student = UserFactory.create()
+        self.request = RequestFactory().get('/')
+        self.request.user = self.student
+        self.request.session = {}
+
+    def _stored_subsections(self):
+        """
+        Return the locations of the student's stored subsection grades
+        """
+        return set(
+            subsection_grade.usage_key.map_into_course(self.course.id)
+            for subsection_grade in PersistentSubsectionGrade.objects.filter(user=self.student)
+        )
+
+    def test_stored_grade_read_back(self):
+        grade_summary = grade(self.student, self.request, self.course)
+        self.assertEqual(PersistentCourseGrade.objects.get(user=self.student).percent, grade_summary['percent'])
+        self.assertEqual(self._stored_subsections(), set(section.location for section in self.sections))
+
+        with patch('courseware.grades._grade_section') as mock_grade_section:
+            self.assertEqual(grade(self.student, self.request, self.course), grade_summary)
+            # the raw scores come from the stored subsection grades
+            grade(self.student, self.request, self.course, keep_raw_scores=True)
+        self.assertFalse(mock_grade_section.called)
+
+    def test_score_change_regrades_its_subsection(self):
+        grade(self.student, self.request, self.course)
+        StudentModuleFactory.create(
+            student=self.student, course_id=self.course.id, module_state_key=self.problems[0].location,
+            grade=1, max_grade=1
+        )
+        self.assertFalse(PersistentCourseGrade.objects.filter(user=self.student).exists())
+        self.assertEqual(self._stored_subsections(), set([self.sections[1].location]))
+
+        grade_summary = grade(self.student, self.request, self.course)
+        self.assertEqual(grade_summary['totaled_scores']['Homework'][0].earned, 1)
+        self.assertEqual(self._stored_subsections(), set(section.location for section in self.sections))
+
+    def test_score_change_while_grading_not_stored(self):
+        StudentModuleFactory.create(
+            student=self.student, course_id=self.course.id, module_state_key=self.problems[0].location,
+            grade=1, max_grade=1
+        )
+        grade_section = grades._grade_section  # pylint: disable=protected-access
+
+        def grade_section_then_score(*args, **kwargs):
+            """
+            Grade the section, then score the student on the other section's problem, as if they had
+            submitted it meanwhile
+            """
+            result = grade_section(*args, **kwargs)
+            if not StudentModule.objects.filter(module_state_key=self.problems[1].location).exists():
+                StudentModuleFactory.create(
+                    student=self.student, course_id=self.course.id, module_state_key=self.problems[1].location,
+                    grade=1, max_grade=1
+                )
+            return result
+
+        with patch('courseware.grades._grade_section', side_effect=grade_section_then_score):
+            grade(self.student, self.request, self.course)
+        self.assertFalse(PersistentCourseGrade.objects.filter(user=self.student).exists())
+        self.assertEqual(self._stored_subsections(), set())
+
+        grade_summary = grade(self.student, self.request, self.course)
+        self.assertEqual([score.earned for score in grade_summary['totaled_scores']['Homework']], [1, 1])
+        self.assertEqual(self._stored_subsections(), set(section.location for section in self.sections))
+
+    def test_unloadable_problem_not_stored(self):
+        ItemFactory.create(parent=self.sections[0], category='problem', metadata={'visible_to_staff_only': True})
+        self.course = modulestore().get_course(self.course.id)
+        StudentModuleFactory.create(
+            student=self.student, course_id=self.course.id, module_state_key=self.problems[0].location,
+            grade=1, max_grade=1
+        )
+        grade(self.student, self.request, self.course)
+        # the student may be able to load the problem later, so only the other subsection's grade is stored
+        self.assertFalse(PersistentCourseGrade.objects.filter(user=self.student).exists())
+        self.assertEqual(self._stored_subsections(), set([self.sections[1].location]))
+
+
+@attr('shard_1')
+class TestMaxScoresCache(ModuleStoreTestCase):
+    """
+    Test caching the max scores of problems across students.
+    """
+    def setUp(self):
+        super(TestMaxScoresCache, self).setUp()
+        course = CourseFactory.create()
+        chapter = ItemFactory.create(parent=course, category='chapter')
+        section = ItemFactory.create(parent=chapter, category='sequential', graded=True, format='Homework')
+        self.problem = ItemFactory.create(parent=section, category='problem')
+        self.course = modulestore().get_course(course.id)
+        self.request = RequestFactory().get('/')
+        self.request.session = {}
+
+    def test_push_and_fetch(self):
+        max_scores_cache = MaxScoresCache.create_for_course(self.course)
+        max_scores_cache.fetch_from_remote([self.problem.location])
+        self.assertIsNone(max_scores_cache.get(self.problem.location))
+        max_scores_cache.set(self.problem.location, 2)
+        max_scores_cache.push_to_remote()
+
+        max_scores_cache = MaxScoresCache.create_for_course(self.course)
+        max_scores_cache.fetch_from_remote([self.problem.location])
+        self.assertEqual(max_scores_cache.get(self.problem.location), 2)
+
+    def test_grading_reuses_max_scores(self):
+        students = [UserFactory.create(), UserFactory.create()]
+        # the students have seen the problem but haven't been scored on it
+        for student in students:
+            StudentModuleFactory.create(
+                student=student, course_id=self.course.id, module_state_key=self.problem.location
+            )
+
+        self.request.user = students[0]
+        first_grade = grade(students[0], self.request, self.course)
+        self.request.user = students[1]
+        with patch('courseware.grades.get_module_for_descriptor') as mock_get_module:
+            self.assertEqual(grade(students[1], self.request, self.course), first_grade)
+        self.assertFalse(mock_get_module.called)
+
+
+@attr('shard_1')
+class TestBatchGrader(ModuleStoreTestCase):
+    """
+    Test grading the students of a course in batches.
+    """
+    def setUp(self):
+        super(TestBatchGrader, self).setUp()
+        course = CourseFactory.create(
+            grading_policy={
+                "GRADER": [{
+                    "type": "Homework",
+                    "min_count": 3,
+                    "drop_count": 1,
+                    "short_label": "HW",
+                    "weight": 1.0,
+                }],
+            },
+        )
+        chapter = ItemFactory.create(parent=course, category='chapter')
+        self.problems = []
+        for index in range(3):
+            section = ItemFactory.create(
+                parent=chapter, category='sequential', graded=True, format='Homework',
+                display_name='Homework {}'.format(index)
+            )
+            vertical = ItemFactory.create(parent=section, category='vertical')
+            self.problems.append(ItemFactory.create(parent=vertical, category='problem', metadata={'weight': 2}))
+            self.problems.append(ItemFactory.create(parent=vertical, category='problem'))
+        self.course = modulestore().get_course(course.id)
+        self.students = [UserFactory.create() for __ in range(4)]
+        scores = [
+            [(1, 1), (0, 1), (1, 1), None, None, None],
+            [(0, 1), (0, 1), None, None, (1, 1), (1, 1)],
+            [(1, 1), (1, 1), (1, 1), (1, 1), (1, 1), (1, 1)],
+            [],
+        ]
+        for student, student_scores in zip(self.students, scores):
+            for problem, score in zip(self.problems, student_scores):
+                if score is not None:
+                    StudentModuleFactory.create(
+                        student=student, course_id=self.course.id, module_state_key=problem.location,
+                        grade=score[0], max_grade=score[1]
+                    )
+        # the first student has seen a problem they haven't been scored on
+        StudentModuleFactory.create(
+            student=self.students[0], course_id=self.course.id, module_state_key=self.problems[3].location
+        )
+
+    def _grades_one_by_one(self, keep_raw_scores=False):
+        """
+        Return the students' gradesets as grade() grades them
+        """
+        request = RequestFactory().get('/')
+        request.session = {}
+        gradesets = []
+        for student in self.students:
+            request.user = student
+            gradesets.append(grade(student, request, self.course, keep_raw_scores))
+        return gradesets
+
+    def _batch_grades(self, keep_raw_scores=False):
+        """
+        Return the students' gradesets as iterate_grades_for grades them
+        """
+        results = list(iterate_grades_for(self.course, self.students, keep_raw_scores))
+        self.assertEqual([student for student, __, __ in results], self.students)
+        self.assertEqual([err_msg for __, __, err_msg in results], [""] * len(self.students))
+        return [gradeset for __, gradeset, __ in results]
+
+    def test_same_grades_as_grade(self):
+        for keep_raw_scores in (False, True):
+            self.assertEqual(self._batch_grades(keep_raw_scores), self._grades_one_by_one(keep_raw_scores))
+
+    def test_problems_not_instantiated(self):
+        expected_gradesets = self._grades_one_by_one()
+        # grading the first student cached the max score of the problem they haven't been scored on
+        with patch('courseware.grades.get_module_for_descriptor') as mock_get_module:
+            self.assertEqual(self._batch_grades(), expected_gradesets)
+        self.assertFalse(mock_get_module.called)
+
+    def test_unknown_max_score_graded_by_grade(self):
+        expected_gradesets = self._grades_one_by_one()
+        with patch('courseware.grades.MaxScoresCache.get', return_value=None):
+            with patch('courseware.grades.grade', wraps=grade) as mock_grade:
+                self.assertEqual(self._batch_grades(), expected_gradesets)
+        self.assertEqual([call[0][0] for call in mock_grade.call_args_list], [self.students[0]])
+
+    def test_section_without_problems(self):
+        chapter = self.course.get_children()[0]
+        section = ItemFactory.create(parent=chapter, category='sequential', graded=True, format='Homework')
+        ItemFactory.create(parent=section, category='html')
+        self.course = modulestore().get_course(self.course.id)
+        self.assertEqual(self._batch_grades(), self._grades_one_by_one())
+
+    def test_submissions_scores(self):
+        for student in self.students[:2]:
+            submission = sub_api.create_submission(
+                {
+                    'student_id': anonymous_id_for_user(student, self.course.id),
+                    'course_id': self.course.id.to_deprecated_string(),
+                    'item_id': self.problems[5].location.to_deprecated_string(),
+                    'item_type': 'openassessment',
+                },
+                'answer'
+            )
+            sub_api.set_score(submission['uuid'], 3, 4)
+        expected_gradesets = self._grades_one_by_one(keep_raw_scores=True)
+        self.assertEqual(self._batch_grades(keep_raw_scores=True), expected_gradesets)
+        self.assertIn(3, [score.earned for score in expected_gradesets[0]['raw_scores']])
+
+    @patch.object(BatchGrader, 'BATCH_SIZE', 3)
+    def test_batches(self):
+        expected_gradesets = self._grades_one_by_one()
+        with patch.object(BatchGrader, '_grade_batch', wraps=BatchGrader(self.course)._grade_batch) as mock_batch:
+            self.assertEqual(self._batch_grades(), expected_gradesets)
+        self.assertEqual([len(call[0][0]) for call in mock_batch.call_args_list], [3, 1])
+
+
+@attr('shard_1')
+class TestGradingContext(ModuleStoreTestCase):
+    """
+    Test the lightweight grading context of a course.
+    """
+    def setUp(self):
+        super(TestGradingContext, self).setUp()
+        course = CourseFactory.create()
+        chapter = ItemFactory.create(parent=course, category='chapter')
+        self.section = ItemFactory.create(parent=chapter, category='sequential', graded=True, format='Homework')
+        self.vertical = ItemFactory.create(parent=self.section, category='vertical')
+        self.problem = ItemFactory.create(parent=self.vertical, category='problem', metadata={'weight': 2})
+        ItemFactory.create(parent=chapter, category='sequential')
+        self.course = modulestore().get_course(course.id)
+
+    def test_grading_context(self):
+        grading_context = grading_context_for(self.course)
+        self.assertEqual(grading_context['graded_sections'].keys(), ['Homework'])
+        section, = grading_context['graded_sections']['Homework']
+        self.assertEqual(section['usage_key'], self.section.location)
+        self.assertFalse(section['always_recalculate'])
+        self.assertFalse(section['has_dynamic_children'])
+        locations = [self.section.location, self.vertical.location, self.problem.location]
+        self.assertEqual([block['usage_key'] for block in section['blocks']], locations)
+        self.assertEqual([block['has_score'] for block in section['blocks']], [False, False, True])
+        self.assertEqual(section['blocks'][2]['weight'], 2)
+        self.assertEqual(grading_context['all_usage_keys'], locations)
+
+    def test_cached_across_processes(self):
+        grading_context = grading_context_for(self.course)
+        # as if loaded by another process
+        course = modulestore().get_course(self.course.id)
+        with patch('courseware.grades._serialize_grading_context') as mock_serialize:
+            self.assertEqual(grading_context_for(course), grading_context)
+        self.assertFalse(mock_serialize.called)
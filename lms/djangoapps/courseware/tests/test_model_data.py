@@ -7,7 +7,7 @@ from nose.plugins.attrib import attr
 from functools import partial
 
 from courseware.model_data import DjangoKeyValueStore
-from courseware.model_data import InvalidScopeError, FieldDataCache
+from courseware.model_data import InvalidScopeError, FieldDataCache, ScoresClient
 from courseware.models import StudentModule
 from courseware.models import XModuleStudentInfoField, XModuleStudentPrefsField
 
@@ -416,3 +416,39 @@ class TestStudentInfoStorage(OtherUserFailureTestMixin, StorageTestBase, TestCas
     storage_class = XModuleStudentInfoField
     other_key_factory = partial(DjangoKeyValueStore.Key, Scope.user_info, 2, 'mock_problem')  # user_id=2, not 1
     existing_field_name = "existing_field"
+
+
+@attr('shard_1')
+class TestScoresClient(TestCase):
+    """
+    Test reading a user's scores in a course at once
+    """
+    def setUp(self):
+        super(TestScoresClient, self).setUp()
+        self.user = UserFactory.create(username='user')
+        StudentModuleFactory.create(student=self.user, module_state_key=location('graded'), grade=1, max_grade=2)
+        StudentModuleFactory.create(student=self.user, module_state_key=location('ungraded'))
+        StudentModuleFactory.create(module_state_key=location('other_user'), grade=1, max_grade=1)
+        self.scores_client = ScoresClient(course_id, self.user.id)
+
+    def test_scores_fetched_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.scores_client.get(location('graded')), (1, 2))
+            self.assertEqual(self.scores_client.get(location('ungraded')), (None, None))
+            self.assertIsNone(self.scores_client.get(location('other_user')))
+
+    def test_contains(self):
+        self.assertIn(location('graded'), self.scores_client)
+        self.assertIn(location('ungraded'), self.scores_client)
+        self.assertNotIn(location('other_user'), self.scores_client)
+
+    def test_create_for_users(self):
+        other_user = UserFactory.create(username='other_user')
+        with self.assertNumQueries(1):
+            scores_clients = ScoresClient.create_for_users(course_id, [self.user.id, other_user.id])
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                dict(scores_clients[self.user.id].iteritems()),
+                {location('graded'): (1, 2), location('ungraded'): (None, None)}
+            )
+            self.assertEqual(dict(scores_clients[other_user.id].iteritems()), {})
@@ -419,6 +419,14 @@ XQUEUE_INTERFACE = AUTH_TOKENS['XQUEUE_INTERFACE']
 # Get the MODULESTORE from auth.json, but if it doesn't exist,
 # use the one from common.py
 MODULESTORE = convert_module_store_setting_if_needed(AUTH_TOKENS.get('MODULESTORE', MODULESTORE))
+COURSE_STRUCTURE_CACHE_LOCAL_SIZE = ENV_TOKENS.get(
+    'COURSE_STRUCTURE_CACHE_LOCAL_SIZE', COURSE_STRUCTURE_CACHE_LOCAL_SIZE
+)
+COURSE_STRUCTURE_CACHE_TIMEOUT = ENV_TOKENS.get('COURSE_STRUCTURE_CACHE_TIMEOUT', COURSE_STRUCTURE_CACHE_TIMEOUT)
+STATIC_CONTENT_LOCAL_CACHE_SIZE = ENV_TOKENS.get('STATIC_CONTENT_LOCAL_CACHE_SIZE', STATIC_CONTENT_LOCAL_CACHE_SIZE)
+STATIC_CONTENT_LOCAL_CACHE_TIMEOUT = ENV_TOKENS.get(
+    'STATIC_CONTENT_LOCAL_CACHE_TIMEOUT', STATIC_CONTENT_LOCAL_CACHE_TIMEOUT
+)
 CONTENTSTORE = AUTH_TOKENS.get('CONTENTSTORE', CONTENTSTORE)
 DOC_STORE_CONFIG = AUTH_TOKENS.get('DOC_STORE_CONFIG', DOC_STORE_CONFIG)
 MONGODB_LOG = AUTH_TOKENS.get('MONGODB_LOG', {})
@@ -569,6 +577,9 @@ COURSE_ABOUT_VISIBILITY_PERMISSION = ENV_TOKENS.get(
     COURSE_ABOUT_VISIBILITY_PERMISSION
 )
 
+COURSE_OVERVIEW_CACHE_SIZE = ENV_TOKENS.get('COURSE_OVERVIEW_CACHE_SIZE', COURSE_OVERVIEW_CACHE_SIZE)
+COURSE_OVERVIEW_CACHE_TIMEOUT = ENV_TOKENS.get('COURSE_OVERVIEW_CACHE_TIMEOUT', COURSE_OVERVIEW_CACHE_TIMEOUT)
+
 
 # Enrollment API Cache Timeout
 ENROLLMENT_COURSE_DETAILS_CACHE_TIMEOUT = ENV_TOKENS.get('ENROLLMENT_COURSE_DETAILS_CACHE_TIMEOUT', 60)
@@ -408,6 +408,10 @@ FEATURES = {
 
     # Credit course API
     'ENABLE_CREDIT_API': False,
+
+    # Store students' course and subsection grades, and read them back until their scores or the course change.
+    # Delete the stored grades (courseware_persistent*grade) when turning this back on after it was off.
+    'ENABLE_PERSISTENT_GRADES': False,
 }
 
 # Ignore static asset files on import which match this pattern
@@ -709,6 +713,21 @@ XBLOCK_SELECT_FUNCTION = prefer_xmodules
 
 MODULESTORE_BRANCH = 'published-only'
 CONTENTSTORE = None
+
+# Number of course structures (split modulestore) to keep in each process, in front of
+# the shared 'course_structure_cache' cache. Structures are immutable, so this never
+# needs invalidation; it only bounds memory. 0 disables the in-process tier.
+COURSE_STRUCTURE_CACHE_LOCAL_SIZE = 8
+# Seconds course structures stay in the shared 'course_structure_cache' cache. Memcached
+# treats timeouts over 30 days as timestamps, which django converts them to.
+COURSE_STRUCTURE_CACHE_TIMEOUT = 30 * 24 * 60 * 60
+
+# Bytes of course assets too big for memcached (1MB and up) to keep in each process for the
+# StaticContentServer; no one asset bigger than an eighth of this is kept. Other processes' changes
+# are seen once the assets expire after the timeout, in seconds. 0 disables the cache.
+STATIC_CONTENT_LOCAL_CACHE_SIZE = 64 * 1024 * 1024
+STATIC_CONTENT_LOCAL_CACHE_TIMEOUT = 60
+
 DOC_STORE_CONFIG = {
     'host': 'localhost',
     'db': 'xmodule',
@@ -2406,6 +2425,11 @@ COURSE_CATALOG_VISIBILITY_PERMISSION = 'see_exists'
 # visible. We default this to the legacy permission 'see_exists'.
 COURSE_ABOUT_VISIBILITY_PERMISSION = 'see_exists'
 
+# How many CourseOverviews each process holds in memory in front of the database (0 disables this),
+# and the most seconds it holds each as other processes can't invalidate them.
+COURSE_OVERVIEW_CACHE_SIZE = 1000
+COURSE_OVERVIEW_CACHE_TIMEOUT = 60
+
 
 # Enrollment API Cache Timeout
 ENROLLMENT_COURSE_DETAILS_CACHE_TIMEOUT = 60
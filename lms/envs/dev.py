@@ -94,6 +94,11 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'edx_location_mem_cache',
     },
+    'course_structure_cache': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'course_structure_cache',
+        'KEY_FUNCTION': 'util.memcache.safe_key',
+    },
 }
 
 
@@ -207,9 +207,21 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'edx_location_mem_cache',
     },
+    'course_structure_cache': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
 
 }
 
+# Tests reuse course ids across courses, so don't hold CourseOverviews in memory
+COURSE_OVERVIEW_CACHE_SIZE = 0
+
+# Don't keep course structures between tests; mongo call counts depend on it
+COURSE_STRUCTURE_CACHE_LOCAL_SIZE = 0
+
+# Tests reuse asset locations across courses, so don't keep assets in memory
+STATIC_CONTENT_LOCAL_CACHE_SIZE = 0
+
 # Dummy secret key for dev
 SECRET_KEY = '85920908f28904ed733fe576320db18cabd7b6cd'
 
@@ -0,0 +1,45 @@
+"""
+Tests for generating course overviews ahead of requests
+"""
+from django.core.management import CommandError, call_command
+
+from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory
+
+
+class TestWarmCourseOverviews(ModuleStoreTestCase):
+    """
+    Tests for the warm_course_overviews management command
+    """
+    def setUp(self):
+        super(TestWarmCourseOverviews, self).setUp()
+        self.courses = [
+            CourseFactory.create(default_store=ModuleStoreEnum.Type.mongo),
+            CourseFactory.create(default_store=ModuleStoreEnum.Type.split),
+        ]
+        CourseOverview.objects.all().delete()
+
+    def test_all(self):
+        call_command('warm_course_overviews', all=True, threads=1, chunk_size=1)
+        self.assertEqual(
+            set(CourseOverview.objects.values_list('id', flat=True)),
+            set(course.id for course in self.courses)
+        )
+
+    def test_course_ids(self):
+        call_command('warm_course_overviews', unicode(self.courses[1].id), threads=1)
+        self.assertEqual(list(CourseOverview.objects.values_list('id', flat=True)), [self.courses[1].id])
+
+    def test_force(self):
+        call_command('warm_course_overviews', unicode(self.courses[0].id), threads=1)
+        CourseOverview.objects.filter(id=self.courses[0].id).update(display_name='Stale')
+        call_command('warm_course_overviews', unicode(self.courses[0].id), threads=1, force=True)
+        self.assertEqual(CourseOverview.objects.get(id=self.courses[0].id).display_name, self.courses[0].display_name)
+
+    def test_invalid_args(self):
+        with self.assertRaisesRegexp(CommandError, 'Invalid course key'):
+            call_command('warm_course_overviews', 'foo', threads=1)
+        with self.assertRaises(CommandError):
+            call_command('warm_course_overviews', all=True, threads=0)
@@ -0,0 +1,115 @@
+"""
+Django management command to generate and store the CourseOverviews of courses ahead of the requests which need them.
+"""
+import logging
+import threading
+from optparse import make_option
+from Queue import Empty, Queue
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey
+from request_cache.middleware import RequestCache
+from xmodule.modulestore.django import modulestore
+
+from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Generate and store the CourseOverviews of courses, loading several courses at once in several threads.
+    """
+    args = '<course_id course_id ...>'
+    help = 'Generates and stores the course overviews of one or more courses.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--all',
+                    action='store_true',
+                    default=False,
+                    help='Generate overviews for all courses.'),
+        make_option('--force',
+                    action='store_true',
+                    default=False,
+                    help='Regenerate the overviews which already exist.'),
+        make_option('--threads',
+                    type='int',
+                    default=4,
+                    help='How many threads to load courses in.'),
+        make_option('--chunk-size',
+                    type='int',
+                    default=20,
+                    help='How many courses each thread loads at once.'),
+    )
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--threads and --chunk-size must be positive')
+
+        if options['all']:
+            course_keys = modulestore().get_course_keys()
+        else:
+            try:
+                course_keys = [CourseKey.from_string(arg) for arg in args]
+            except InvalidKeyError:
+                raise CommandError('Invalid course key.')
+
+        if not course_keys:
+            log.fatal('No courses specified.')
+            return
+
+        log.info('Generating course overviews for %d courses.', len(course_keys))
+        chunks = Queue()
+        for index in range(0, len(course_keys), options['chunk_size']):
+            chunks.put(course_keys[index:index + options['chunk_size']])
+
+        if options['threads'] == 1:
+            self._warm_chunks(chunks, options['force'])
+        else:
+            # create the modulestore before the threads share it
+            modulestore()
+            threads = [
+                threading.Thread(target=self._warm_chunks_in_thread, args=(chunks, options['force']))
+                for __ in range(options['threads'])
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        log.info('Finished generating course overviews.')
+
+    def _warm_chunks_in_thread(self, chunks, force):
+        """
+        Generate the overviews of the chunks of course keys in a thread of its own
+        """
+        try:
+            self._warm_chunks(chunks, force)
+        finally:
+            # each thread has its own db connection
+            connection.close()
+
+    def _warm_chunks(self, chunks, force):
+        """
+        Generate the overviews of the chunks of course keys on the queue until it's empty
+        """
+        while True:
+            try:
+                course_keys = chunks.get_nowait()
+            except Empty:
+                return
+            # the modulestores' request cache is per thread; start each chunk with an empty one
+            RequestCache.clear_request_cache()
+            try:
+                if force:
+                    for course_key in course_keys:
+                        CourseOverview.invalidate(course_key)
+                course_overviews = CourseOverview.get_from_ids(course_keys)
+            except Exception:  # pylint: disable=broad-except
+                log.exception('An error occurred while generating course overviews for %s', course_keys)
+                continue
+            for course_key in set(course_keys).difference(course_overviews):
+                log.warning('No course overview generated for %s', course_key)
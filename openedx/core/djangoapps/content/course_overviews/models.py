@@ -3,15 +3,20 @@ Declaration of CourseOverview model
 """
 
 import json
+import threading
+import time
+from collections import OrderedDict
 
 import django.db.models
-from django.db.models.fields import BooleanField, DateTimeField, DecimalField, TextField
+from django.conf import settings
+from django.db.models.fields import BooleanField, DateTimeField, DecimalField, FloatField, NullBooleanField, TextField
 from django.utils.translation import ugettext
 
 from lms.djangoapps.certificates.api import get_active_web_certificate
 from lms.djangoapps.courseware.courses import course_image_url
 from util.date_utils import strftime_localized
 from xmodule import course_metadata_utils
+from xmodule.error_module import ErrorDescriptor
 from xmodule.modulestore.django import modulestore
 from xmodule_django.models import CourseKeyField, UsageKeyField
 
@@ -36,6 +41,7 @@ class CourseOverview(django.db.models.Model):
     start = DateTimeField(null=True)
     end = DateTimeField(null=True)
     advertised_start = TextField(null=True)
+    announcement = DateTimeField(null=True)
 
     # URLs
     course_image_url = TextField()
@@ -57,6 +63,21 @@ class CourseOverview(django.db.models.Model):
     mobile_available = BooleanField()
     visible_to_staff_only = BooleanField()
     _pre_requisite_courses_json = TextField()  # JSON representation of list of CourseKey strings
+    days_early_for_beta = FloatField(null=True)
+    catalog_visibility = TextField(null=True)
+    ispublic = NullBooleanField()
+
+    # Enrollment details
+    enrollment_start = DateTimeField(null=True)
+    enrollment_end = DateTimeField(null=True)
+    enrollment_domain = TextField(null=True)
+    invitation_only = BooleanField(default=False)
+
+    # In-process cache of course ID -> (expiration time, overview) in front of the database, least
+    # recently used first. It holds at most COURSE_OVERVIEW_CACHE_SIZE overviews (0 disables it), each
+    # for COURSE_OVERVIEW_CACHE_TIMEOUT seconds at most, as other processes can't invalidate it.
+    _cache = OrderedDict()
+    _cache_lock = threading.Lock()
 
     @staticmethod
     def _create_from_course(course):
@@ -82,6 +103,7 @@ class CourseOverview(django.db.models.Model):
             start=course.start,
             end=course.end,
             advertised_start=course.advertised_start,
+            announcement=course.announcement,
 
             course_image_url=course_image_url(course),
             facebook_url=course.facebook_url,
@@ -97,7 +119,15 @@ class CourseOverview(django.db.models.Model):
 
             mobile_available=course.mobile_available,
             visible_to_staff_only=course.visible_to_staff_only,
-            _pre_requisite_courses_json=json.dumps(course.pre_requisite_courses)
+            _pre_requisite_courses_json=json.dumps(course.pre_requisite_courses),
+            days_early_for_beta=course.days_early_for_beta,
+            catalog_visibility=course.catalog_visibility,
+            ispublic=course.ispublic,
+
+            enrollment_start=course.enrollment_start,
+            enrollment_end=course.enrollment_end,
+            enrollment_domain=course.enrollment_domain,
+            invitation_only=course.invitation_only,
         )
 
     @staticmethod
@@ -114,19 +144,112 @@ class CourseOverview(django.db.models.Model):
             course_id (CourseKey): the ID of the course overview to be loaded
 
         Returns:
-            CourseOverview: overview of the requested course
-        """
-        course_overview = None
-        try:
-            course_overview = CourseOverview.objects.get(id=course_id)
-        except CourseOverview.DoesNotExist:
-            store = modulestore()
-            with store.bulk_operations(course_id):
-                course = store.get_course(course_id)
-                if course:
-                    course_overview = CourseOverview._create_from_course(course)
-                    course_overview.save()  # Save new overview to the cache
-        return course_overview
+            CourseOverview: overview of the requested course, or None if there's no such course
+        """
+        return CourseOverview.get_from_ids([course_id]).get(course_id)
+
+    @staticmethod
+    def get_from_ids(course_ids):
+        """
+        Load CourseOverview objects for the given course IDs.
+
+        Takes the overviews which are in the in-process cache from there and
+        loads the rest from the database in one query. If any of the courses
+        don't have overviews yet, we load all of those courses from the
+        modulestore at once, create CourseOverview objects from them, and then
+        cache them in the database for future use.
+
+        Arguments:
+            course_ids (iterable of CourseKey): the IDs of the course overviews
+                to be loaded
+
+        Returns:
+            dict: the overviews of the requested courses which exist, keyed by
+                course ID
+        """
+        course_ids = set(course_ids)
+        course_overviews = CourseOverview._get_cached(course_ids)
+
+        missing_ids = course_ids.difference(course_overviews)
+        if missing_ids:
+            for course_overview in CourseOverview.objects.filter(id__in=missing_ids):
+                course_overviews[course_overview.id] = course_overview
+            missing_ids.difference_update(course_overviews)
+
+        if missing_ids:
+            for course_id, course in modulestore().get_courses_by_ids(missing_ids).iteritems():
+                if isinstance(course, ErrorDescriptor):
+                    continue
+                course_overview = CourseOverview._create_from_course(course)
+                course_overview.save()  # Save new overview to the cache
+                course_overviews[course_id] = course_overview
+
+        CourseOverview._set_cached(course_overviews.values())
+        return course_overviews
+
+    @staticmethod
+    def get_all_courses(org=None):
+        """
+        Load the CourseOverview objects of all the courses in the modulestore,
+        optionally only of those in the given org.
+
+        Returns:
+            list: the overviews of the courses
+        """
+        return CourseOverview.get_from_ids(modulestore().get_course_keys(org=org)).values()
+
+    @staticmethod
+    def _get_cached(course_ids):
+        """
+        Return a dict of those of the given course IDs which are in the
+        in-process cache to their overviews.
+        """
+        if not CourseOverview._cache_size():
+            return {}
+        now = time.time()
+        course_overviews = {}
+        with CourseOverview._cache_lock:
+            for course_id in course_ids:
+                expiration, course_overview = CourseOverview._cache.pop(course_id, (0, None))
+                if expiration > now:
+                    # re-add it as the most recently used
+                    CourseOverview._cache[course_id] = (expiration, course_overview)
+                    course_overviews[course_id] = course_overview
+        return course_overviews
+
+    @staticmethod
+    def _set_cached(course_overviews):
+        """
+        Put the given overviews in the in-process cache, evicting the least
+        recently used ones as needed.
+        """
+        cache_size = CourseOverview._cache_size()
+        if not cache_size:
+            return
+        expiration = time.time() + getattr(settings, 'COURSE_OVERVIEW_CACHE_TIMEOUT', 60)
+        with CourseOverview._cache_lock:
+            for course_overview in course_overviews:
+                CourseOverview._cache.pop(course_overview.id, None)
+                CourseOverview._cache[course_overview.id] = (expiration, course_overview)
+            while len(CourseOverview._cache) > cache_size:
+                CourseOverview._cache.popitem(last=False)
+
+    @staticmethod
+    def _cache_size():
+        """
+        Returns the most overviews to hold in the in-process cache.
+        """
+        return getattr(settings, 'COURSE_OVERVIEW_CACHE_SIZE', 0)
+
+    @staticmethod
+    def invalidate(course_id):
+        """
+        Remove the overview of the given course from the database and from
+        this process's cache.
+        """
+        with CourseOverview._cache_lock:
+            CourseOverview._cache.pop(course_id, None)
+        CourseOverview.objects.filter(id=course_id).delete()
 
     def clean_id(self, padding_char='='):
         """
@@ -164,6 +287,13 @@ class CourseOverview(django.db.models.Model):
         """
         return course_metadata_utils.number_for_course_location(self.location)
 
+    @property
+    def org(self):
+        """
+        Returns this course's organization.
+        """
+        return self.location.org
+
     @property
     def url_name(self):
         """
@@ -203,6 +333,14 @@ class CourseOverview(django.db.models.Model):
             strftime_localized
         )
 
+    @property
+    def sorting_score(self):
+        """
+        Returns a number that can be used to sort courses according to how
+        "new" they are, the lower the newer.
+        """
+        return course_metadata_utils.sorting_score(self.start, self.advertised_start, self.announcement)
+
     @property
     def start_date_is_still_default(self):
         """
@@ -14,4 +14,4 @@ def _listen_for_course_publish(sender, course_key, **kwargs):  # pylint: disable
     Catches the signal that a course has been published in Studio and
     invalidates the corresponding CourseOverview cache entry if one exists.
     """
-    CourseOverview.objects.filter(id=course_key).delete()
+    CourseOverview.invalidate(course_key)
@@ -7,6 +7,7 @@ import itertools
 import pytz
 import math
 
+from django.test.utils import override_settings
 from django.utils import timezone
 
 from lms.djangoapps.certificates.api import get_active_web_certificate
@@ -15,6 +16,7 @@ from xmodule.course_metadata_utils import DEFAULT_START_DATE
 from xmodule.modulestore import ModuleStoreEnum
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 from xmodule.modulestore.tests.factories import CourseFactory, check_mongo_calls, check_mongo_calls_range
+from opaque_keys.edx.locator import CourseLocator
 
 from .models import CourseOverview
 
@@ -82,6 +84,12 @@ class CourseOverviewTestCase(ModuleStoreTestCase):
             'display_name_with_default',
             'start_date_is_still_default',
             'pre_requisite_courses',
+            'days_early_for_beta',
+            'catalog_visibility',
+            'ispublic',
+            'enrollment_domain',
+            'invitation_only',
+            'org',
         ]
         for attribute_name in fields_to_test:
             course_value = getattr(course, attribute_name)
@@ -133,7 +141,11 @@ class CourseOverviewTestCase(ModuleStoreTestCase):
             get_seconds_since_epoch(course.end),
             get_seconds_since_epoch(course_overview_cache_miss.end),
             get_seconds_since_epoch(course_overview_cache_hit.end),
-        )]
+        )] + [(
+            get_seconds_since_epoch(getattr(course, attribute_name)),
+            get_seconds_since_epoch(getattr(course_overview_cache_miss, attribute_name)),
+            get_seconds_since_epoch(getattr(course_overview_cache_hit, attribute_name)),
+        ) for attribute_name in ('announcement', 'enrollment_start', 'enrollment_end')]
         for (course_value, cache_miss_value, cache_hit_value) in others_to_test:
             self.assertEqual(course_value, cache_miss_value)
             self.assertEqual(cache_miss_value, cache_hit_value)
@@ -256,3 +268,48 @@ class CourseOverviewTestCase(ModuleStoreTestCase):
         # we expect no modulestore queries to be made.
         with check_mongo_calls(0):
             _course_overview_2 = CourseOverview.get_from_id(course.id)
+
+    @ddt.data(ModuleStoreEnum.Type.mongo, ModuleStoreEnum.Type.split)
+    def test_get_from_ids(self, modulestore_type):
+        """
+        Tests that overviews of several courses are loaded and created at once.
+        """
+        course_ids = [
+            CourseFactory.create(default_store=modulestore_type, display_name=str(index)).id
+            for index in range(3)
+        ]
+        CourseOverview.get_from_id(course_ids[0])
+
+        course_overviews = CourseOverview.get_from_ids(course_ids + [CourseLocator('no', 'such', 'course')])
+        self.assertEqual(set(course_overviews), set(course_ids))
+        self.assertEqual(
+            [course_overviews[course_id].display_name for course_id in course_ids],
+            ['0', '1', '2']
+        )
+
+        # now they all come from the database in one query
+        with check_mongo_calls(0):
+            with self.assertNumQueries(1):
+                self.assertEqual(set(CourseOverview.get_from_ids(course_ids)), set(course_ids))
+
+    @override_settings(COURSE_OVERVIEW_CACHE_SIZE=1)
+    def test_in_process_cache(self):
+        """
+        Tests that the most recently used overviews are held in memory until they're invalidated.
+        """
+        self.addCleanup(CourseOverview._cache.clear)  # pylint: disable=protected-access
+        course = CourseFactory.create()
+        other_course = CourseFactory.create()
+
+        CourseOverview.get_from_id(course.id)
+        with self.assertNumQueries(0):
+            CourseOverview.get_from_id(course.id)
+
+        # which evicts the first course's overview
+        CourseOverview.get_from_id(other_course.id)
+        with self.assertNumQueries(1):
+            CourseOverview.get_from_id(course.id)
+
+        CourseOverview.invalidate(course.id)
+        self.assertFalse(CourseOverview.objects.filter(id=course.id).exists())
+        self.assertEqual(CourseOverview.get_from_id(course.id).display_name, course.display_name)